@@ -0,0 +1,4 @@
+"""
+Benchmarks for the TWNet data pipeline. Run them from the `data/` directory,
+e.g. `python -m benchmarks.bench_sources`.
+"""
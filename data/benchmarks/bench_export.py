@@ -0,0 +1,169 @@
+"""
+Benchmark (and equivalence check) for the Cytoscape.js JSON export.
+
+Compares the original export (`create_cyto_json` plus `json.dump(..., indent=4)`)
+against the streaming, compact `write_cyto_json`, and times the gzip and brotli
+variants. Reports wall time, peak traced memory (tracemalloc, measured in a
+second run) and file size, and checks that both JSON files parse to the same
+document. Then times writing every export (CSVs, JSON and its compressed
+copies, metadata, GraphML, GEXF) with one writer per file against the
+single-pass `write_exports`, adding one format at a time. Also times the
+per-node ego-network shards and reports the size of a typical record.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_export --nodes outputs/nodes.csv --edges outputs/edges.csv --scale 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import networkx as nx
+import pandas as pd
+
+from twnet.export import (ExportPaths, compress_file, compressed_paths, create_cyto_json, write_csv,
+                          write_cyto_json, write_exports, write_meta_data)
+from twnet.shards import write_ego_shards
+
+
+def legacy_export(nl: pd.DataFrame, el: pd.DataFrame, path: str) -> None:
+    # The export previously done in network-data-maker.py.
+    with open(path, 'w') as f:
+        json.dump(create_cyto_json(nl, el), f, indent=4)
+
+
+def measured(label, path, fn, *args):
+    # Timed on its own, then run again under tracemalloc, which slows down
+    # Python-heavy code too much to time it.
+    start = time.perf_counter()
+    fn(*args, path)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn(*args, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<24} {seconds:>8.3f}s  peak {peak / 2**20:>8.1f} MiB  "
+          f"size {os.path.getsize(path) / 2**20:>8.2f} MiB")
+
+
+def separate_exports(nl: pd.DataFrame, el: pd.DataFrame, paths: ExportPaths) -> None:
+    # One writer (and one pass over the tables) per file, as before the fan-out.
+    if paths.nodes_csv:
+        write_csv(nl, paths.nodes_csv)
+    if paths.edges_csv:
+        write_csv(el, paths.edges_csv)
+    if paths.cyto_json:
+        write_cyto_json(nl, el, paths.cyto_json)
+        for path in (paths.cyto_json_gz, paths.cyto_json_br):
+            if path:
+                compress_file(paths.cyto_json, path)
+    if paths.meta_json:
+        write_meta_data(nl, el, paths.meta_json)
+    if paths.graphml:
+        nx.write_graphml(network_graph(nl, el), paths.graphml)
+    if paths.gexf:
+        nx.write_gexf(network_graph(nl, el), paths.gexf)
+
+
+def network_graph(nl: pd.DataFrame, el: pd.DataFrame) -> nx.MultiDiGraph:
+    G = nx.from_pandas_edgelist(el, source='source', target='target', edge_attr=True,
+                                create_using=nx.MultiDiGraph())
+    G.add_nodes_from((row['id'], {k: v for k, v in row.items() if k != 'id' and pd.notna(v)})
+                     for row in nl.to_dict('records'))
+    return G
+
+
+def fanout(nl: pd.DataFrame, el: pd.DataFrame, folder: str) -> None:
+    # Add one format at a time and time both routes.
+    full = ExportPaths(nodes_csv=os.path.join(folder, 'nodes.csv'),
+                       edges_csv=os.path.join(folder, 'edges.csv'),
+                       cyto_json=os.path.join(folder, 'fanout.json'),
+                       meta_json=os.path.join(folder, 'meta.json'),
+                       graphml=os.path.join(folder, 'network.graphml'),
+                       gexf=os.path.join(folder, 'network.gexf')).with_compressed_cyto()
+    fields = [field for field in ExportPaths._fields if getattr(full, field)]
+    for count in range(1, len(fields) + 1):
+        paths = ExportPaths(**{field: getattr(full, field) for field in fields[:count]})
+        if paths.cyto_json is None:
+            paths = paths._replace(cyto_json_gz=None, cyto_json_br=None)
+        start = time.perf_counter()
+        separate_exports(nl, el, paths)
+        separate = time.perf_counter() - start
+        start = time.perf_counter()
+        write_exports(nl, el, paths)
+        single = time.perf_counter() - start
+        print(f"{'+ ' + fields[count - 1]:<24} separate {separate:>8.3f}s  single pass {single:>8.3f}s")
+
+    expected = pd.read_csv(full.nodes_csv, dtype=str, keep_default_na=False)
+    separate_exports(nl, el, full._replace(nodes_csv=os.path.join(folder, 'separate.csv')))
+    pd.testing.assert_frame_equal(
+        pd.read_csv(os.path.join(folder, 'separate.csv'), dtype=str, keep_default_na=False), expected)
+    G = nx.read_graphml(full.graphml)
+    assert (G.number_of_nodes(), G.number_of_edges()) == (len(nl), len(el))
+    G = nx.read_gexf(full.gexf)
+    assert (G.number_of_nodes(), G.number_of_edges()) == (len(nl), len(el))
+    print("single-pass CSV matches, GraphML and GEXF load with every node and edge")
+
+
+def scaled(df: pd.DataFrame, scale: int, id_columns) -> pd.DataFrame:
+    # Stack `scale` copies with distinct ids, so the payload grows linearly.
+    copies = []
+    for i in range(scale):
+        copy = df.copy()
+        for column in id_columns:
+            copy[column] = copy[column].astype(str) + (f'#{i}' if i else '')
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--nodes', default='outputs/nodes.csv')
+    parser.add_argument('--edges', default='outputs/edges.csv')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='Stack this many copies of the network.')
+    args = parser.parse_args()
+
+    nl = scaled(pd.read_csv(args.nodes, dtype={'id': str}), args.scale, ['id'])
+    el = scaled(pd.read_csv(args.edges, dtype={'source': str, 'target': str}), args.scale,
+                ['source', 'target', 'id'])
+    print(f"{len(nl):,} nodes, {len(el):,} edges")
+
+    with tempfile.TemporaryDirectory() as folder:
+        legacy = os.path.join(folder, 'legacy.json')
+        streamed = os.path.join(folder, 'network-data.json')
+        measured('dict + json.dump(indent=4)', legacy, legacy_export, nl, el)
+        measured('streaming, compact', streamed, write_cyto_json, nl, el)
+        for path in [legacy + '.gz'] + compressed_paths(streamed):
+            measured(f'{os.path.basename(path)}', path, compress_file,
+                     legacy if path.startswith(legacy) else streamed)
+
+        with open(legacy) as f:
+            expected = json.load(f)
+        with open(streamed) as f:
+            assert json.load(f) == expected, "streaming export does not match the original"
+        print("streaming export parses to the same document")
+
+        fanout(nl, el, folder)
+
+        ego = os.path.join(folder, 'ego')
+        start = time.perf_counter()
+        files = write_ego_shards(nl, el, ego)
+        seconds = time.perf_counter() - start
+        tracemalloc.start()
+        write_ego_shards(nl, el, ego)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        with open(files[0]) as f:
+            lengths = pd.Series([entry[2] for entry in json.load(f)['nodes'].values()])
+        print(f"{'ego shards':<24} {seconds:>8.3f}s  peak {peak / 2**20:>8.1f} MiB  "
+              f"{len(files) - 1} shards, index {os.path.getsize(files[0]) / 2**10:.0f} KiB")
+        print(f"{'ego record size':<24} median {lengths.median() / 2**10:.1f} KiB, "
+              f"p99 {lengths.quantile(0.99) / 2**10:.1f} KiB, max {lengths.max() / 2**10:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark (and equivalence check) for the flow attribution to water sources.
+
+Attributes the water of every node to the sources it comes from. Compares a
+pure-Python fixed point (every node's shares recomputed from its sellers' with
+dicts, sweep after sweep until nothing changes) against
+`twnet.flows.attribute_flows` with its sparse LU solve and its iterated sparse
+product, and checks that every node gets the same shares. The network is the
+latest snapshot in `outputs/`; `--copies` stacks copies of it (sharing the
+water sources) to time the sparse methods on hundreds of thousands of edges,
+where the Python fixed point is skipped.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_flows --folder outputs
+    python -m benchmarks.bench_flows --copies 100
+"""
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from twnet.flows import METHODS, attribute_flows
+from twnet.graphs import latest_snapshot, read_snapshot_table, snapshot_files
+from twnet.reconcile import parse_volumes
+from twnet.registry import WATER_SOURCE
+
+
+def python_flows(nl: pd.DataFrame, el: pd.DataFrame, tol: float = 1e-13) -> pd.DataFrame:
+    # The same rules as twnet.flows, one node and one seller at a time.
+    sources = set(nl.loc[nl['preliminary_type'] == WATER_SOURCE, 'id'].astype(str))
+    sellers = defaultdict(lambda: defaultdict(float))
+    for source, target, volume in zip(el['source'].astype(str), el['target'].astype(str),
+                                      parse_volumes(el['yearly_volume'])):
+        if volume > 0 and source != target and target not in sources:
+            sellers[target][source] += volume
+    shares = {source: {source: 1.0} for source in sources}
+    while True:
+        change = 0.0
+        for node, bought in sellers.items():
+            inflow = sum(bought.values())
+            mix = defaultdict(float)
+            for seller, volume in bought.items():
+                for origin, share in shares.get(seller, {}).items():
+                    mix[origin] += volume / inflow * share
+            before = shares.get(node, {})
+            change = max([change] + [abs(share - before.get(origin, 0.0)) for origin, share in mix.items()])
+            shares[node] = dict(mix)
+        if change <= tol:
+            break
+    return pd.DataFrame([(node, origin, share) for node, mix in shares.items() if node not in sources
+                         for origin, share in mix.items() if share > 0], columns=['id', 'source', 'share'])
+
+
+def stacked(nl: pd.DataFrame, el: pd.DataFrame, copies: int):
+    # Stack `copies` copies of the network with distinct ids, but the same
+    # water sources.
+    sources = set(nl.loc[nl['preliminary_type'] == WATER_SOURCE, 'id'].astype(str))
+    nodes, edges = [nl[nl['preliminary_type'] == WATER_SOURCE]], []
+    for i in range(copies):
+        suffix = f'#{i}' if i else ''
+        copy = nl[nl['preliminary_type'] != WATER_SOURCE].copy()
+        copy['id'] = copy['id'].astype(str) + suffix
+        nodes.append(copy)
+        copy = el.copy()
+        for column in ('source', 'target'):
+            ids = copy[column].astype(str)
+            copy[column] = ids.where(ids.isin(sources), ids + suffix)
+        edges.append(copy)
+    return pd.concat(nodes, ignore_index=True), pd.concat(edges, ignore_index=True)
+
+
+def largest_difference(expected: pd.DataFrame, found: pd.DataFrame) -> float:
+    both = expected.merge(found, on=['id', 'source'], how='outer', suffixes=('_expected', '_found')).fillna(0.0)
+    return float(np.abs(both['share_expected'] - both['share_found']).max()) if len(both) else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--folder', default='outputs')
+    parser.add_argument('--date', default=None, help='Snapshot date, by default the latest.')
+    parser.add_argument('--copies', type=int, default=1, help='Stack this many copies of the network.')
+    args = parser.parse_args()
+
+    date = args.date or latest_snapshot(args.folder)
+    edges_path, nodes_path = snapshot_files(args.folder, date)
+    nl, el = read_snapshot_table(nodes_path), read_snapshot_table(edges_path)
+    if args.copies > 1:
+        nl, el = stacked(nl, el, args.copies)
+    print(f"snapshot {date} x{args.copies}: {len(nl)} nodes, {len(el)} edges")
+
+    results = {}
+    for method in METHODS:
+        start = time.perf_counter()
+        results[method] = attribute_flows(nl, el, method=method)
+        print(f"{method:<16} {time.perf_counter() - start:>8.3f}s")
+
+    expected = None
+    if args.copies == 1:
+        start = time.perf_counter()
+        expected = python_flows(nl, el)
+        print(f"{'python':<16} {time.perf_counter() - start:>8.3f}s")
+
+    solved, iterated = (results[method] for method in METHODS)
+    assert largest_difference(solved.shares, iterated.shares) < 1e-9
+    assert (solved.nodes['flow_sources'] == iterated.nodes['flow_sources']).all()
+    if expected is not None:
+        assert largest_difference(expected, solved.shares) < 1e-9
+    print(f"shares match across methods{' and the Python fixed point' if expected is not None else ''} "
+          f"({len(solved.shares)} node-source pairs)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark (and equivalence check) for the degree of fragmentation.
+
+Compares the original all-pairs implementation from `fragmentation.py`
+against `twnet.fragmentation` (batched BFS, single process and process pool)
+and the sampled estimator, on an exported edge list. Also times single-node
+removal scenarios computed incrementally from a baseline, checking a few of
+them against a full recomputation.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_fragmentation --edges outputs/edges.csv --workers 4
+"""
+import argparse
+import math
+import os
+import time
+
+import networkx as nx
+import pandas as pd
+
+from twnet.fragmentation import (calculate_degree_of_fragmentation,
+                                 estimate_degree_of_fragmentation, fragmentation_baseline,
+                                 graph_arrays, removal_scenarios)
+
+
+def reference_degree_of_fragmentation(mod_G):
+    # Reference copy of the all-pairs implementation previously used by fragmentation.py.
+    n = len(mod_G.nodes)
+    if n <= 1:
+        return 0.0
+    denominator = n * (n - 1)
+    sum_of_reciprocal_distances = 0.0
+    distance_matrix = dict(nx.all_pairs_shortest_path_length(mod_G))
+    for source in mod_G.nodes:
+        if source in distance_matrix:
+            for destination in mod_G.nodes:
+                if source != destination and destination in distance_matrix[source]:
+                    distance = distance_matrix[source][destination]
+                    if distance > 0:
+                        sum_of_reciprocal_distances += 1.0 / distance
+    return (2.0 * sum_of_reciprocal_distances) / denominator
+
+
+def timed(label, fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    print(f"{label:<28} {time.perf_counter() - start:>9.3f}s  {value}")
+    return value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--edges', default='outputs/edges.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--sample', type=int, default=500)
+    parser.add_argument('--scenarios', type=int, default=300,
+                        help='Single-node removal scenarios (highest out-degree first).')
+    parser.add_argument('--skip-reference', action='store_true',
+                        help='Do not run the all-pairs reference implementation.')
+    args = parser.parse_args()
+
+    edges = pd.read_csv(args.edges, usecols=['source', 'target'], dtype=str)
+    G = nx.from_pandas_edgelist(edges, source='source', target='target', create_using=nx.DiGraph)
+    print(f"{args.edges}: {G.number_of_nodes():,} nodes, {G.number_of_edges():,} edges")
+
+    exact = timed('batched BFS (1 process)', calculate_degree_of_fragmentation, G)
+    parallel = timed(f'batched BFS ({args.workers} processes)', calculate_degree_of_fragmentation,
+                     G, workers=args.workers)
+    assert math.isclose(exact, parallel, rel_tol=1e-12)
+    timed(f'sampled ({args.sample} sources)', estimate_degree_of_fragmentation,
+          graph_arrays(G), args.sample, seed=0)
+
+    start = time.perf_counter()
+    baseline = fragmentation_baseline(G)
+    print(f"{'removal baseline':<28} {time.perf_counter() - start:>9.3f}s  {baseline.value}")
+    candidates = sorted(G.nodes, key=G.out_degree, reverse=True)[:args.scenarios]
+    start = time.perf_counter()
+    scenarios = removal_scenarios(baseline, candidates)
+    print(f"{f'{len(candidates)} removal scenarios':<28} {time.perf_counter() - start:>9.3f}s  "
+          f"min {scenarios.min()} ({scenarios.idxmin()})")
+    for node in candidates[:3]:
+        H = G.copy()
+        H.remove_node(node)
+        assert math.isclose(scenarios[node], calculate_degree_of_fragmentation(H), rel_tol=1e-12)
+    assert math.isclose(baseline.value, exact, rel_tol=1e-12)
+
+    if not args.skip_reference:
+        reference = timed('all-pairs reference', reference_degree_of_fragmentation, G)
+        assert math.isclose(exact, reference, rel_tol=1e-12), (exact, reference)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark (and equivalence check) for loading a network snapshot as a graph.
+
+Compares the original route in `fragmentation.py` (`nx.from_pandas_edgelist`,
+then one `iterrows` row per node to attach its attributes) against
+`twnet.graphs.build_graph` and a cached `twnet.graphs.load_graph`, and checks
+that the nodes, edges and node attributes are the same.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_graphs --folder outputs
+"""
+import argparse
+import math
+import tempfile
+import time
+
+import networkx as nx
+import pandas as pd
+
+from twnet.graphs import build_graph, latest_snapshot, load_graph, snapshot_files
+
+
+def legacy_graph(edges_path: str, nodes_path: str) -> nx.DiGraph:
+    # The loading previously done in fragmentation.py (from the CSVs).
+    edges = pd.read_csv(edges_path, usecols=['source', 'target'], dtype={'source': str, 'target': str})
+    nodes = pd.read_csv(nodes_path, dtype={'id': str}).set_index('id')
+    G = nx.from_pandas_edgelist(edges, source='source', target='target', create_using=nx.DiGraph)
+    for node_id, row in nodes.iterrows():
+        if node_id in G:
+            G.nodes[node_id].update(row.to_dict())
+    return G
+
+
+def same_value(a, b) -> bool:
+    # Missing values may be NaN (CSV) or pd.NA (nullable Parquet columns).
+    if pd.api.types.is_scalar(a) and pd.api.types.is_scalar(b) and pd.isna(a) and pd.isna(b):
+        return True
+    # pandas' default CSV float parser can be off in the last digit.
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-12)
+    return a == b
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--folder', default='outputs')
+    parser.add_argument('--date', default=None, help='Snapshot date, by default the latest.')
+    args = parser.parse_args()
+
+    date = args.date or latest_snapshot(args.folder)
+    edges_path, nodes_path = snapshot_files(args.folder, date)
+    stem = edges_path.rsplit('.', 1)[0]
+    print(f"snapshot {date}: {edges_path}, {nodes_path}")
+
+    start = time.perf_counter()
+    expected = legacy_graph(stem + '.csv', nodes_path.rsplit('.', 1)[0] + '.csv')
+    print(f"{'iterrows':<16} {time.perf_counter() - start:>8.3f}s")
+
+    start = time.perf_counter()
+    G = build_graph(edges_path, nodes_path)
+    print(f"{'bulk':<16} {time.perf_counter() - start:>8.3f}s")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        load_graph(args.folder, date, cache_dir)
+        start = time.perf_counter()
+        cached = load_graph(args.folder, date, cache_dir)
+        print(f"{'cached':<16} {time.perf_counter() - start:>8.3f}s")
+
+    for graph in (G, cached):
+        assert list(graph.nodes) == list(expected.nodes)
+        assert list(graph.edges) == list(expected.edges)
+        for node, attributes in expected.nodes(data=True):
+            assert all(same_value(value, graph.nodes[node].get(key)) for key, value in attributes.items()), node
+    print("nodes, edges and node attributes match the iterrows route")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark (and equivalence check) for the whole-network metrics.
+
+Builds a synthetic edge list and compares the networkx route (building a
+`DiGraph`, a dict loop over `G.degree()`, components of `G.to_undirected()`,
+`nx.density`, `nx.reciprocity`, strong components and sampled betweenness)
+against `twnet.metrics.graph_metrics`, checking that the counts, density,
+reciprocity and degree histogram agree.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_metrics --rows 200000 --pivots 64
+"""
+import argparse
+import time
+from collections import Counter
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from twnet.metrics import graph_metrics
+
+
+def synthetic_edges(rows: int, seed: int) -> pd.DataFrame:
+    # A few hub sources (aquifers, basins) feeding many systems, plus sales
+    # between systems, some of them in both directions.
+    rng = np.random.default_rng(seed)
+    n_systems = max(rows // 3, 10)
+    hubs = np.array([f'Aquifer {i}' for i in range(50)], dtype=object)
+    systems = np.arange(n_systems).astype(str).astype(object)
+    intake = rows * 2 // 3
+    source = np.concatenate([hubs[rng.integers(0, len(hubs), intake)],
+                             systems[rng.integers(0, n_systems, rows - intake)]])
+    target = np.concatenate([systems[rng.integers(0, n_systems, intake)],
+                             systems[rng.integers(0, n_systems, rows - intake)]])
+    return pd.DataFrame({'source': source, 'target': target})
+
+
+def networkx_metrics(el: pd.DataFrame, pivots: int) -> dict:
+    # The networkx route previously used by the notebooks (plus the new metrics).
+    G = nx.from_pandas_edgelist(el, source='source', target='target', create_using=nx.DiGraph())
+    k_Pk = {}
+    for value in dict(G.degree()).values():
+        k_Pk[value] = k_Pk.get(value, 0) + 1
+    return {
+        'nodes': G.number_of_nodes(),
+        'edges': G.number_of_edges(),
+        'density': nx.density(G),
+        'reciprocity': nx.reciprocity(G),
+        'weak_components': nx.number_connected_components(G.to_undirected()),
+        'strong_components': nx.number_strongly_connected_components(G),
+        'total_degree': k_Pk,
+        'betweenness': nx.betweenness_centrality(G, k=pivots, seed=0),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--pivots', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    el = synthetic_edges(args.rows, args.seed)
+    print(f"{len(el):,} edges")
+
+    start = time.perf_counter()
+    expected = networkx_metrics(el, args.pivots)
+    print(f"{'networkx':<12} {time.perf_counter() - start:>8.3f}s")
+
+    start = time.perf_counter()
+    metrics = graph_metrics(el, pivots=args.pivots)
+    print(f"{'twnet':<12} {time.perf_counter() - start:>8.3f}s")
+
+    for name in ('nodes', 'edges', 'weak_components', 'strong_components'):
+        assert metrics[name] == expected[name], (name, metrics[name], expected[name])
+    for name in ('density', 'reciprocity'):
+        assert np.isclose(metrics[name], expected[name]), (name, metrics[name], expected[name])
+    histogram = metrics['degree_histograms']['total']
+    assert Counter(dict(zip(histogram['degree'], histogram['count']))) == Counter(expected['total_degree'])
+    print("counts, density, reciprocity and degree histogram match networkx")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark (and equivalence check) for node name resolution.
+
+Writes synthetic retail, bridge, intake and sales files (several rows per
+survey number, as in the TWDB files, some of them without a name), then
+compares the original merge cascade of `enrich_nodes` against the current
+`NameIndex`-based one: the tidy node lists must be identical, and the row
+count of the cascade must match `name_merge_report`.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_names --nodes 20000 --rows-per-node 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from twnet.loaders import read_intake, read_sales
+from twnet.nodes import enrich_nodes, get_retail_nodes, get_survey_nodes, name_merge_report, tidy_nodes
+
+
+def legacy_enrich_nodes(nodes, retail_df_path, survey_df_path, intake_df_path, sales_df_path, year=None):
+    # Reference copy of the merge cascade previously used by enrich_nodes.
+    retail = get_retail_nodes(retail_df_path, year=year)
+    survey_no = get_survey_nodes(survey_df_path)
+    nodes_retail_no = (nodes
+                      .merge(retail, on='id', how='left')
+                      .merge(survey_no, on='id', how='left'))
+    nodes_retail_no['unified_name'] = nodes_retail_no.apply(
+        lambda x: x['sur_name'] if x['preliminary_type'] == 'water system' else x['id'],
+        axis=1)
+    nodes_retail_no['unified_name'] = nodes_retail_no.apply(
+        lambda x: x['retail_name'] if pd.isnull(x['unified_name']) else x['unified_name'],
+        axis=1)
+    intake_missing = (read_intake(intake_df_path)
+                      .rename(columns={'TWDB Survey No': 'id', 'PWS Name': 'intake_name'})[['id', 'intake_name']])
+    intake_sellers = (read_intake(intake_df_path)
+                      .rename(columns={'Seller Survey Number': 'id', 'Seller Name': 'intake_seller_name'})
+                      .dropna(subset=['intake_seller_name'])
+                      .groupby('id').first().reset_index()[['id', 'intake_seller_name']]
+                      .assign(intake_seller_name=lambda x: x['intake_seller_name'].str.replace(r'\s\d+$', '', regex=True)))
+    buyer_missing = (read_sales(sales_df_path)
+                     .rename(columns={'Buyer Survey No': 'id', 'Buyer Name': 'buyer_name'})[['id', 'buyer_name']])
+    seller_missing = (read_sales(sales_df_path)
+                      .rename(columns={'TWDB Seller Survey No': 'id', 'PWS Name': 'seller_name'})[['id', 'seller_name']])
+    merged_data = (nodes_retail_no
+                   .merge(intake_missing, on='id', how='left')
+                   .merge(buyer_missing, on='id', how='left')
+                   .merge(seller_missing, on='id', how='left')
+                   .merge(intake_sellers, on='id', how='left'))
+    merged_data['unified_name'] = merged_data[['unified_name', 'intake_name', 'buyer_name', 'seller_name', 'intake_seller_name']].bfill(axis=1).iloc[:, 0]
+    merged_data['unified_name'] = merged_data['unified_name'].apply(
+        lambda entity: entity.strip().title() if isinstance(entity, str) else entity)
+    return merged_data
+
+
+def _names(rng: np.random.Generator, ids: np.ndarray, missing: float) -> np.ndarray:
+    names = np.array([f' water system {i} {rng.integers(1, 4)} ' for i in ids], dtype=object)
+    names[rng.random(len(ids)) < missing] = None
+    return names
+
+
+def write_inputs(folder: str, n_nodes: int, rows_per_node: int, seed: int) -> dict:
+    """
+    Write synthetic input files to `folder` and return their paths.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(n_nodes) * 10
+
+    def sample(share: float, rows: int) -> np.ndarray:
+        # Ids of a `share` of the nodes, each repeated about `rows` times.
+        chosen = rng.choice(ids, int(n_nodes * share), replace=False)
+        return rng.choice(chosen, int(len(chosen) * rows))
+
+    retail_ids = sample(0.6, 1.5)
+    bridge_ids = sample(0.5, 1.2)
+    intake_ids = sample(0.8, rows_per_node)
+    seller_ids = rng.choice(ids, len(intake_ids))
+    sales_ids = sample(0.4, rows_per_node / 2)
+    buyer_ids = rng.choice(ids, len(sales_ids))
+
+    frames = {
+        'retail': pd.DataFrame({'Year': rng.choice([2022, 2023], len(retail_ids)), 'TWDB Survey No': retail_ids,
+                                'PWS Name': _names(rng, retail_ids, 0.05), ' Population Served ': retail_ids % 977}),
+        'bridge': pd.DataFrame({'TWDB Survey Number': bridge_ids, 'PWS Name': _names(rng, bridge_ids, 0.3),
+                                'TCEQ PWS Code': [f'TX{i:07d}' for i in bridge_ids]}),
+        'intake': pd.DataFrame({'Year': 2022, 'TWDB Survey No': intake_ids, 'PWS Name': _names(rng, intake_ids, 0.2),
+                                'Water Type': 'Ground Water', 'Purchased / Self-Supplied': 'Purchased',
+                                'Source Basin': 'BRAZOS', 'Aquifer Source': None, 'Surface Water Source': None,
+                                'Seller Survey Number': seller_ids, 'Seller Name': _names(rng, seller_ids, 0.5),
+                                'Total Intake (Gallons)': '1,000'}),
+        'sales': pd.DataFrame({'Year': 2022, 'TWDB Seller Survey No': sales_ids, 'PWS Name': _names(rng, sales_ids, 0.2),
+                               'Buyer Survey No': buyer_ids, 'Buyer Name': _names(rng, buyer_ids, 0.2),
+                               'Buyer Water Type': 'Ground Water', 'Buyer Volume Reported': '1,000'}),
+    }
+    paths = {}
+    for name, frame in frames.items():
+        paths[name] = os.path.join(folder, f'{name}.csv')
+        frame.to_csv(paths[name], index=False)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--nodes', type=int, default=20_000)
+    parser.add_argument('--rows-per-node', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_inputs(folder, args.nodes, args.rows_per_node, args.seed)
+        ids = pd.Series(np.arange(args.nodes) * 10).astype(str)
+        nodes = pd.DataFrame({'id': pd.concat([ids, pd.Series(['BRAZOS BASIN (Source Unknown)'])], ignore_index=True)})
+        nodes['preliminary_type'] = np.where(nodes['id'].str.isdigit(), 'water system', 'water source')
+        inputs = (paths['retail'], paths['bridge'], paths['intake'], paths['sales'])
+        # Parse the files once, so both versions are timed on cached frames.
+        legacy_enrich_nodes(nodes.head(1), *inputs, year=2022)
+
+        start = time.perf_counter()
+        legacy = legacy_enrich_nodes(nodes, *inputs, year=2022)
+        print(f"{'merge cascade':<16} {time.perf_counter() - start:>8.3f}s  {len(legacy):,} rows")
+
+        start = time.perf_counter()
+        nl = enrich_nodes(nodes, *inputs, year=2022)
+        print(f"{'name index':<16} {time.perf_counter() - start:>8.3f}s  {len(nl):,} rows")
+
+        columns = ['id', 'unified_name', 'preliminary_type', 'Year', ' Population Served ', 'TCEQ PWS Code']
+        pd.testing.assert_frame_equal(tidy_nodes(nl, columns).reset_index(drop=True),
+                                      tidy_nodes(legacy, columns).reset_index(drop=True))
+        report = name_merge_report(nodes, *inputs, year=2022)
+        assert report['cascade_rows'] == len(legacy), (report['cascade_rows'], len(legacy))
+        print(f"tidy node lists are identical; {report['rows_avoided']:,} intermediate rows avoided")
+
+
+if __name__ == '__main__':
+    main()
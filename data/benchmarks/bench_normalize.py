@@ -0,0 +1,77 @@
+"""
+Benchmark (and equivalence check) for entity-name normalization.
+
+Compares the element-wise `clean_entity` (strip + title-case) applied with
+`Series.apply` against `twnet.normalize.normalize_entities` on columns of
+repeated names, with a cold memo (every distinct name is normalized) and a
+warm one (names loaded from a saved names file, as in a later run).
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_normalize --rows 100000 1000000 --distinct 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from twnet.normalize import clear_names, load_names, normalize_entities, save_names
+
+
+def clean_entity(entity):
+    # Reference copy of the element-wise cleaning previously used by the builders.
+    if isinstance(entity, str):
+        entity = entity.strip()
+        entity = entity.title()
+    return entity
+
+
+def make_names(rows: int, distinct: int, seed: int = 0) -> pd.Series:
+    """
+    Build a column of `rows` names drawn from `distinct` raw spellings, some missing.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f' {"OGALLALA AQUIFER" if i % 3 else "city of"} {i} ' for i in range(distinct)] + [None],
+                          dtype=object)
+    return pd.Series(vocabulary[rng.integers(0, distinct + 1, rows)], dtype=object)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--distinct', type=int, default=5_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        names_file = os.path.join(folder, 'entity-names.json')
+        for rows in args.rows:
+            names = make_names(rows, args.distinct)
+
+            start = time.perf_counter()
+            legacy = names.apply(clean_entity)
+            legacy_seconds = time.perf_counter() - start
+
+            clear_names()
+            start = time.perf_counter()
+            cold = normalize_entities(names)
+            cold_seconds = time.perf_counter() - start
+            save_names(names_file)
+
+            clear_names()
+            load_names(names_file)
+            start = time.perf_counter()
+            warm = normalize_entities(names)
+            warm_seconds = time.perf_counter() - start
+
+            pd.testing.assert_series_equal(cold, legacy)
+            pd.testing.assert_series_equal(warm, legacy)
+            print(f"{rows:>12,} rows  apply {legacy_seconds:>7.3f}s  "
+                  f"cold {cold_seconds:>7.3f}s  warm {warm_seconds:>7.3f}s")
+    print("normalized names match the element-wise cleaning")
+
+
+if __name__ == '__main__':
+    main()
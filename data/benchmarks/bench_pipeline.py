@@ -0,0 +1,106 @@
+"""
+Benchmark of every pipeline stage on synthetic inputs at several scales.
+
+Writes synthetic survey files (see `benchmarks.synthetic`) at each scale and
+runs the notebook's stages on one year of them: `create_intake_el`,
+`create_sales_el`, `combine_edges`, `create_nodes_list`, `enrich_nodes`,
+`remove_parallel_edges`, `create_cyto_json` and
+`calculate_degree_of_fragmentation`. Every stage is timed on its own, then
+run again under tracemalloc for its peak memory, with the input loader's cache
+and the name memo cleared before each run so every run parses and normalizes
+from scratch. Results can be saved as CSV to compare runs.
+
+The all-pairs fragmentation grows with nodes x edges, so it only runs up to
+`--fragmentation-max`.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_pipeline --scales 1 10 100 --out bench-pipeline.csv
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+import networkx as nx
+import pandas as pd
+
+from benchmarks.synthetic import SCALES, write_survey
+from twnet.edges import combine_edges, create_intake_el, create_sales_el, remove_parallel_edges
+from twnet.export import create_cyto_json
+from twnet.fragmentation import calculate_degree_of_fragmentation
+from twnet.loaders import clear_cache
+from twnet.nodes import create_nodes_list, enrich_nodes, tidy_nodes
+from twnet.normalize import clear_names
+
+
+def _fresh() -> None:
+    # Nothing parsed or normalized in an earlier run is reused.
+    clear_cache()
+    clear_names()
+
+
+def _size(value) -> int:
+    if isinstance(value, dict):
+        return len(value['elements']['nodes']) + len(value['elements']['edges'])
+    return len(value) if hasattr(value, '__len__') else 1
+
+
+def measured(results: List[dict], scale: int, stage: str, fn: Callable, *args, **kwargs):
+    _fresh()
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    _fresh()
+    tracemalloc.start()
+    fn(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results.append({'scale': scale, 'stage': stage, 'rows': _size(value),
+                    'seconds': seconds, 'peak_mib': peak / 2**20})
+    print(f"{scale:>6}x  {stage:<34} {_size(value):>12,}  {seconds:>9.3f}s  peak {peak / 2**20:>9.1f} MiB")
+    return value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES[:3]),
+                        help=f'Multiples of the real data size, e.g. {" ".join(map(str, SCALES))}.')
+    parser.add_argument('--year', type=int, default=2022)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fragmentation-max', type=int, default=10,
+                        help='Largest scale at which the degree of fragmentation is computed.')
+    parser.add_argument('--out', default=None, help='Save the results to this CSV file.')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'scale':>7}  {'stage':<34} {'rows':>12}  {'time':>10}  {'memory':>14}")
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as folder:
+            start = time.perf_counter()
+            inputs = write_survey(folder, scale, args.seed)
+            print(f"{scale:>6}x  {'(synthetic inputs written)':<34} {'':>12}  {time.perf_counter() - start:>9.3f}s")
+            intake_el = measured(results, scale, 'create_intake_el', create_intake_el, inputs.intake,
+                                 el=True, year=args.year)
+            sales_el = measured(results, scale, 'create_sales_el', create_sales_el, inputs.sales,
+                                el=True, year=args.year)
+            el = measured(results, scale, 'combine_edges', combine_edges, intake_el, sales_el)
+            nodes = measured(results, scale, 'create_nodes_list', create_nodes_list, el, inputs.intake)
+            nl = measured(results, scale, 'enrich_nodes', enrich_nodes, nodes, inputs.retail, inputs.bridge,
+                          inputs.intake, inputs.sales, year=args.year)
+            el_noparallel = measured(results, scale, 'remove_parallel_edges', remove_parallel_edges, el)
+            measured(results, scale, 'create_cyto_json', create_cyto_json, tidy_nodes(nl), el_noparallel)
+            if scale <= args.fragmentation_max:
+                G = nx.from_pandas_edgelist(el_noparallel, source='source', target='target',
+                                            create_using=nx.DiGraph)
+                measured(results, scale, 'calculate_degree_of_fragmentation',
+                         calculate_degree_of_fragmentation, G)
+
+    if args.out:
+        pd.DataFrame(results).to_csv(args.out, index=False)
+        print(f"results saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
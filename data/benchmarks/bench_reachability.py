@@ -0,0 +1,57 @@
+"""
+Benchmark (and equivalence check) for upstream and downstream reachability.
+
+Finds every node's upstream sources and downstream dependents. Compares one
+`nx.ancestors` and one `nx.descendants` traversal per node (the ad-hoc way)
+against `twnet.reachability.Reachability.build`, which condenses the graph and
+propagates bitsets once, and checks that every node gets the same sources and
+dependents. The network is the latest snapshot in `outputs/`.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_reachability --folder outputs
+"""
+import argparse
+import time
+
+import networkx as nx
+
+from twnet.graphs import latest_snapshot, read_snapshot_table, snapshot_files
+from twnet.reachability import Reachability
+from twnet.registry import WATER_SOURCE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--folder', default='outputs')
+    parser.add_argument('--date', default=None, help='Snapshot date, by default the latest.')
+    args = parser.parse_args()
+
+    date = args.date or latest_snapshot(args.folder)
+    edges_path, nodes_path = snapshot_files(args.folder, date)
+    nl, el = read_snapshot_table(nodes_path), read_snapshot_table(edges_path)
+    print(f"snapshot {date}: {len(nl)} nodes, {len(el)} edges")
+
+    G = nx.from_pandas_edgelist(el, source='source', target='target', create_using=nx.DiGraph)
+    G.add_nodes_from(nl['id'])
+    sources = set(nl.loc[nl['preliminary_type'] == WATER_SOURCE, 'id'])
+
+    start = time.perf_counter()
+    expected = {node: (sources & nx.ancestors(G, node), nx.descendants(G, node)) for node in G}
+    print(f"{'per-node traversals':<22} {time.perf_counter() - start:>8.3f}s")
+
+    start = time.perf_counter()
+    reach = Reachability.build(nl, el)
+    print(f"{'condensed, one pass':<22} {time.perf_counter() - start:>8.3f}s")
+
+    summary = reach.summary().set_index('id')
+    for node, (upstream, downstream) in expected.items():
+        assert set(reach.upstream_sources(node)) == upstream, node
+        assert set(reach.downstream_dependents(node)) == downstream, node
+        assert summary.loc[node, 'upstream_sources'] == len(upstream), node
+        assert summary.loc[node, 'downstream_dependents'] == len(downstream), node
+    print("upstream sources and downstream dependents match the traversals")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark (and equivalence check) for parallel-edge reconciliation.
+
+Builds a synthetic edge list with millions of rows, a share of them parallel
+intake/sale pairs, and compares the notebook's original groupby-transform
+filter against `reconcile_parallel_edges` with the 'prefer_intake' policy
+(checking both keep the same rows), then times every policy.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_reconcile --rows 2000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from twnet.reconcile import POLICIES, reconcile_parallel_edges
+
+
+def legacy_remove_parallel_edges(el: pd.DataFrame) -> pd.DataFrame:
+    # Reference copy of the filter previously used by network-data-maker.py.
+    el = el.copy()
+    el['pedge_count'] = el.groupby(['source', 'target'])['type'].transform('count')
+    return el[((el['pedge_count'] == 1) | ((el['pedge_count'] > 1) & (el['type'] == 'intake')))].drop(columns=['pedge_count'])
+
+
+def synthetic_edges(rows: int, parallel_share: float, seed: int) -> pd.DataFrame:
+    # Survey-number-like string ids; `parallel_share` of the rows repeat an
+    # earlier pair, as a sale if the original was an intake and vice versa.
+    rng = np.random.default_rng(seed)
+    n_nodes = max(rows // 2, 2)
+    unique_rows = rows - int(rows * parallel_share)
+    source = rng.integers(0, n_nodes, unique_rows)
+    target = rng.integers(0, n_nodes, unique_rows)
+    kind = rng.random(unique_rows) < 0.6
+    repeat = rng.integers(0, unique_rows, rows - unique_rows)
+    source = np.concatenate([source, source[repeat]])
+    target = np.concatenate([target, target[repeat]])
+    kind = np.concatenate([kind, ~kind[repeat]])
+    volume = rng.integers(1_000, 5_000_000_000, rows)
+    return pd.DataFrame({
+        'source': pd.Index(source).astype(str),
+        'target': pd.Index(target).astype(str),
+        'id': [f'edge_{i}' for i in range(rows)],
+        'yearly_volume': [f' {v:,} ' for v in volume],
+        'type': np.where(kind, 'intake', 'sale'),
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--parallel-share', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    el = synthetic_edges(args.rows, args.parallel_share, args.seed)
+    print(f"{len(el):,} edges")
+
+    start = time.perf_counter()
+    legacy = legacy_remove_parallel_edges(el)
+    print(f"{'groupby-transform filter':<28} {time.perf_counter() - start:>8.3f}s  {len(legacy):,} kept")
+
+    for policy in POLICIES:
+        start = time.perf_counter()
+        reconciled = reconcile_parallel_edges(el, policy)
+        print(f"{policy:<28} {time.perf_counter() - start:>8.3f}s  {len(reconciled.edges):,} kept, "
+              f"{len(reconciled.dropped):,} dropped")
+        if policy == 'prefer_intake':
+            pd.testing.assert_frame_equal(reconciled.edges, legacy)
+    print("prefer_intake keeps the same rows as the original filter")
+
+
+if __name__ == '__main__':
+    main()
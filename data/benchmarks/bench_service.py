@@ -0,0 +1,165 @@
+"""
+Load test of the local graph query service (`twnet.service`).
+
+Starts the service on the latest snapshot in `outputs/` (in a separate
+process), or targets one already running with `--url`, then sends a mix of
+ego, 2-hop neighbourhood, upstream, downstream and search requests from
+several client threads over keep-alive connections. Nodes are drawn with a
+Zipf-like skew, as a few popular systems get most of the traffic, so the
+response cache sees repeated queries. Reports p50, p90, p99 and maximum
+latency per route and overall, the throughput, and the cache's counters.
+
+Before the load test, checks that `/ego` returns the same record as the ego
+shards written by `twnet.shards.write_ego_shards` for a sample of nodes.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_service --requests 20000 --clients 8
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from twnet.graphs import read_snapshot_table, snapshot_files
+from twnet.service import CACHE_SIZE, QueryGraph
+from twnet.shards import INDEX_FILE, write_ego_shards
+
+
+def start_service(folder: str, port: int, cache_size: int) -> subprocess.Popen:
+    # In its own process, so the clients do not compete with it for the GIL.
+    service = subprocess.Popen([sys.executable, '-m', 'twnet.service', '--folder', folder,
+                                '--port', str(port), '--cache-size', str(cache_size)],
+                               stdout=subprocess.DEVNULL)
+    while True:
+        try:
+            get(http.client.HTTPConnection('127.0.0.1', port), '/health')
+            return service
+        except ConnectionError:
+            if service.poll() is not None:
+                raise RuntimeError('The service exited on start.')
+            time.sleep(0.1)
+
+
+def get(connection: http.client.HTTPConnection, path: str) -> Tuple[int, bytes]:
+    connection.request('GET', path)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def check_ego(folder: str, date: str, url: str, sample: int) -> None:
+    edges_path, nodes_path = snapshot_files(folder, date)
+    nl, el = read_snapshot_table(nodes_path), read_snapshot_table(edges_path)
+    with tempfile.TemporaryDirectory() as folder:
+        write_ego_shards(nl, el, folder)
+        with open(os.path.join(folder, INDEX_FILE)) as f:
+            index = json.load(f)
+        connection = http.client.HTTPConnection(urlsplit(url).netloc)
+        for node_id in list(index['nodes'])[:sample]:
+            shard, offset, length = index['nodes'][node_id]
+            with open(os.path.join(folder, index['shards'][shard]), 'rb') as f:
+                f.seek(offset)
+                expected = f.read(length)
+            status, body = get(connection, '/ego?' + urlencode({'id': node_id}))
+            assert status == 200 and body == expected, node_id
+        connection.close()
+    print(f"/ego matches the ego shards for {min(sample, len(index['nodes']))} nodes")
+
+
+def requests_mix(ids: List[str], count: int, seed: int) -> List[Tuple[str, str]]:
+    rng = np.random.default_rng(seed)
+    # Zipf-like popularity over a shuffled order of the nodes.
+    popularity = 1.0 / np.arange(1, len(ids) + 1)
+    nodes = np.array(ids, dtype=object)[rng.permutation(len(ids))]
+    picks = nodes[rng.choice(len(ids), size=count, p=popularity / popularity.sum())]
+    routes = rng.choice(['ego', 'neighbourhood', 'upstream', 'downstream', 'search'], size=count,
+                        p=[0.4, 0.2, 0.15, 0.15, 0.1])
+    mix = []
+    for route, node_id in zip(routes, picks):
+        if route == 'neighbourhood':
+            query = {'id': node_id, 'hops': 2}
+        elif route == 'search':
+            query = {'q': str(node_id)[:4]}
+        else:
+            query = {'id': node_id}
+        mix.append((route, f'/{route}?{urlencode(query)}'))
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--folder', default='outputs')
+    parser.add_argument('--url', default=None, help='Service to test, by default one started here.')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE)
+    parser.add_argument('--check', type=int, default=500, help='Nodes whose /ego is checked against the shards.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = QueryGraph.from_snapshot(args.folder)
+    print(f"snapshot {graph.snapshot}: {graph.n} nodes, {len(graph.source)} edges, "
+          f"loaded in {time.perf_counter() - start:.3f}s")
+    url, service = args.url, None
+    if url is None:
+        service = start_service(args.folder, args.port, args.cache_size)
+        url = f'http://127.0.0.1:{args.port}'
+    try:
+        run(args, graph, url)
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+
+def run(args: argparse.Namespace, graph: QueryGraph, url: str) -> None:
+    if args.check:
+        check_ego(args.folder, graph.snapshot, url, args.check)
+
+    mix = requests_mix([str(label) for label in graph.registry.labels], args.requests, args.seed)
+    batches = [mix[i::args.clients] for i in range(args.clients)]
+
+    def client(batch: List[Tuple[str, str]]) -> List[Tuple[str, float]]:
+        connection = http.client.HTTPConnection(urlsplit(url).netloc)
+        timings = []
+        for route, path in batch:
+            sent = time.perf_counter()
+            status, _ = get(connection, path)
+            timings.append((route, time.perf_counter() - sent))
+            assert status == 200, (status, path)
+        connection.close()
+        return timings
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        timings = [timing for batch in pool.map(client, batches) for timing in batch]
+    elapsed = time.perf_counter() - start
+
+    routes = np.array([route for route, _ in timings])
+    latencies = np.array([seconds for _, seconds in timings]) * 1000
+    print(f"{'route':<14} {'requests':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+    for route in list(dict.fromkeys(routes.tolist())) + ['all']:
+        values = latencies if route == 'all' else latencies[routes == route]
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        print(f"{route:<14} {len(values):>9} {p50:>9.2f} {p90:>9.2f} {p99:>9.2f} {values.max():>9.2f}")
+    print(f"{len(timings)} requests from {args.clients} clients in {elapsed:.2f}s "
+          f"({len(timings) / elapsed:,.0f} requests/s)")
+
+    connection = http.client.HTTPConnection(urlsplit(url).netloc)
+    print(f"cache: {json.loads(get(connection, '/cache')[1])}")
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark (and equivalence check) for intake source resolution.
+
+Compares the original row-wise `process_source` rules, applied with
+`DataFrame.apply(axis=1)`, against `twnet.sources.resolve_intake_sources` on
+synthetic intake tables. Before timing, both results are cast to strings the
+way `create_intake_el` does and compared value for value.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_sources --sizes 100000 1000000 10000000
+
+The row-wise version is slow; use `--legacy-max` to skip it above a size.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from twnet.sources import resolve_intake_sources
+
+
+def process_source(row):
+    # Reference copy of the row-wise rules previously used by create_intake_el.
+    if row.get('Water Type') == "Reuse" and row.get('Purchased / Self-Supplied') == "Self-Supplied" :
+         return row.get("TWDB Survey No", None)
+    elif row.get('Purchased / Self-Supplied') == "Purchased" :
+        return row.get("Seller Survey Number", None)
+    elif row.get('Water Type') == "Ground Water" and row.get('Purchased / Self-Supplied') == "Self-Supplied":
+        if row.get('Aquifer Source') == "OTHER AQUIFER":
+            return row.get('Source Basin') + ' BASIN (Source Unknown)'
+        else:
+            return row.get('Aquifer Source')
+    elif row.get('Water Type') == "Surface Water" and row.get('Purchased / Self-Supplied') == "Self-Supplied":
+        if row.get('Surface Water Source') == "UNKNOWN":
+            return row.get('Source Basin') + ' BASIN (Source Unknown)'
+        else:
+            return row.get('Surface Water Source')
+
+
+def make_intake(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Build an intake-shaped table with `n` rows covering every rule branch.
+    """
+    rng = np.random.default_rng(seed)
+    aquifers = np.array(['OGALLALA AQUIFER', 'CARRIZO-WILCOX AQUIFER',
+                         'EDWARDS-TRINITY (PLATEAU) AQUIFER', 'GULF COAST AQUIFER',
+                         'OTHER AQUIFER'], dtype=object)
+    surfaces = np.array(['MEREDITH LAKE/RESERVOIR', 'LAKE TRAVIS',
+                         'TRINITY RIVER', 'UNKNOWN'], dtype=object)
+    basins = np.array(['BRAZOS', 'COLORADO', 'TRINITY', 'RED', 'NUECES'], dtype=object)
+
+    water_type = rng.choice(np.array(['Ground Water', 'Surface Water', 'Reuse'], dtype=object),
+                            size=n, p=[0.6, 0.35, 0.05])
+    supply = rng.choice(np.array(['Self-Supplied', 'Purchased'], dtype=object),
+                        size=n, p=[0.7, 0.3])
+    ground = water_type == 'Ground Water'
+    surface = water_type == 'Surface Water'
+
+    return pd.DataFrame({
+        'Year': rng.choice([2022, 2023], size=n),
+        'TWDB Survey No': rng.integers(10, 1_200_000, size=n),
+        'Water Type': water_type,
+        'Purchased / Self-Supplied': supply,
+        'Source Basin': rng.choice(basins, size=n),
+        'Aquifer Source': np.where(ground, rng.choice(aquifers, size=n), None),
+        'Surface Water Source': np.where(surface, rng.choice(surfaces, size=n), None),
+        'Seller Survey Number': rng.integers(10, 1_200_000, size=n),
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--legacy-max', type=int, default=1_000_000,
+                        help='Largest size at which the row-wise version is run.')
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'row-wise (s)':>14} {'vectorized (s)':>16} {'speed-up':>10}")
+    for n in args.sizes:
+        intake = make_intake(n)
+
+        start = time.perf_counter()
+        vectorized = resolve_intake_sources(intake)
+        vectorized_s = time.perf_counter() - start
+
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            legacy = intake.apply(process_source, axis=1)
+            legacy_s = time.perf_counter() - start
+            pd.testing.assert_series_equal(legacy.astype(str), vectorized.astype(str),
+                                           check_names=False)
+            print(f"{n:>12,} {legacy_s:>14.3f} {vectorized_s:>16.3f} {legacy_s / vectorized_s:>9.1f}x")
+        else:
+            print(f"{n:>12,} {'skipped':>14} {vectorized_s:>16.3f} {'':>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark (and equivalence check) for the spatial index over node coordinates.
+
+Runs random bounding-box, radius and k-nearest queries against
+`twnet.spatial.SpatialIndex` and against a full scan of every located node
+(the only option without an index), checks that both return the same nodes,
+and reports the mean time per query. The nodes come from the latest snapshot
+in `outputs/`; `--copies` adds jittered copies of them to try larger tables.
+Snapshots written before the State Water Plan join have no coordinates; their
+nodes are then placed at random across Texas.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_spatial --queries 1000 --copies 10
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from twnet import staging
+from twnet.graphs import latest_snapshot, snapshot_files
+from twnet.spatial import SpatialIndex, haversine_miles
+
+
+# Rough bounds of Texas, for snapshots without coordinates.
+TEXAS = {'latitude': (25.8, 36.5), 'longitude': (-106.6, -93.5)}
+
+
+def located_nodes(folder: str, copies: int, seed: int) -> pd.DataFrame:
+    _, nodes_path = snapshot_files(folder, latest_snapshot(folder))
+    if nodes_path.endswith('.parquet'):
+        nodes = staging.read_table(nodes_path)
+    else:
+        nodes = pd.read_csv(nodes_path, dtype={'id': str})
+    rng = np.random.default_rng(seed)
+    if not {'latitude', 'longitude'} <= set(nodes.columns):
+        print(f"{nodes_path} has no coordinates (written before the State Water Plan join); "
+              f"placing its nodes at random across Texas")
+        for column, (low, high) in TEXAS.items():
+            nodes[column] = rng.uniform(low, high, len(nodes))
+    nodes = nodes[['id', 'latitude', 'longitude']].dropna().drop_duplicates(subset='id')
+    frames = [nodes]
+    for copy in range(1, copies):
+        jitter = rng.normal(0, 0.05, size=(len(nodes), 2))
+        frames.append(pd.DataFrame({'id': nodes['id'] + f'#{copy}',
+                                    'latitude': nodes['latitude'] + jitter[:, 0],
+                                    'longitude': nodes['longitude'] + jitter[:, 1]}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--folder', default='outputs')
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--copies', type=int, default=1, help='Copies of the located nodes to index.')
+    parser.add_argument('--miles', type=float, default=25.0, help='Radius of the radius queries.')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours of the nearest queries.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    nodes = located_nodes(args.folder, args.copies, args.seed)
+    ids = nodes['id'].to_numpy()
+    lat, lon = nodes['latitude'].to_numpy(), nodes['longitude'].to_numpy()
+
+    start = time.perf_counter()
+    index = SpatialIndex.build(nodes)
+    print(f"indexed {len(index):,} nodes on a {index.shape[0]} x {index.shape[1]} grid "
+          f"in {time.perf_counter() - start:.3f}s")
+
+    rng = np.random.default_rng(args.seed)
+    points = np.column_stack([rng.uniform(lat.min(), lat.max(), args.queries),
+                              rng.uniform(lon.min(), lon.max(), args.queries)])
+    boxes = np.column_stack([points, points + rng.uniform(0.1, 1.0, size=(args.queries, 2))])
+
+    def scan_bbox(south, west, north, east):
+        return ids[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)]
+
+    def scan_within(a, b, miles):
+        distances = haversine_miles(a, b, lat, lon)
+        keep = np.flatnonzero(distances <= miles)
+        order = np.argsort(distances[keep], kind='stable')
+        return ids[keep[order]], distances[keep[order]]
+
+    def scan_nearest(a, b, k):
+        distances = haversine_miles(a, b, lat, lon)
+        order = np.argsort(distances, kind='stable')[:k]
+        return ids[order], distances[order]
+
+    queries = {
+        'bbox': (lambda box: scan_bbox(*box), lambda box: index.bbox(*box), boxes),
+        'radius': (lambda p: scan_within(*p, args.miles), lambda p: index.within(*p, args.miles), points),
+        'nearest': (lambda p: scan_nearest(*p, args.k), lambda p: index.nearest(*p, args.k), points),
+    }
+    print(f"{'query':<10} {'full scan':>12} {'index':>12}")
+    for name, (scan, indexed, inputs) in queries.items():
+        timings = []
+        for fn in (scan, indexed):
+            start = time.perf_counter()
+            results = [fn(query) for query in inputs]
+            timings.append((time.perf_counter() - start) / len(inputs))
+            if fn is scan:
+                expected = results
+        for want, got in zip(expected, results):
+            if name == 'bbox':
+                assert set(want) == set(got)
+            elif name == 'radius':
+                assert set(want[0]) == set(got[0])
+            else:
+                np.testing.assert_allclose(want[1], got[1])
+        print(f"{name:<10} {timings[0] * 1e6:>10.1f}us {timings[1] * 1e6:>10.1f}us")
+    print("index queries match the full scans")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark (and equivalence check) for reading the State Water Plan workbook.
+
+Compares `pd.read_excel` on every sheet against `twnet.swp`: the first,
+streamed conversion of the workbook to columnar copies (`stage_workbook` with
+`force=True`) and the later reads of those copies (`read_swp`). Checks that
+the data sheets hold the same values either way.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_swp
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from twnet.swp import SHEETS, SWP_WORKBOOK, clean_header, read_swp, stage_workbook
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workbook', default=SWP_WORKBOOK)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    # The data sheets have one title row above the header.
+    expected = pd.read_excel(args.workbook, sheet_name=None, header=1)
+    print(f"{'read_excel':<18} {time.perf_counter() - start:>8.3f}s")
+
+    start = time.perf_counter()
+    stage_workbook(args.workbook, force=True)
+    print(f"{'streamed + staged':<18} {time.perf_counter() - start:>8.3f}s")
+
+    start = time.perf_counter()
+    tables = read_swp(args.workbook)
+    print(f"{'staged read':<18} {time.perf_counter() - start:>8.3f}s")
+
+    for title, name in SHEETS.items():
+        if name == 'description':
+            continue
+        frame = expected[title].dropna(how='all')
+        frame.columns = [clean_header(column) for column in frame.columns]
+        table = getattr(tables, name)
+        assert list(table.columns) == list(frame.columns), title
+        for column in frame.columns:
+            a, b = frame[column].reset_index(drop=True), table[column]
+            if a.dtype == object or b.dtype == object:
+                a, b = a.astype(str).where(a.notna()), b.astype(str).where(b.notna())
+            pd.testing.assert_series_equal(a, b, check_dtype=False, check_names=False, obj=f'{title}: {column}')
+    print("data sheets match read_excel")
+
+
+if __name__ == '__main__':
+    main()
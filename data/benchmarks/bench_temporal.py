@@ -0,0 +1,114 @@
+"""
+Benchmark (and equivalence check) for the temporal store of network snapshots.
+
+Derives a run of yearly snapshots from the latest one in `outputs/`: every
+year, some edge volumes change, some edges are dropped, some are added (copies
+of others with a new buyer) and a few rows move. Stores them as full CSV
+copies and in a `twnet.temporal.TemporalStore`, and compares the disk used,
+the time to rebuild the last year from the store against reading its CSV
+copy, and the time of a year-over-year diff. Checks that every year rebuilt
+from the store is the same table, row for row, as its CSV copy, and that the
+diff is the one computed from the two CSV copies.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.bench_temporal --years 10 --change 0.02
+    python -m benchmarks.bench_temporal --years 30 --checkpoint-every 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from twnet.graphs import latest_snapshot
+from twnet.temporal import TABLES, TemporalStore, read_snapshot_text, table_diff
+
+
+def next_year(nl: pd.DataFrame, el: pd.DataFrame, year: int, change: float, rng: np.random.Generator):
+    el = el.copy()
+    el['year'] = str(year)
+    rows = len(el)
+    changed = rng.choice(rows, size=int(rows * change), replace=False)
+    el.loc[changed, 'yearly_volume'] = [f' {volume:,} ' for volume in rng.integers(1_000, 10**9, len(changed))]
+    dropped = rng.choice(rows, size=int(rows * change / 4), replace=False)
+    added = el.iloc[rng.choice(rows, size=len(dropped), replace=False)].copy()
+    added['target'] = [f'{year}-{i}' for i in range(len(added))]
+    el = pd.concat([el.drop(index=dropped), added], ignore_index=True)
+    # A few rows move.
+    order = np.arange(len(el))
+    moved = rng.choice(len(el), size=max(1, int(len(el) * change / 20)), replace=False)
+    order[np.sort(moved)] = moved
+    el = el.iloc[order].reset_index(drop=True)
+    nodes = pd.DataFrame({'id': added['target'].to_numpy()}).reindex(columns=nl.columns)
+    nodes['unified_name'] = nodes['id']
+    nodes['preliminary_type'] = 'water system'
+    return pd.concat([nl, nodes], ignore_index=True), el
+
+
+def folder_size(folder: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--folder', default='outputs')
+    parser.add_argument('--date', default=None, help='Snapshot date, by default the latest.')
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--change', type=float, default=0.02, help='Share of the edges whose volume changes every year.')
+    parser.add_argument('--checkpoint-every', type=int, default=None,
+                        help='Store every n-th year in full (see TemporalStore).')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    nl, el = read_snapshot_text(args.folder, args.date or latest_snapshot(args.folder))
+    print(f"{args.years} years from a snapshot of {len(nl)} nodes and {len(el)} edges, "
+          f"{args.change:.0%} of the volumes changing every year")
+
+    with tempfile.TemporaryDirectory() as folder:
+        copies = os.path.join(folder, 'copies')
+        os.makedirs(copies)
+        store = TemporalStore(os.path.join(folder, 'store'), args.checkpoint_every)
+        years = list(range(2022, 2022 + args.years))
+        start_store = 0.0
+        for year in years:
+            if year != years[0]:
+                nl, el = next_year(nl, el, year, args.change, rng)
+            nl.to_csv(os.path.join(copies, f'nodes_{year}.csv'), index=False)
+            el.to_csv(os.path.join(copies, f'edges_{year}.csv'), index=False)
+            start = time.perf_counter()
+            store.add(year, *read_snapshot_text(copies, str(year)))
+            start_store += time.perf_counter() - start
+        print(f"{'full CSV copies':<24} {folder_size(copies):>14,} bytes")
+        print(f"{'temporal store':<24} {store.disk_usage():>14,} bytes  (built in {start_store:.2f}s)")
+
+        last = str(years[-1])
+        start = time.perf_counter()
+        read_snapshot_text(copies, last)
+        print(f"{'read last CSV copy':<24} {time.perf_counter() - start:>8.3f}s")
+        start = time.perf_counter()
+        TemporalStore(store.folder).as_of(last)
+        print(f"{'as of last year':<24} {time.perf_counter() - start:>8.3f}s")
+        start = time.perf_counter()
+        found = TemporalStore(store.folder).diff(years[-2], years[-1])
+        print(f"{'year-over-year diff':<24} {time.perf_counter() - start:>8.3f}s  "
+              f"({len(found.edges.added)} edges added, {len(found.edges.removed)} removed, "
+              f"{len(found.edges.changed)} values changed)")
+
+        reopened = TemporalStore(store.folder)
+        for year in years:
+            nodes, edges = reopened.as_of(year)
+            expected_nodes, expected_edges = read_snapshot_text(copies, str(year))
+            assert nodes.equals(expected_nodes.astype(object)) and edges.equals(expected_edges.astype(object)), year
+        before, after = read_snapshot_text(copies, str(years[-2])), read_snapshot_text(copies, last)
+        for table, table_found, old, new in zip(TABLES, found, before, after):
+            expected = table_diff(old, new, table)
+            assert all(a.astype(str).equals(b.astype(str)) for a, b in zip(table_found, expected)), table
+        print("every year rebuilt from the store matches its CSV copy, and so does the diff")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""
+Synthetic TWDB Water Use Survey inputs, shaped like the real ones.
+
+Writes `PWS Intake`, `PWS Sales`, `PWS Retail` and `PWS BridgeTable` CSVs for
+two survey years, with the raw files' columns (padded names included) and
+formatting (volumes as `" 1,234 "` strings), so `twnet.pipeline.find_inputs`,
+the notebook and the `twnet` command line read them like the real files.
+
+At scale 1 the files are about the size of the 2022-2023 slice: ~6,000 survey
+numbers, ~9,000 intake, ~7,600 sales, ~7,900 retail and ~4,600 bridge rows.
+Everything that grows with the number of water systems is multiplied by
+`scale`. The distributions follow the real files:
+
+- intake rows are ~30% purchased and ~70% self-supplied, and ~60% ground,
+  ~35% surface water and ~5% reuse;
+- a fixed set of 31 aquifers and 23 basins (few of them dominant), and a
+  number of surface water sources growing with the square root of the scale;
+- about one system in six sells water, with a heavy-tailed (Pareto) number of
+  buyers: most sellers have one or two, a few have hundreds;
+- system names are a function of the survey number, so the same system has
+  the same name in every file, and intake seller names carry the trailing
+  number the pipeline strips.
+
+Files are written a chunk of rows at a time, so the 1000x scale (~9M intake
+rows) does not have to fit in memory at once.
+
+Usage (from the `data/` directory):
+
+    python -m benchmarks.synthetic --scale 10 --out inputs-synthetic
+"""
+import argparse
+import os
+import time
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from twnet.pipeline import InputFiles
+
+SCALES = (1, 10, 100, 1000)
+FIRST_YEAR = 2022
+
+# Sizes at scale 1, over both years.
+SYSTEMS = 6_000
+INTAKE_ROWS = 9_000
+SALES_ROWS = 7_600
+RETAIL_SHARE = 0.66
+BRIDGE_SHARE = 0.77
+SELLER_SHARE = 0.17
+SURFACE_SOURCES = 200
+
+# Rows generated and written per chunk.
+CHUNK_ROWS = 500_000
+
+AQUIFERS = np.array([
+    'OGALLALA AQUIFER', 'GULF COAST AQUIFER', 'CARRIZO-WILCOX AQUIFER', 'TRINITY AQUIFER',
+    'EDWARDS (BALCONES FAULT ZONE) AQUIFER', 'EDWARDS-TRINITY (PLATEAU) AQUIFER', 'SEYMOUR AQUIFER',
+    'HUECO-MESILLA BOLSONS AQUIFER', 'PECOS VALLEY AQUIFER', 'BLAINE AQUIFER', 'BLOSSOM AQUIFER',
+    'BONE SPRING-VICTORIO PEAK AQUIFER', 'BRAZOS RIVER ALLUVIUM AQUIFER', 'CAPITAN REEF COMPLEX AQUIFER',
+    'DOCKUM AQUIFER', 'EDWARDS-TRINITY (HIGH PLAINS) AQUIFER', 'ELLENBURGER-SAN SABA AQUIFER',
+    'HICKORY AQUIFER', 'IGNEOUS AQUIFER', 'LIPAN AQUIFER', 'MARATHON AQUIFER', 'MARBLE FALLS AQUIFER',
+    'NACATOCH AQUIFER', 'QUEEN CITY AQUIFER', 'RITA BLANCA AQUIFER', 'RUSTLER AQUIFER',
+    'SPARTA AQUIFER', 'WEST TEXAS BOLSONS AQUIFER', 'WOODBINE AQUIFER', 'YEGUA-JACKSON AQUIFER',
+    'OTHER AQUIFER',
+], dtype=object)
+BASINS = np.array([
+    'BRAZOS', 'COLORADO', 'TRINITY', 'RED', 'NUECES', 'SABINE', 'NECHES', 'SAN JACINTO', 'GUADALUPE',
+    'SAN ANTONIO', 'SULPHUR', 'CYPRESS', 'LAVACA', 'CANADIAN', 'RIO GRANDE', 'TRINITY-SAN JACINTO',
+    'NECHES-TRINITY', 'SAN JACINTO-BRAZOS', 'BRAZOS-COLORADO', 'COLORADO-LAVACA', 'LAVACA-GUADALUPE',
+    'SAN ANTONIO-NUECES', 'NUECES-RIO GRANDE',
+], dtype=object)
+COUNTIES = np.array([f'COUNTY {i}' for i in range(254)], dtype=object)
+NAME_PREFIXES = np.array(['CITY OF', 'WSC', 'SUD', 'MUD', 'MOBILE HOME PARK', 'WATER SUPPLY',
+                          'UTILITY', 'ISD'], dtype=object)
+SYSTEM_CLASSES = np.array(['Private/IOU', 'Municipal', 'District ', 'Water Supply Corporation',
+                           'Mobile Home Park', 'Authority', 'Institutions/Facilities', 'Federal', 'County'],
+                          dtype=object)
+SYSTEM_CLASS_SHARES = np.array([1306, 1084, 890, 889, 298, 82, 77, 16, 4]) / 4646
+
+RETAIL_COLUMNS = [
+    ' Population Served ', ' Single Family Volumes ', ' Single Family Connections ',
+    ' Multi-Family Volumes ', ' Multi-Family Connections ', ' Commercial Volume ', ' Commercial Connections ',
+    ' Industrial Volumes ', ' Industrial Connections ', ' Institutional Volume ', ' Institutional Connections ',
+    ' Agricultural Volumes ', ' Agricultural Connections ', ' Total Metered Volume ',
+    ' Total Metered Connections ', ' Total Un-metered Volume ', ' Total Un-metered Connections ',
+]
+
+
+def _skewed(n: int, exponent: float) -> np.ndarray:
+    # Zipf-like probabilities over n items, the first ones dominant.
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _volumes(rng: np.random.Generator, n: int, missing: float = 0.0) -> np.ndarray:
+    # Log-normal volumes formatted as the survey exports them, e.g. ' 1,234 '.
+    values = pd.Series(np.round(rng.lognormal(16, 2.5, n)).astype(np.int64))
+    out = (' ' + values.map('{:,}'.format) + ' ').to_numpy(dtype=object)
+    out[rng.random(n) < missing] = None
+    return out
+
+
+def system_names(ids: np.ndarray) -> np.ndarray:
+    """
+    Return the name of every survey number (the same in every file).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    prefixes = NAME_PREFIXES[(ids // 10) % len(NAME_PREFIXES)]
+    return (pd.Series(prefixes) + ' ' + pd.Series(ids).astype(str)).to_numpy(dtype=object)
+
+
+class _Network:
+    # The survey numbers, sellers and sources shared by every file.
+
+    def __init__(self, scale: int, rng: np.random.Generator) -> None:
+        self.scale = scale
+        n = SYSTEMS * scale
+        self.ids = 10 * np.cumsum(rng.integers(1, 37, n))
+        self.retail = np.sort(rng.choice(self.ids, int(n * RETAIL_SHARE), replace=False))
+        self.bridge = np.sort(rng.choice(self.ids, int(n * BRIDGE_SHARE), replace=False))
+        self.sellers = rng.choice(self.ids, int(n * SELLER_SHARE), replace=False)
+        # Heavy-tailed seller degree: Pareto weights over the sellers.
+        weights = rng.pareto(1.1, len(self.sellers)) + 1
+        self.seller_weights = weights / weights.sum()
+        self.surface = np.array([f'LAKE {i}' for i in range(int(SURFACE_SOURCES * np.sqrt(scale)) - 1)]
+                                + ['UNKNOWN'], dtype=object)
+
+    def choose_sellers(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        return rng.choice(self.sellers, n, p=self.seller_weights)
+
+
+def _years(rng: np.random.Generator, n: int) -> np.ndarray:
+    return rng.choice(np.array([FIRST_YEAR, FIRST_YEAR + 1]), n)
+
+
+def _intake(network: _Network, rng: np.random.Generator, n: int) -> pd.DataFrame:
+    systems = rng.choice(network.retail, n)
+    water_type = rng.choice(np.array(['Ground Water', 'Surface Water', 'Reuse'], dtype=object), n,
+                            p=[0.6, 0.35, 0.05])
+    purchased = rng.random(n) < 0.3
+    ground = (water_type == 'Ground Water') & ~purchased
+    surface = (water_type == 'Surface Water') & ~purchased
+    sellers = network.choose_sellers(rng, n)
+    seller_names = system_names(sellers) + ' ' + rng.integers(1, 4, n).astype(str).astype(object)
+    return pd.DataFrame({
+        'Year': _years(rng, n),
+        'TWDB Survey No': systems,
+        'PWS Name': system_names(systems),
+        'Water Type': water_type,
+        'Purchased / Self-Supplied': np.where(purchased, 'Purchased', 'Self-Supplied'),
+        'County Used': rng.choice(COUNTIES, n),
+        'Basin Used': rng.choice(BASINS, n),
+        'Source County': rng.choice(COUNTIES, n),
+        'Source Basin': rng.choice(BASINS, n, p=_skewed(len(BASINS), 1.0)),
+        'Aquifer Source': np.where(ground, rng.choice(AQUIFERS, n, p=_skewed(len(AQUIFERS), 1.2)), None),
+        'Surface Water Source': np.where(surface, rng.choice(network.surface, n,
+                                                             p=_skewed(len(network.surface), 0.8)), None),
+        'Seller Survey Number': np.where(purchased, sellers, 0),
+        'Seller Name': np.where(purchased, seller_names, None),
+        ' Total Intake (Gallons) ': _volumes(rng, n),
+    })
+
+
+def _sales(network: _Network, rng: np.random.Generator, n: int) -> pd.DataFrame:
+    sellers = network.choose_sellers(rng, n)
+    buyers = rng.choice(network.ids, n)
+    water_type = rng.choice(np.array(['Surface Water', 'Groundwater', None], dtype=object), n,
+                            p=[0.53, 0.23, 0.24])
+    return pd.DataFrame({
+        'Year': _years(rng, n),
+        'TWDB Seller Survey No': sellers,
+        'PWS Name': system_names(sellers),
+        'Seller County': rng.choice(COUNTIES, n),
+        'Seller Water Type': np.where(rng.random(n) < 0.5, water_type, 'N/A'),
+        ' Seller Volume Reported ': _volumes(rng, n, missing=0.5),
+        'Buyer Survey No': buyers,
+        'Buyer Name': system_names(buyers),
+        'Buyer Water Type': water_type,
+        ' Buyer Volume Reported ': _volumes(rng, n, missing=0.2),
+        'Buyer NAICS Code': np.where(rng.random(n) < 0.1, '221112', 'N/A'),
+        ' Volume Used In Net Use ': _volumes(rng, n),
+        'Volume Source Used In Net Use': np.where(rng.random(n) < 0.74, 'BUYER-VOLUME', 'SELLER-VOLUME'),
+    })
+
+
+def _retail(network: _Network, rng: np.random.Generator, systems: np.ndarray) -> pd.DataFrame:
+    # One row per retail system and year.
+    n = len(systems)
+    years = np.tile([FIRST_YEAR, FIRST_YEAR + 1], n)
+    systems = np.repeat(systems, 2)
+    frame = pd.DataFrame({
+        'Year': years,
+        'TWDB Survey No': systems,
+        'PWS Name': system_names(systems),
+        'TWDB Estimated?': rng.choice(np.array(['N', 'Y'], dtype=object), 2 * n, p=[0.82, 0.18]),
+    })
+    for column in RETAIL_COLUMNS:
+        frame[column] = _volumes(rng, 2 * n, missing=0.1 if 'Single' in column or 'Total M' in column else 0.7)
+    return frame
+
+
+def _bridge(network: _Network, rng: np.random.Generator, systems: np.ndarray) -> pd.DataFrame:
+    n = len(systems)
+    return pd.DataFrame({
+        'TWDB Survey Number': systems,
+        'TCEQ PWS Code': ['TX' + str(code).zfill(7) for code in rng.integers(0, 10**7, n)],
+        'PWS Name': system_names(systems),
+        'Wholesale System?': np.where(rng.random(n) < 0.017, 'Y', 'N'),
+        'Water Use Survey Form Type': np.where(rng.random(n) < 0.87, 'Municipal Long', 'Municipal Short'),
+        'PWS System Class': rng.choice(SYSTEM_CLASSES, n, p=SYSTEM_CLASS_SHARES),
+    })
+
+
+def _write_chunks(path: str, chunks: Iterator[pd.DataFrame]) -> None:
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(path, index=False, header=header, mode='w' if header else 'a')
+        header = False
+
+
+def _row_chunks(rows: int, make: Callable[[int], pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    for start in range(0, rows, CHUNK_ROWS):
+        yield make(min(CHUNK_ROWS, rows - start))
+
+
+def _id_chunks(ids: np.ndarray, make: Callable[[np.ndarray], pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(ids), CHUNK_ROWS):
+        yield make(ids[start:start + CHUNK_ROWS])
+
+
+def write_survey(folder: str, scale: int = 1, seed: int = 0) -> InputFiles:
+    """
+    Write the four synthetic survey files for `scale` times the real data.
+
+    Parameters
+    ----------
+    folder : str
+        Folder to write to. Created if needed.
+    scale : int, optional
+        Multiple of the real data's size, by default 1.
+    seed : int, optional
+        Seed of the random draws, by default 0. The same seed and scale give
+        the same files.
+
+    Returns
+    -------
+    InputFiles
+        Paths to the intake, sales, retail and bridge files.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    network = _Network(scale, rng)
+    years = f'{FIRST_YEAR}-{FIRST_YEAR + 1}'
+    inputs = InputFiles(intake=os.path.join(folder, f'PWS Intake_{years}.csv'),
+                        sales=os.path.join(folder, f'PWS Sales_{years}.csv'),
+                        retail=os.path.join(folder, f'PWS Retail_{years}.csv'),
+                        bridge=os.path.join(folder, f'PWS BridgeTable_{years}.csv'))
+    _write_chunks(inputs.intake, _row_chunks(INTAKE_ROWS * scale, lambda n: _intake(network, rng, n)))
+    _write_chunks(inputs.sales, _row_chunks(SALES_ROWS * scale, lambda n: _sales(network, rng, n)))
+    _write_chunks(inputs.retail, _id_chunks(network.retail, lambda ids: _retail(network, rng, ids)))
+    _write_chunks(inputs.bridge, _id_chunks(network.bridge, lambda ids: _bridge(network, rng, ids)))
+    return inputs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scale', type=int, default=1, help=f'One of {SCALES}, or any multiple.')
+    parser.add_argument('--out', default='inputs-synthetic')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    inputs = write_survey(args.out, args.scale, args.seed)
+    print(f"scale {args.scale}x written in {time.perf_counter() - start:.1f}s")
+    for path in inputs:
+        print(f"  {path}  {os.path.getsize(path) / 2**20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
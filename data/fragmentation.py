@@ -11,30 +11,52 @@ def _():
     import pandas as pd
     import matplotlib.pyplot as plt
     import numpy as np
-    return mo, np, nx, pd, plt
+    from twnet.fragmentation import (
+        calculate_degree_of_fragmentation,
+        estimate_degree_of_fragmentation,
+        fragmentation_baseline,
+        fragmentation_without,
+        graph_arrays,
+        removal_scenarios,
+    )
+    from twnet.graphs import load_graph
+    from twnet.metrics import graph_metrics
+    from twnet.profiling import Profiler
+    return (
+        Profiler,
+        calculate_degree_of_fragmentation,
+        estimate_degree_of_fragmentation,
+        fragmentation_baseline,
+        fragmentation_without,
+        graph_arrays,
+        graph_metrics,
+        load_graph,
+        mo,
+        np,
+        nx,
+        pd,
+        plt,
+        removal_scenarios,
+    )
 
 
 @app.cell
-def _(pd):
-    edges = pd.read_csv("outputs/edges_20250604.csv")
-    nodes = pd.read_csv("outputs/nodes_20250604.csv").set_index("id")
-    return edges, nodes
+def _(Profiler):
+    # Off unless TWNET_PROFILE is set (see twnet/profiling.py)
+    profiler = Profiler.from_environment()
+    return (profiler,)
 
 
 @app.cell
-def _(edges, nx):
-    G = nx.from_pandas_edgelist(edges, source = "source", target = "target", create_using=nx.DiGraph)
+def _(load_graph, profiler):
+    # Latest nodes_/edges_ snapshot in outputs/, with every node attribute
+    # attached in one call. The built graph is cached in .twnet-cache/ and
+    # loaded from there while the snapshot files are unchanged.
+    G = profiler.run("load_graph", load_graph, "outputs")
+    G.graph["snapshot"]
     return (G,)
 
 
-@app.cell
-def _(G, nodes):
-    for node_id, row in nodes.iterrows():
-        if node_id in G:
-            G.nodes[node_id].update(row.to_dict())
-    return node_id, row
-
-
 @app.cell
 def _(G):
     print(G.nodes['Ogallala Aquifer'])
@@ -42,15 +64,24 @@ def _(G):
 
 
 @app.cell
-def _(G, nx):
+def _(G, graph_metrics, pd, profiler):
+    # Degrees, components, density, reciprocity and betweenness, computed on
+    # integer-coded edge arrays (see twnet/metrics.py)
+    metrics = profiler.run("graph_metrics", graph_metrics,
+                           pd.DataFrame(list(G.edges), columns=["source", "target"]))
+    return (metrics,)
+
+
+@app.cell
+def _(metrics):
     # Let's get some basic topographic metrics to get ourselves situated:
     topo = {
-        'nodes': G.number_of_nodes(),
-        'edges': G.number_of_edges(),
-        'is_directed': G.is_directed(),
-        'density': nx.density(G),
-        'average_degree': sum(dict(G.degree()).values()) / G.number_of_nodes(),
-        'weak_component_count': nx.number_connected_components(G.to_undirected())
+        'nodes': metrics['nodes'],
+        'edges': metrics['edges'],
+        'is_directed': True,
+        'density': metrics['density'],
+        'average_degree': 2 * metrics['edges'] / metrics['nodes'],
+        'weak_component_count': metrics['weak_components']
     }
 
     # pd.DataFrame([topo])
@@ -59,26 +90,12 @@ def _(G, nx):
 
 
 @app.cell
-def _(G, pd):
-    # Get degree (k) for each node
-    k_Pk = {}
-
-    for value in dict(G.degree()).values():
-        if value not in k_Pk:
-            k_Pk[value] = {
-                'degree': value,
-                'count': 0,
-                'probability': 0
-            }
-        k_Pk[value]['count'] += 1 
-
-    # Turn our counts to probs (P(k))
-    total_nodes = G.number_of_nodes()
-    for degree in k_Pk:
-        k_Pk[degree]['probability'] = k_Pk[degree]['count'] / total_nodes
-
-    k_Pk_df = pd.DataFrame.from_dict(k_Pk).T
-    return degree, k_Pk, k_Pk_df, total_nodes, value
+def _(metrics, pd):
+    # Get degree (k) for each node, and turn the counts to probs (P(k))
+    k_Pk_df = pd.DataFrame(metrics['degree_histograms']['total'])
+    k_Pk_df['probability'] = k_Pk_df['count'] / metrics['nodes']
+    k_Pk_df = k_Pk_df.set_index(k_Pk_df['degree'].rename(None))
+    return (k_Pk_df,)
 
 
 @app.cell
@@ -112,45 +129,50 @@ def _(degrees, np, plt, probabilities):
 
 
 @app.cell
-def _(G, nx):
-    def calculate_degree_of_fragmentation(mod_G):
-        """
-        Calculate the degree of fragmentation for a graph.
-    
-        The degree of fragmentation is calculated as:
-        (2 * sum(1/d_ij)) / (n * (n-1))
-    
-        where d_ij is the shortest path distance between nodes i and j,
-        and n is the total number of nodes.
-        """
-        # Total number of nodes
-        n = len(mod_G.nodes)
-    
-        if n <= 1:
-            return 0.0
-    
-        denominator = n * (n - 1)
-        sum_of_reciprocal_distances = 0.0
-
-        # Get all shortest path lengths (works for both directed and undirected)
-        distance_matrix = dict(nx.all_pairs_shortest_path_length(mod_G))
-    
-        # Calculate sum of reciprocal distances
-        for source in mod_G.nodes:
-            if source in distance_matrix:
-                for destination in mod_G.nodes:
-                    if source != destination and destination in distance_matrix[source]:
-                        distance = distance_matrix[source][destination]
-                        if distance > 0:  # Safety check
-                            sum_of_reciprocal_distances += 1.0 / distance
-
-        # Calculate degree of fragmentation
-        degree_of_fragmentation = (2.0 * sum_of_reciprocal_distances) / denominator
-    
-        return degree_of_fragmentation
-
-    calculate_degree_of_fragmentation(G)
-    return (calculate_degree_of_fragmentation,)
+def _(G, calculate_degree_of_fragmentation, profiler):
+    # Batched BFS over a compact edge array (see twnet/fragmentation.py). Pass
+    # `workers` to spread the sources over a process pool on large graphs.
+    profiler.run("degree_of_fragmentation", calculate_degree_of_fragmentation, G)
+    return
+
+
+@app.cell
+def _(G, estimate_degree_of_fragmentation, graph_arrays, profiler):
+    # Quick sampled estimate with a 95% confidence interval
+    profiler.run("estimate_degree_of_fragmentation", estimate_degree_of_fragmentation,
+                 graph_arrays(G), sample_size=500, seed=0)
+    return
+
+
+@app.cell
+def _(G, fragmentation_baseline, profiler):
+    # What-if analysis: keep every source's contribution once, then only redo
+    # the BFS from sources whose distances can change when a node drops out.
+    baseline = profiler.run("fragmentation_baseline", fragmentation_baseline, G)
+    baseline.value
+    return (baseline,)
+
+
+@app.cell
+def _(baseline, fragmentation_without, profiler):
+    profiler.run("fragmentation_without", fragmentation_without, baseline, nodes=['Ogallala Aquifer'])
+    return
+
+
+@app.cell
+def _(G, baseline, profiler, removal_scenarios):
+    # Single-node removals for the 100 nodes with the most outgoing connections
+    scenarios = profiler.run("removal_scenarios", removal_scenarios,
+                             baseline, sorted(G.nodes, key=G.out_degree, reverse=True)[:100])
+    scenarios.sort_values().head(10)
+    return (scenarios,)
+
+
+@app.cell
+def _(G, profiler, scenarios):
+    # Written when TWNET_PROFILE is set, next to the snapshot it was run on
+    profiler.save(f"outputs/profile_fragmentation_{G.graph['snapshot']}")
+    return
 
 
 if __name__ == "__main__":
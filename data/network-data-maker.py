@@ -21,8 +21,69 @@ def _():
     import os
     import re
     from datetime import datetime
-    import networkx as nx
-    return List, Optional, datetime, json, mo, np, nx, os, pd, plt, re
+    from twnet import staging
+    from twnet.cache import StageCache
+    from twnet.edges import combine_edges, create_intake_el, create_sales_el
+    from twnet.export import ExportPaths, write_csv, write_exports
+    from twnet.flows import attribute_flows, join_flows
+    from twnet.loaders import read_input, read_intake, read_sales, stage_inputs
+    from twnet.nodes import (NODE_COLUMNS, create_nodes_list, enrich_nodes, get_retail_nodes,
+                             get_survey_nodes, name_merge_report, tidy_nodes)
+    from twnet.normalize import NAMES_FILE, load_names, save_names
+    from twnet.profiling import Profiler
+    from twnet.reachability import write_reachability
+    from twnet.reconcile import reconcile_parallel_edges
+    from twnet.shards import write_ego_shards
+    from twnet.spatial import write_spatial
+    from twnet.swp import SWP_NODE_COLUMNS, SWP_WORKBOOK, join_swp_edges, join_swp_nodes, read_swp
+    from twnet.temporal import build_store
+    return (
+        ExportPaths,
+        List,
+        NAMES_FILE,
+        NODE_COLUMNS,
+        Optional,
+        Profiler,
+        SWP_NODE_COLUMNS,
+        SWP_WORKBOOK,
+        StageCache,
+        attribute_flows,
+        build_store,
+        combine_edges,
+        create_intake_el,
+        create_nodes_list,
+        create_sales_el,
+        datetime,
+        enrich_nodes,
+        get_retail_nodes,
+        get_survey_nodes,
+        join_flows,
+        join_swp_edges,
+        join_swp_nodes,
+        json,
+        load_names,
+        mo,
+        name_merge_report,
+        np,
+        os,
+        pd,
+        plt,
+        re,
+        read_input,
+        read_intake,
+        read_sales,
+        read_swp,
+        reconcile_parallel_edges,
+        save_names,
+        stage_inputs,
+        staging,
+        tidy_nodes,
+        write_csv,
+        write_ego_shards,
+        write_reachability,
+        write_spatial,
+        write_exports,
+    )
 
 
 @app.cell(hide_code=True)
@@ -68,7 +129,7 @@ def _(mo):
 
 @app.cell
 def _(pd):
-    pd.read_csv('inputs/PWS Intake_2022-2023.csv').head(10)
+    pd.read_csv('inputs/PWS Intake_2022-2023.csv', nrows=10)
     return
 
 
@@ -80,7 +141,7 @@ def _(mo):
 
 @app.cell
 def _(pd):
-    pd.read_csv('inputs/PWS Sales_2022-2023.csv').head(1)
+    pd.read_csv('inputs/PWS Sales_2022-2023.csv', nrows=1)
     return
 
 
@@ -92,7 +153,7 @@ def _(mo):
 
 @app.cell
 def _(pd):
-    pd.read_csv('inputs/PWS Retail_2022-2023.csv').head(1)
+    pd.read_csv('inputs/PWS Retail_2022-2023.csv', nrows=1)
     return
 
 
@@ -104,10 +165,41 @@ def _(mo):
 
 @app.cell(hide_code=True)
 def _(pd):
-    pd.read_csv('inputs/PWS BridgeTable_2022-2023.csv').head(1)
+    pd.read_csv('inputs/PWS BridgeTable_2022-2023.csv', nrows=1)
+    return
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""When `pyarrow` is installed, the raw CSVs are also converted once into compressed Parquet copies under `inputs/staged/`. The loaders used below read only the columns they need from those copies, and fall back to the CSVs whenever an input changes.""")
+    return
+
+
+@app.cell
+def _(profiler, stage_inputs, staging):
+    staged_inputs = profiler.run('stage_inputs', stage_inputs, 'inputs') if staging.HAS_PYARROW else []
+    staged_inputs
+    return (staged_inputs,)
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""Every step below runs through a stage cache kept in `.twnet-cache/`. A step's result is stored under a hash of its code and its inputs (the input files' contents, or the results of the steps it builds on), so re-running the notebook only recomputes the steps whose inputs or code changed. The table at the end of the notebook lists which steps were cache hits.
+
+    Set the `TWNET_PROFILE` environment variable (e.g. `TWNET_PROFILE=1 python network-data-maker.py`, or `TWNET_PROFILE=trace` to also trace Python allocations) to time and memory-profile every step. The profile is written next to the dated outputs as `outputs/profile_{date}.json` and `.csv`; `python -m twnet.profiling` compares two of them step by step (see `twnet/profiling.py`).""")
     return
 
 
+@app.cell
+def _(NAMES_FILE, Profiler, StageCache, load_names, os):
+    # Off unless TWNET_PROFILE is set (see twnet/profiling.py)
+    profiler = Profiler.from_environment()
+    cache = StageCache(profiler=profiler)
+    # Entity names normalized in earlier runs (see twnet/normalize.py)
+    load_names(os.path.join(cache.folder, NAMES_FILE))
+    return cache, profiler
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(
@@ -179,7 +271,7 @@ def _(mo):
             - The year of intake, water type, and whether it was purchased or self-supplied are also saved for each record.
             - The source file name is added to keep track of where the data came from.
 
-        5. Filter the data by year when relevant.
+        5. Filter the data by year when relevant. For very large (e.g., multi-decade) intake files, the function can also stream the file in chunks, filtering each chunk by year before deriving any column, so memory stays bounded. Edge ids are the same either way.
 
         6. Return the data as a formated edge list.
 
@@ -191,103 +283,16 @@ def _(mo):
 
 
 @app.cell(hide_code=True)
-def _(List, Optional, os, pd):
-    # Intake
-    def create_intake_el(df_path: str,
-                         columns: Optional[List[str]] = None,
-                         el: bool = True,
-                         year: Optional[int] = None) -> pd.DataFrame:
-        """
-        Create edge list from intake data.
-
-        Parameters
-        ----------
-        df_path : str
-            Path to intake data.
-        columns : Optional[List[str]], optional
-            Columns to include in edge list, by default None. If None, it selects preset list of columns.
-        el : bool, optional
-            If True, returns edge list, by default True.
-        year : Optional[int], optional
-            Year of data to select, by default None.
-
-        Returns
-        -------
-        pd.DataFrame
-            Edge list as defined above.
-        """
-        # Load teh CSG and strip column names from extra spaces
-        intake = pd.read_csv(df_path)
-        intake.columns = intake.columns.str.strip()
-
-        # The source of the water is dependent on a variety of configurations:
-        # - If the water type is reuse and the water is self-supplied, the source is the TWDB Survey Number. A self-loop in the network.
-        # - If the water is purchased, the source is the Seller Survey Number. 
-        # - If the water type is groundwater and the water is self-supplied, the source is the Aquifer Source. If the Aquifer Source is "OTHER AQUIFER", the source is the Source Basin.
-        # - If the water type is surface water and the water is self-supplied, the source is the Surface Water Source. If the Surface Water Source is "UNKNOWN", the source is the Source Basin.
-        def process_source(row):
-            if row.get('Water Type') == "Reuse" and row.get('Purchased / Self-Supplied') == "Self-Supplied" :
-                 return row.get("TWDB Survey No", None)
-            elif row.get('Purchased / Self-Supplied') == "Purchased" :
-                return row.get("Seller Survey Number", None)
-            elif row.get('Water Type') == "Ground Water" and row.get('Purchased / Self-Supplied') == "Self-Supplied":
-                # There are no unknowns in the Aquifer Source
-                if row.get('Aquifer Source') == "OTHER AQUIFER":
-                    return row.get('Source Basin') + ' BASIN (Source Unknown)'
-                else:
-                    return row.get('Aquifer Source')
-            elif row.get('Water Type') == "Surface Water" and row.get('Purchased / Self-Supplied') == "Self-Supplied":
-                if row.get('Surface Water Source') == "UNKNOWN":
-                    return row.get('Source Basin') + ' BASIN (Source Unknown)' 
-                else:
-                    return row.get('Surface Water Source')
-
-        # Apply source processing
-        intake['source'] = intake.apply(process_source, axis=1)
-
-        # Create other columns safely(ish)
-        intake['target'] = intake.get('TWDB Survey No', None)
-        intake['id'] = 'intake_' + intake.index.astype(str)
-        intake['type'] = 'intake'
-        intake['yearly_volume'] = intake.get('Total Intake (Gallons)', None) # This defaults to None if the column is not found
-        intake['year'] = intake.get('Year', None)
-        intake['water_type'] = intake.get('Water Type', None)
-        intake['purchased_self'] = intake.get('Purchased / Self-Supplied', None)
-        intake['source_file'] = os.path.basename(df_path)
-
-        if year is not None:
-            intake = intake.query("year == @year")
-
-        if el:
-            default_columns = ['source', 'target', 'id', 'yearly_volume', 'type', 'year', 'water_type', 'purchased_self', 'source_file']
-
-            # Cleaning rules:
-            intake.loc[:, 'source'] = intake['source'].astype(str)
-            intake.loc[:, 'target'] = intake['target'].astype(str)
-            def clean_entity(entity: str) -> str:
-                if isinstance(entity, str):
-                    entity = entity.strip()
-                    entity = entity.title()
-                return entity
-
-            intake.loc[:, 'source'] = intake['source'].apply(clean_entity)
-            intake.loc[:, 'target'] = intake['target'].apply(clean_entity)
-
-            if columns:
-                available_columns = [col for col in columns if col in intake.columns]
-                return intake[available_columns]
-            else:
-                return intake[default_columns]
-
-        else:
-            return intake
+def _(cache, create_intake_el):
+    # Intake: create_intake_el lives in twnet/edges.py. Pass `chunksize` to
+    # stream large intake files instead of loading them whole.
 
     # Run the function and return an edge list
-    intake_el = create_intake_el('inputs/PWS Intake_2022-2023.csv', el=True, year=2022)
+    intake_el = cache.run('intake_el', create_intake_el, 'inputs/PWS Intake_2022-2023.csv', el=True, year=2022)
 
     # Look at the top 10 rows in that edge list
     intake_el.head(10)
-    return create_intake_el, intake_el
+    return (intake_el,)
 
 
 @app.cell(hide_code=True)
@@ -324,70 +329,14 @@ def _(mo):
 
 
 @app.cell
-def _(List, Optional, os, pd):
-    # Sales
-    def create_sales_el(df_path: str,
-                        columns: Optional[List[str]] = None,
-                        el: bool = True,
-                        year: Optional[int] = None) -> pd.DataFrame:
-        """
-        Create edge list from sales data.
-
-        Parameters
-        ----------
-        df_path : str
-            Path to sales data.
-        columns : Optional[List[str]], optional
-            Columns to include in edge list, by default None. If None, it selects preset list of columns.
-        el : bool, optional
-            If True, returns edge list, by default True.
-        year : Optional[int], optional
-            Year of data to filter, by default None.
-
-        Returns
-        -------
-        pd.DataFrame
-            Edge list as defined above.
-        """
-        sales = pd.read_csv(df_path)
-        sales.columns = sales.columns.str.strip()
-
-        # Create columns safely(ish)
-        sales['source'] = sales.get('TWDB Seller Survey No')
-        sales['target'] = sales.get('Buyer Survey No')
-        sales['id'] = 'sales_' + sales.index.astype(str)
-        sales['type'] = 'sale'
-        # Which volume could be reported per transaction? Is this correct?
-        sales['yearly_volume'] = sales.get('Buyer Volume Reported')
-        sales['year'] = sales.get('Year')
-        sales['water_type'] = sales.get('Buyer Water Type')
-        sales['purchased_self'] = 'Purchased'
-        sales['source_file'] = os.path.basename(df_path)
-
-        if year is not None:
-            sales = sales.query("year == @year")
-
-        if el:
-            default_columns = ['source', 'target', 'id', 'yearly_volume', 'type', 'year', 'water_type', 'purchased_self', 'source_file']
-
-            # Cleaning rules:
-            sales.loc[:, 'source'] = sales['source'].astype(str)
-            sales.loc[:, 'target'] = sales['target'].astype(str)
-
-            if columns:
-                available_columns = [col for col in columns if col in sales.columns]
-                return sales[available_columns]
-            else:
-                return sales[default_columns]
-
-        else:
-            return sales
-
-    sales_el = create_sales_el('inputs/PWS Sales_2022-2023.csv', 
-                               el=True, 
-                               year=2022)
+def _(cache, create_sales_el):
+    # Sales: create_sales_el lives in twnet/edges.py and also accepts `chunksize`.
+    sales_el = cache.run('sales_el', create_sales_el,
+                         'inputs/PWS Sales_2022-2023.csv',
+                         el=True,
+                         year=2022)
     sales_el.head(10)
-    return create_sales_el, sales_el
+    return (sales_el,)
 
 
 @app.cell(hide_code=True)
@@ -403,8 +352,8 @@ def _(mo):
 
 
 @app.cell
-def _(intake_el, pd, sales_el):
-    el = pd.concat([intake_el, sales_el])
+def _(cache, combine_edges, intake_el, sales_el):
+    el = cache.run('el', combine_edges, intake_el, sales_el)
     el.head(100)
     return (el,)
 
@@ -416,49 +365,18 @@ def _(mo):
         ## Generating a Node List
 
         With the edge list completed, we now turn our attention to generating node list from multiple files (e.g., PWS Retail and Survey-No) and the edge list. The process will require a base table with unique identifiers for the nodes on the edge list. Roughly speaking, these come in two flavors, water sources and water systems. Water sources represent aquifers and surface water, while water systems represent public water systems (PWS) and industrial systems.
+
+        Each unique identifier is also interned into a node registry, which assigns it a dense integer id. Classifying nodes as sources or systems is then a hash lookup. The graph analyses further down intern their own edge lists the same way and work on integer-coded edges.
         """
     )
     return
 
 
 @app.cell
-def _(el, pd):
-    def create_nodes_list(el: pd.DataFrame,
-                          intake_file: str) -> pd.DataFrame:
-        """
-        Create a DataFrame with unique node IDs and classify them as either 'water source' or 'water system'.
-
-        Parameters:
-            el (pd.DataFrame): A DataFrame containing 'source' and 'target' columns.
-            intake_file (str): Path to the CSV file containing intake data.
-
-        Returns:
-            pd.DataFrame: A DataFrame with 'id' and 'preliminary_type' columns.
-        """
-        # Create an empty DataFrame and add an 'id' column with unique values from 'source' and 'target'
-        nodes = pd.DataFrame()
-        nodes['id'] = pd.concat([el['source'].astype(str), el['target'].astype(str)]).unique()
-
-        # Load intake data and extract unique water source names
-        intake = pd.read_csv(intake_file)
-        def clean_entity(entity: str) -> str:
-            return entity.strip().title() if isinstance(entity, str) else entity
-
-        water_sources = [
-            x + ' BASIN (Source Unknown)' if col == 'Source Basin' else x
-            for col in ['Aquifer Source', 'Surface Water Source', 'Source Basin']
-            for x in intake[col].dropna().apply(str).unique().tolist()
-        ]
-        water_sources = [clean_entity(x) for x in water_sources]
-
-        # Assign a preliminary type to each node
-        nodes['preliminary_type'] = nodes['id'].apply(lambda x: 'water source' if x in water_sources else 'water system')
-
-        return nodes
-
-    nodes = create_nodes_list(el, 'inputs/PWS Intake_2022-2023.csv')
+def _(cache, create_nodes_list, el):
+    nodes = cache.run('nodes', create_nodes_list, el, 'inputs/PWS Intake_2022-2023.csv')
     nodes.head(10)
-    return create_nodes_list, nodes
+    return (nodes,)
 
 
 @app.cell(hide_code=True)
@@ -490,33 +408,11 @@ def _(mo):
 
 
 @app.cell
-def _(Optional, pd):
-    # Retail
-    def get_retail_nodes(retail_df_path: str,
-                        year: Optional[int] = None) -> pd.DataFrame:
-        """
-        Reads and processes the retail PWS dataset.
-
-        Parameters:
-            retail_df_path (str): Path to the CSV file.
-            year (int): Year to filter the data.
-
-        Returns:
-            pd.DataFrame: Processed DataFrame with retail nodes.
-        """
-        out = (pd.read_csv(retail_df_path, dtype={'TWDB Survey No': str})  
-                .rename(columns={'TWDB Survey No': 'id', 'PWS Name': 'retail_name'})
-               ) 
-
-        if year is not None:
-            out = out.query("Year == @year")
-
-        return out
-
-    # Load Retail Data
+def _(get_retail_nodes):
+    # Load Retail Data (see twnet/nodes.py)
     retail = get_retail_nodes('inputs/PWS Retail_2022-2023.csv')
     retail.head()
-    return get_retail_nodes, retail
+    return (retail,)
 
 
 @app.cell(hide_code=True)
@@ -535,117 +431,56 @@ def _(mo):
 
 
 @app.cell
-def _(pd):
-    def get_survey_nodes(survey_df_path: str) -> pd.DataFrame:
-        """
-        Reads and processes the survey number dataset.
+def _(get_survey_nodes):
+    survey_no = get_survey_nodes('inputs/PWS BridgeTable_2022-2023.csv')
+    survey_no.head()
+    return (survey_no,)
 
-        Parameters:
-            survey_df_path (str): Path to the CSV file.
 
-        Returns:
-            pd.DataFrame: Processed DataFrame with survey nodes.
-        """
-        out = (pd.read_csv(survey_df_path, dtype={'TWDB Survey Number': str})  
-                .rename(columns={'TWDB Survey Number': 'id',
-                                 'PWS Name': 'sur_name'})
-               ) 
+@app.cell
+def _(cache, enrich_nodes, nodes):
+    # Merge the retail, survey number, intake and sales attributes into the
+    # node list (see twnet/nodes.py)
+    nl = cache.run('enriched_nodes', enrich_nodes, nodes,
+                   'inputs/PWS Retail_2022-2023.csv',
+                   'inputs/PWS BridgeTable_2022-2023.csv',
+                   'inputs/PWS Intake_2022-2023.csv',
+                   'inputs/PWS Sales_2022-2023.csv',
+                   year=2022)
+    return (nl,)
 
-        return out
 
-    survey_no = get_survey_nodes('inputs/PWS BridgeTable_2022-2023.csv')
-    survey_no.head()
-    return get_survey_nodes, survey_no
+@app.cell
+def _(cache, name_merge_report, nodes):
+    # Rows the former merge cascade produced for the same nodes, and how many
+    # of them the name index avoids
+    cache.run('name_merge_report', name_merge_report, nodes,
+              'inputs/PWS Retail_2022-2023.csv',
+              'inputs/PWS BridgeTable_2022-2023.csv',
+              'inputs/PWS Intake_2022-2023.csv',
+              'inputs/PWS Sales_2022-2023.csv',
+              year=2022)
+    return
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""The TWDB also shared the 2022 State Water Plan (SWP) data on existing water supply transactions to water user groups (WUGs), the WUG centroids, and a bridge between SWP entities and public water systems. The workbook is read once, row by row, into columnar copies in `inputs/staged/`, which later runs read instead until the workbook changes (see `twnet/swp.py`). Each water system gets its SWP entity, WUG name, planning region and centroid, matched on its TCEQ PWS code:""")
+    return
 
 
 @app.cell
-def _(Optional, get_retail_nodes, get_survey_nodes, nodes, pd):
-    def enrich_nodes(nodes: pd.DataFrame,
-                     retail_df_path: str,
-                     survey_df_path: str,
-                     intake_df_path: str,
-                     sales_df_path: str,
-                     year: Optional[int] = None) -> pd.DataFrame:
-        """
-        Processes multiple PWS-related datasets and merges them into a unified node dataset.
-        """
-        # Load and clean Retail data
-        retail = get_retail_nodes(retail_df_path, year=year)
-
-        # Load and clean Survey Number data
-        survey_no = get_survey_nodes(survey_df_path)
-
-        # Merge Retail and Survey Data
-        nodes_retail = nodes.merge(retail, on='id', how='left')
-        nodes_retail_no = (nodes
-                          .merge(retail, on='id', how='left')
-                          .merge(survey_no, on='id', how='left'))
-
-        # TODO: After joining, there are ~2k nodes that do not have a name.
-        # This suggests that they are not in the retail or survey number 
-        # files. After quickly drilling down on these, they appear to have
-        # a name on the intake sheet and other data sets.
-        nodes_retail_no['unified_name'] = nodes_retail_no.apply(
-            lambda x: x['sur_name'] if x['preliminary_type'] == 'water system' else x['id'],
-            axis=1)
-        nodes_retail_no['unified_name'] = nodes_retail_no.apply(
-            lambda x: x['retail_name'] if pd.isnull(x['unified_name']) else x['unified_name'],
-            axis=1)
-
-        # Load and clean Intake data
-        intake_missing = (pd.read_csv(intake_df_path,
-                                     dtype={'TWDB Survey No': str})
-                          .rename(columns={'TWDB Survey No': 'id', 
-                                           'PWS Name': 'intake_name'}
-                                 )[['id', 'intake_name']]
-                         )
-
-        intake_sellers = (pd.read_csv(intake_df_path,
-                                     dtype={'Seller Survey Number': str})
-                          .rename(columns={'Seller Survey Number': 'id',
-                                           'Seller Name': 'intake_seller_name'})
-                          .dropna(subset=['intake_seller_name'])
-                          .groupby('id').first().reset_index()[['id', 'intake_seller_name']]
-                          .assign(intake_seller_name=lambda x: x['intake_seller_name'].str.replace(r'\s\d+$', '', regex=True))
-                         )
-
-        # Load and clean Buyer & Seller data
-        buyer_missing = (pd.read_csv(sales_df_path,
-                                    dtype={'Buyer Survey No': str})
-                         .rename(columns={'Buyer Survey No': 'id',
-                                          'Buyer Name': 'buyer_name'}
-                                )[['id', 'buyer_name']])
-        seller_missing = (pd.read_csv(sales_df_path, 
-                                      dtype={'TWDB Seller Survey No': str})
-                          .rename(columns={'TWDB Seller Survey No': 'id',
-                                           'PWS Name': 'seller_name'}
-                                 )[['id', 'seller_name']])
-
-        # Perform Merges
-        merged_data = (nodes_retail_no
-                       .merge(intake_missing, on='id', how='left')
-                       .merge(buyer_missing, on='id', how='left')
-                       .merge(seller_missing, on='id', how='left')
-                       .merge(intake_sellers, on='id', how='left'))
-
-        # Unified name column using fillna instead of multiple apply calls
-        merged_data['unified_name'] = merged_data[['unified_name', 'intake_name', 'buyer_name', 'seller_name', 'intake_seller_name']].bfill(axis=1).iloc[:, 0]
-
-        # Quick round of cleaning
-        def clean_entity(entity: str) -> str:
-            return entity.strip().title() if isinstance(entity, str) else entity
-
-        merged_data['unified_name'] = merged_data['unified_name'].apply(clean_entity)
-
-        return merged_data
-
-    nl = enrich_nodes(nodes, 
-                     'inputs/PWS Retail_2022-2023.csv', 
-                     'inputs/PWS BridgeTable_2022-2023.csv', 
-                     'inputs/PWS Intake_2022-2023.csv', 
-                     'inputs/PWS Sales_2022-2023.csv', 
-                     year=2022)
-    return enrich_nodes, nl
+def _(SWP_WORKBOOK, profiler, read_swp):
+    swp = profiler.run('swp_tables', read_swp, SWP_WORKBOOK)
+    swp.bridge.head()
+    return (swp,)
+
+
+@app.cell
+def _(cache, join_swp_nodes, nl, swp):
+    nl_swp = cache.run('swp_nodes', join_swp_nodes, nl, swp)
+    nl_swp['latitude'].notna().sum()
+    return (nl_swp,)
 
 
 @app.cell(hide_code=True)
@@ -662,24 +497,12 @@ def _(mo):
 
 
 @app.cell
-def _(nl):
-    # Define relevant columns
-    columns_to_keep = [
-        'id', 'unified_name', 'preliminary_type', 'Year', 'TWDB Estimated?', ' Population Served ',
-        ' Single Family Volumes ', ' Single Family Connections ', ' Multi-Family Volumes ',
-        ' Multi-Family Connections ', ' Commercial Volume ', ' Commercial Connections ',
-        ' Industrial Volumes ', ' Industrial Connections ', ' Institutional Volume ',
-        ' Institutional Connections ', ' Agricultural Volumes ', ' Agricultural Connections ',
-        ' Total Metered Volume ', ' Total Metered Connections ', ' Total Un-metered Volume ',
-        ' Total Un-metered Connections ', 'TCEQ PWS Code', 'Wholesale System?',
-        'Water Use Survey Form Type', 'PWS System Class'
-    ]
-
-    # Select relevant columns and remove duplicate IDs
-    nl_tidy = nl.loc[~nl.duplicated(subset='id', keep='first'),
-    columns_to_keep]
+def _(NODE_COLUMNS, SWP_NODE_COLUMNS, cache, nl_swp, tidy_nodes):
+    # Select relevant columns (twnet.nodes.NODE_COLUMNS, plus the SWP ones) and
+    # remove duplicate IDs
+    nl_tidy = cache.run('tidy_nodes', tidy_nodes, nl_swp, NODE_COLUMNS + SWP_NODE_COLUMNS)
     nl_tidy
-    return columns_to_keep, nl_tidy
+    return (nl_tidy,)
 
 
 @app.cell
@@ -696,8 +519,8 @@ def _(mo):
 
 @app.cell
 def _(el):
-    el['pedge_count'] = el.groupby(['source', 'target'])['type'].transform('count')
-    return
+    pedge_count = el.groupby(['source', 'target'])['type'].transform('count')
+    return (pedge_count,)
 
 
 @app.cell(hide_code=True)
@@ -719,18 +542,26 @@ def _(mo):
 
 
 @app.cell
-def _(el):
+def _(el, pedge_count):
     el[
-        ((el['pedge_count'] == 1) | ((el['pedge_count'] > 1) & (el['type'] == 'intake'))) & 
+        ((pedge_count == 1) | ((pedge_count > 1) & (el['type'] == 'intake'))) & 
         ((el['source'] == "10") & (el['target'] == "684600"))
     ]
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""This is done by a dedicated reconciliation step (see `twnet/reconcile.py`), which groups the edges by source and target once and applies a policy to every group of parallel edges. Besides the default `prefer_intake` policy, it can prefer sales, sum or take the maximum of the volumes, or keep every edge with a `multiplicity` attribute. It also logs each dropped row, the policy that dropped it, and an edge kept for the same pair. Each remaining edge then gets the number of SWP supply transactions between the entities at its ends (`swp_transactions`).""")
+    return
+
+
 @app.cell
-def _(el):
-    el_noparallel = el[((el['pedge_count'] == 1) | ((el['pedge_count'] > 1) & (el['type'] == 'intake')))].drop(columns=['pedge_count'])
-    return (el_noparallel,)
+def _(cache, el, join_swp_edges, nl_swp, reconcile_parallel_edges, swp):
+    reconciled = cache.run('reconciled_edges', reconcile_parallel_edges, el, policy='prefer_intake')
+    el_noparallel = cache.run('swp_edges', join_swp_edges, reconciled.edges, nl_swp, swp)
+    reconciled.dropped
+    return el_noparallel, reconciled
 
 
 @app.cell
@@ -739,29 +570,66 @@ def _(el_noparallel):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""The edges carry yearly volumes, so we can also tell where each system's water ultimately comes from once purchases are chained through wholesalers, e.g. what share of a city's water is drawn from the Ogallala. Every node's inflow is split over the nodes it buys from, and the shares of the water sources in all nodes are solved at once as one sparse linear system (see `twnet/flows.py`). Each node gets its attributed inflow volume, the number of sources feeding it, its primary source and that source's share, and the share of its inflow that cannot be traced back to a source (e.g., water bought from a seller whose intake was not reported).""")
+    return
+
+
+@app.cell
+def _(attribute_flows, cache, el_noparallel, join_flows, nl_tidy):
+    flows = cache.run('flows', attribute_flows, nl_tidy, el_noparallel)
+    nl_flows = cache.run('flow_nodes', join_flows, nl_tidy, flows)
+    flows.shares
+    return flows, nl_flows
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(
         r"""
         ## Exporting Data
 
-        First, let write the data out as a comma-separated value (CSV) file to allow Gephi users to work with them.
+        First, let write the data out as a comma-separated value (CSV) file to allow Gephi users to work with them, along with GraphML and GEXF files Gephi can open directly. These are written further down, in the same pass over the tables as the application's JSON files. When `pyarrow` is available, the same tables are also written as Parquet files, which downstream notebooks (e.g., `fragmentation.py`) read faster and column by column.
         """
     )
     return
 
 
 @app.cell
-def _(datetime, el_noparallel, nl_tidy):
+def _(cache, datetime, el_noparallel, nl_flows, staging):
     # Get the current date
     current_date = datetime.now().strftime('%Y%m%d')
 
-    # Save the node and edge lists with the date in the filename
-    nl_tidy.to_csv(f'outputs/nodes_{current_date}.csv', index=False)
-    el_noparallel.to_csv(f'outputs/edges_{current_date}.csv', index=False)
+    # Columnar copies for downstream readers
+    if staging.HAS_PYARROW:
+        cache.write('nodes_parquet', f'outputs/nodes_{current_date}.parquet', staging.write_table, nl_flows)
+        cache.write('edges_parquet', f'outputs/edges_{current_date}.parquet', staging.write_table, el_noparallel)
     return (current_date,)
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""Next to the node list, we also store which water sources ultimately feed every node, through any chain of purchases, and which nodes depend on it downstream. Rather than one traversal per node, the network is condensed into its strongly connected components and the sources are propagated once, in topological order, as bitsets (see `twnet/reachability.py`); `twnet.reachability.Reachability.load` reads the file back.""")
+    return
+
+
+@app.cell
+def _(cache, current_date, el_noparallel, nl_tidy, write_reachability):
+    reachability_file = cache.write('reachability', f'outputs/reachability_{current_date}.npz',
+                                    write_reachability, nl_tidy, el_noparallel)
+    reachability_file
+    return (reachability_file,)
+
+
+@app.cell
+def _(cache, current_date, flows, write_csv):
+    # Every node's share of each water source, one row per node and source
+    flows_file = cache.write('flows_csv', f'outputs/flows_{current_date}.csv', write_csv, flows.shares)
+    flows_file
+    return (flows_file,)
+
+
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(
@@ -803,102 +671,94 @@ def _():
 
 @app.cell(hide_code=True)
 def _(mo):
-    mo.md("""To export the graph data, we have to shape it into a dictionary. Then, store it as a JSON. The code below tranforms our node and edge list into a single dictionary that Cytoscape.js can understand.""")
+    mo.md("""To export the graph data, we have to shape it into the nested JSON that Cytoscape.js can understand. Rather than building the whole dictionary in memory, the node and edge records are streamed straight from our tables to the file, a chunk of records at a time, as compact JSON, with gzip and brotli copies compressed from the same stream so they can be served as they are. `write_exports` (see `twnet/export.py`) does this in a single pass over the tables that also writes the dated CSV, GraphML and GEXF files and the network metadata shown on the application's scorecards.""")
     return
 
 
 @app.cell
-def _(el_noparallel, nl_tidy, np, pd):
-    def create_cyto_json(nl: pd.DataFrame, el: pd.DataFrame) -> dict:
-        """
-        Create a JSON object for Cytoscape.js.
-
-        Parameters:
-            nl (pd.DataFrame): Node list.
-            el (pd.DataFrame): Edge list.
+def _(el_noparallel):
+    cyto_el = el_noparallel.rename(columns={'from': 'source',
+                                            'to': 'target'})
+    return (cyto_el,)
 
-        Returns:
-            dict: JSON object for Cytoscape.js.
-        """
-        out = {}
-        out["elements"] = {}
 
-        out["elements"]["nodes"] = [{"data": record} for record in nl.where(pd.notnull(nl), None).replace({np.nan: None}).to_dict(orient='records')]
-        out["elements"]["edges"] = [{"data": record} for record in el.where(pd.notnull(el), None).replace({np.nan: None}).to_dict(orient='records')]
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""Write it all out, the JSON files in the app directory:""")
+    return
 
-        return out
 
-    cyto = create_cyto_json(nl_tidy,
-                            el_noparallel.rename(columns={'from': 'source',
-                                               'to': 'target'})
-                           )
-    return create_cyto_json, cyto
+@app.cell
+def _(ExportPaths, cache, current_date, cyto_el, nl_flows, write_exports):
+    export_paths = ExportPaths(nodes_csv=f'outputs/nodes_{current_date}.csv',
+                               edges_csv=f'outputs/edges_{current_date}.csv',
+                               cyto_json='../app/src/data/network-data.json',
+                               meta_json='../app/src/data/network-meta-data.json',
+                               graphml=f'outputs/network_{current_date}.graphml',
+                               gexf=f'outputs/network_{current_date}.gexf').with_compressed_cyto()
+    export_files = [path for path in cache.write('exports', export_paths, write_exports, nl_flows, cyto_el) if path]
+    export_files
+    return export_files, export_paths
 
 
 @app.cell(hide_code=True)
 def _(mo):
-    mo.md(r"""Write it out in the app directory:""")
+    mo.md(r"""Every run leaves another dated copy of the node and edge lists in `outputs/`, though consecutive ones are mostly identical. The history is also kept in `outputs/temporal/`, as the first snapshot plus, for every later one, only the rows added, removed and changed (see `twnet/temporal.py`), so it grows with the amount of change rather than with the number of runs. `TemporalStore('outputs/temporal').as_of(2025)` rebuilds the network as of a date or year, and `.diff('20250304', '20250403')` lists what changed between two snapshots.""")
     return
 
 
 @app.cell
-def _(cyto, json):
-    with open('../app/src/data/network-data.json', 'w') as f:
-        json.dump(cyto, f, indent=4)
-    return (f,)
+def _(build_store, export_paths, os, profiler):
+    # Adds this run's snapshot (and any older one not stored yet) to outputs/temporal
+    temporal_counts = profiler.run('temporal', build_store, os.path.dirname(export_paths.nodes_csv))
+    temporal_counts
+    return (temporal_counts,)
 
 
-@app.cell
-def _(el_noparallel):
-    len(el_noparallel)
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""The explorer pages only ever show one node and its neighbours. To spare them loading and scanning the whole network, we also write every node's ego network (its inputs, outputs, neighbours and their Cytoscape.js records) to small shard files in `../app/public/ego/`, with an `index.json` giving the shard, byte offset and length of each node's record (see `twnet/shards.py`).""")
     return
 
 
 @app.cell
+def _(cyto_el, nl_flows, profiler, write_ego_shards):
+    ego_files = profiler.run('ego_shards', write_ego_shards, nl_flows, cyto_el, '../app/public/ego')
+    len(ego_files)
+    return (ego_files,)
+
+
+@app.cell(hide_code=True)
 def _(mo):
-    mo.md(r"""## Parking Lot""")
+    mo.md(r"""For a map view, the located water systems are also indexed by their SWP centroid in `../app/public/spatial/`: a grid index (`grid.npz`) answering bounding-box, radius and nearest-neighbour queries without scanning every node, and the nodes split into web map tiles listed in `tiles.json`, so a map only loads the tiles in sight (see `twnet/spatial.py`).""")
     return
 
 
 @app.cell
-def _(el_noparallel, nx):
-    G = nx.from_pandas_edgelist(el_noparallel, source='source', target='target', create_using=nx.DiGraph())
-    return (G,)
+def _(nl_tidy, profiler, write_spatial):
+    spatial_files = profiler.run('spatial', write_spatial, nl_tidy, '../app/public/spatial')
+    len(spatial_files)
+    return (spatial_files,)
 
 
 @app.cell
-def _(G):
-    G.is_directed()
+def _(el_noparallel):
+    len(el_noparallel)
     return
 
 
 @app.cell
-def _(G, el_noparallel, json, nl):
-    graph_meta_data = {
-        'nodes' : {'title': 'Nodes', 
-                   'value': len(G.nodes.data()), 
-                   'description': 'These are key points where water is sourced, sold, stored, transferred, or consumed.'},
-        'edges' : {'title': 'Connections', 
-                   'value': len(G.edges.data()), 
-                   'description': 'These represent the pathways through which water moves between nodes.'},
-        'directed': G.is_directed(),
-        'year': float(el_noparallel['year'].unique()[0]),
-        'sources': {'title': 'Water Source Nodes', 
-                   'value': len(nl[(nl['preliminary_type'] == 'water source') & (~nl['id'].str.contains('BASIN'))]['id'].unique()), 
-                   'description': 'Points in the network where water originates, such as ground and surface water.',
-                    'url': '/netexplorer/sources',
-                   'kvs': {x['id']: x['unified_name'].upper() for x in nl[(nl['preliminary_type'] == 'water source') & (~nl['id'].str.contains('BASIN'))].to_dict(orient='records')}},
-        'systems': {'title': 'Water System Nodes',
-                    'value': len(nl[nl['preliminary_type'] == 'water system']['id'].unique()),
-                    'description': 'Points in the networks involved in the sale and distribution of water.',
-                    'url': '/netexplorer/systems',
-                    'kvs': {x['id']: x['unified_name'].upper() for x in nl[nl['preliminary_type'] == 'water system'].to_dict(orient='records')}}
-    }
+def _(mo):
+    mo.md(r"""## Parking Lot""")
+    return
+
 
-    # graph_meta_data
-    with open('../app/src/data/network-meta-data.json', 'w') as md:
-        json.dump(graph_meta_data, md, indent=4)
-    return graph_meta_data, md
+@app.cell
+def _(export_paths, json):
+    # Written above, with the other exports
+    with open(export_paths.meta_json) as f:
+        graph_meta_data = json.load(f)
+    return (graph_meta_data,)
 
 
 @app.cell
@@ -907,5 +767,34 @@ def _(graph_meta_data):
     return
 
 
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(r"""Which steps of this run were served from the stage cache (and, when profiling, where the run log was written):""")
+    return
+
+
+@app.cell
+def _(
+    NAMES_FILE,
+    cache,
+    current_date,
+    ego_files,
+    export_files,
+    flows_file,
+    graph_meta_data,
+    os,
+    profiler,
+    reachability_file,
+    save_names,
+    spatial_files,
+    temporal_counts,
+):
+    # Runs last: it depends on every export.
+    save_names(os.path.join(cache.folder, NAMES_FILE))
+    profile_files = profiler.save(f'outputs/profile_{current_date}')
+    profile_files, cache.report()
+    return (profile_files,)
+
+
 if __name__ == "__main__":
     app.run()
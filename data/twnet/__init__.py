@@ -0,0 +1,8 @@
+"""
+Helpers for building the Texas Water Network (TWNet) data.
+
+The marimo notebooks in this directory (`network-data-maker.py` and
+`fragmentation.py`) remain the entry points; the modules in this package hold
+the pieces of the pipeline that need to be shared, benchmarked or run outside
+of a notebook.
+"""
@@ -0,0 +1,3 @@
+from twnet.cli import main
+
+main()
@@ -0,0 +1,310 @@
+"""
+Content-addressed, on-disk cache for the pipeline stages.
+
+Every stage run through `StageCache.run` is keyed by a hash of
+
+- the stage name,
+- the code it runs: the source of the stage function's `twnet` module and of
+  every `twnet` module that one depends on (or the function's own source for
+  functions defined elsewhere, e.g. in a notebook),
+- its arguments: input files are hashed by content (and name), data frames by
+  their values, and results of earlier cached stages by those stages' keys.
+
+Because a stage's key includes the keys of the stages it consumes, editing an
+input file or a cleaning rule changes the keys of the stages downstream of it
+and nothing else. Stage results are pickled; files written by `StageCache.write`
+(one or several per export) are stored as they are and copied back on a hit.
+`StageCache.records` tells which stages were cache hits; given a profiler (see
+`twnet.profiling`), every stage is also timed and memory-profiled.
+"""
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+import types
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from twnet.profiling import Profiler
+
+DEFAULT_CACHE_DIR = '.twnet-cache'
+_DIGESTS_FILE = 'file-digests.json'
+_HASH_BLOCK = 1 << 20
+
+
+class StageRecord(NamedTuple):
+    """
+    One stage run: its name, cache key, whether it was a hit, and how long it
+    took (loading the cached result, or computing and storing it).
+    """
+    name: str
+    key: str
+    hit: bool
+    seconds: float
+
+
+def _hasher() -> 'hashlib._Hash':
+    return hashlib.blake2b(digest_size=20)
+
+
+def _twnet_dependencies(module: types.ModuleType) -> List[types.ModuleType]:
+    # The module plus every twnet module reachable through its globals.
+    seen = {}
+    stack = [module]
+    while stack:
+        current = stack.pop()
+        if current.__name__ in seen:
+            continue
+        seen[current.__name__] = current
+        for value in vars(current).values():
+            name = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, '__module__', None)
+            if isinstance(name, str) and name.split('.')[0] == 'twnet' and name in sys.modules:
+                stack.append(sys.modules[name])
+    return [seen[name] for name in sorted(seen)]
+
+
+def code_digest(func: Callable) -> str:
+    """
+    Return a digest of the code `func` runs (see the module docstring).
+    """
+    module = inspect.getmodule(func)
+    h = _hasher()
+    h.update(f'{getattr(func, "__module__", "")}.{getattr(func, "__qualname__", repr(func))}'.encode())
+    if module is not None and module.__name__.split('.')[0] == 'twnet':
+        for dependency in _twnet_dependencies(module):
+            with open(dependency.__file__, 'rb') as f:
+                h.update(f.read())
+    else:
+        try:
+            h.update(inspect.getsource(func).encode())
+        except (OSError, TypeError):
+            # Library code: its version stands in for its source.
+            package = sys.modules.get((getattr(func, '__module__', None) or '').split('.')[0])
+            h.update(str(getattr(package, '__version__', '')).encode())
+    return h.hexdigest()
+
+
+class StageCache:
+    """
+    Cache of pipeline stage results in `folder`.
+
+    Parameters
+    ----------
+    folder : str, optional
+        Where results are stored, by default DEFAULT_CACHE_DIR. Created on
+        first use. Safe to share between worker processes.
+    profiler : Optional[Profiler], optional
+        If given, every stage run or written is measured by this
+        `twnet.profiling.Profiler`, by default None.
+
+    Examples
+    --------
+    >>> cache = StageCache('.twnet-cache')                          # doctest: +SKIP
+    >>> intake_el = cache.run('intake_el', create_intake_el,
+    ...                       'inputs/PWS Intake_2022-2023.csv', year=2022)  # doctest: +SKIP
+    >>> cache.report()                                               # doctest: +SKIP
+    """
+
+    def __init__(self, folder: str = DEFAULT_CACHE_DIR, profiler: Optional['Profiler'] = None):
+        self.folder = folder
+        self.profiler = profiler
+        self.records: List[StageRecord] = []
+        # Keys of the values this cache produced, by object id. The value is
+        # kept alongside so its id cannot be reused while it is tracked.
+        self._produced: Dict[int, tuple] = {}
+        self._file_digests: Optional[Dict[str, dict]] = None
+
+    # Keys -------------------------------------------------------------------
+
+    def _file_digest(self, path: str) -> str:
+        # Content digests are remembered by path, size and modification time,
+        # so an unchanged file is not read again.
+        if self._file_digests is None:
+            try:
+                with open(os.path.join(self.folder, _DIGESTS_FILE)) as f:
+                    self._file_digests = json.load(f)
+            except (OSError, ValueError):
+                self._file_digests = {}
+        stat = os.stat(path)
+        realpath = os.path.realpath(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        known = self._file_digests.get(realpath)
+        if known is not None and known['stamp'] == stamp:
+            return known['digest']
+
+        h = _hasher()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+                h.update(block)
+        self._file_digests[realpath] = {'stamp': stamp, 'digest': h.hexdigest()}
+        self._atomic_write(os.path.join(self.folder, _DIGESTS_FILE),
+                           json.dumps(self._file_digests).encode())
+        return h.hexdigest()
+
+    def _value_digest(self, value: Any) -> str:
+        produced = self._produced.get(id(value))
+        if produced is not None and produced[0] is value:
+            return 'stage:' + produced[1]
+        if isinstance(value, str) and os.path.isfile(value):
+            return f'file:{value}:{self._file_digest(value)}'
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            h = _hasher()
+            h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+            h.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+            h.update(repr(list(value.dtypes) if isinstance(value, pd.DataFrame) else value.dtype).encode())
+            return 'frame:' + h.hexdigest()
+        if isinstance(value, (list, tuple)):
+            return f'{type(value).__name__}:[' + ','.join(self._value_digest(v) for v in value) + ']'
+        if isinstance(value, dict):
+            return 'dict:{' + ','.join(f'{k!r}={self._value_digest(v)}' for k, v in sorted(value.items())) + '}'
+        if value is None or isinstance(value, (str, bytes, bool, int, float, np.generic)):
+            return repr(value)
+        h = _hasher()
+        h.update(pickle.dumps(value))
+        return 'pickle:' + h.hexdigest()
+
+    def key(self, name: str, func: Callable, args: tuple, kwargs: dict) -> str:
+        """
+        Return the cache key of running `func(*args, **kwargs)` as stage `name`.
+        """
+        h = _hasher()
+        h.update(name.encode())
+        h.update(code_digest(func).encode())
+        for value in args:
+            h.update(self._value_digest(value).encode())
+        for arg, value in sorted(kwargs.items()):
+            h.update(f'{arg}={self._value_digest(value)}'.encode())
+        return h.hexdigest()
+
+    # Storage ----------------------------------------------------------------
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _stage(self, name: str, inputs: tuple):
+        if self.profiler is None:
+            return nullcontext(types.SimpleNamespace())
+        return self.profiler.stage(name, inputs)
+
+    def _track(self, value: Any, key: str) -> Any:
+        self._produced[id(value)] = (value, key)
+        # Fields of a returned named tuple are tracked too, so a stage can
+        # hand one of them on to the next.
+        if isinstance(value, tuple) and hasattr(value, '_fields'):
+            for field, item in zip(value._fields, value):
+                self._produced.setdefault(id(item), (item, f'{key}.{field}'))
+        return value
+
+    def run(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Return `func(*args, **kwargs)`, from the cache if this stage already
+        ran on the same code and inputs.
+
+        Parameters
+        ----------
+        name : str
+            Stage name, used in the cache layout and the run records.
+        func : Callable
+            The stage. Its result must be picklable.
+        *args, **kwargs
+            Arguments to `func`. Results of earlier `run` calls on this cache
+            are keyed by those stages' keys.
+
+        Returns
+        -------
+        Any
+            The stage result.
+        """
+        start = time.perf_counter()
+        with self._stage(name, args + tuple(kwargs.values())) as stage:
+            key = self.key(name, func, args, kwargs)
+            path = os.path.join(self.folder, name, key + '.pkl')
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+                hit = True
+            else:
+                value = func(*args, **kwargs)
+                self._atomic_write(path, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                hit = False
+            stage.output, stage.hit = value, hit
+        self.records.append(StageRecord(name, key, hit, time.perf_counter() - start))
+        return self._track(value, key)
+
+    def write(self, name: str, path: Union[str, Sequence[Optional[str]]], writer: Callable, *args) -> Any:
+        """
+        Write a file with `writer(*args, path)`, or copy it from the cache if
+        this export already ran on the same code and inputs.
+
+        Parameters
+        ----------
+        name : str
+            Stage name, used in the cache layout and the run records.
+        path : str or Sequence[Optional[str]]
+            File to write, or, for a writer producing several files, a tuple
+            (e.g. a named tuple) of them; None entries are not written.
+        writer : Callable
+            Function writing its arguments to the path(s) given last.
+        *args
+            Arguments to `writer`, keyed as in `run`.
+
+        Returns
+        -------
+        str or Sequence[Optional[str]]
+            The path(s) written, i.e. `path`.
+        """
+        start = time.perf_counter()
+        with self._stage(name, args) as stage:
+            if isinstance(path, str):
+                paths = [path]
+                key = self.key(name, writer, args, {})
+                cached = [os.path.join(self.folder, name, key + os.path.splitext(path)[1])]
+            else:
+                # Which of the outputs are written is part of the key.
+                paths = list(path)
+                key = self.key(name, writer, args, {'outputs': [p is not None for p in paths]})
+                cached = [None if p is None else os.path.join(self.folder, name, f'{key}.{i}{os.path.splitext(p)[1]}')
+                          for i, p in enumerate(paths)]
+            hit = all(os.path.exists(c) for c in cached if c is not None)
+            if hit:
+                for c, p in zip(cached, paths):
+                    if c is not None:
+                        shutil.copyfile(c, p)
+            else:
+                writer(*args, path)
+                for c, p in zip(cached, paths):
+                    if c is not None:
+                        os.makedirs(os.path.dirname(c), exist_ok=True)
+                        tmp = f'{c}.{os.getpid()}.tmp'
+                        shutil.copyfile(p, tmp)
+                        os.replace(tmp, c)
+            stage.hit = hit
+        self.records.append(StageRecord(name, key, hit, time.perf_counter() - start))
+        return path
+
+    def report(self) -> pd.DataFrame:
+        """
+        Return the stages run so far, with whether each was a cache hit.
+        """
+        return pd.DataFrame(self.records, columns=StageRecord._fields)
+
+    def clear(self) -> None:
+        """
+        Delete every cached result.
+        """
+        shutil.rmtree(self.folder, ignore_errors=True)
+        self.records.clear()
+        self._produced.clear()
+        self._file_digests = None
@@ -0,0 +1,96 @@
+"""
+Command-line entry point for building the network without the notebook.
+
+Examples
+--------
+Build 2022 and 2023 from the files in `inputs/`, in parallel::
+
+    python -m twnet --years 2022 2023
+
+Build one year from explicit files::
+
+    python -m twnet --years 2022 --intake "inputs/PWS Intake_2022-2023.csv" \\
+        --sales "inputs/PWS Sales_2022-2023.csv"
+"""
+import argparse
+import os
+import time
+from typing import List, Optional
+
+from twnet.cache import DEFAULT_CACHE_DIR
+from twnet.pipeline import InputFiles, build_years, find_inputs
+from twnet.reconcile import DEFAULT_POLICY, POLICIES
+from twnet.swp import find_swp_workbook
+from twnet.temporal import TEMPORAL_DIR, build_store
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m twnet', description=__doc__.splitlines()[1])
+    parser.add_argument('--years', type=int, nargs='+', required=True,
+                        help='Survey years to build.')
+    parser.add_argument('--inputs', default='inputs',
+                        help='Folder with the PWS survey CSVs (default: inputs).')
+    for kind in InputFiles._fields:
+        parser.add_argument(f'--{kind}',
+                            help=f'{kind.title()} CSV to use for every year instead of '
+                                 f'the one found in --inputs.')
+    parser.add_argument('--swp',
+                        help='State Water Plan workbook to join into the node and edge lists '
+                             '(default: the one in --inputs, if any).')
+    parser.add_argument('--no-swp', action='store_true',
+                        help='Do not join the State Water Plan workbook.')
+    parser.add_argument('--out', default='outputs',
+                        help='Folder for the per-year outputs (default: outputs).')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_DIR,
+                        help=f'Folder of the stage cache (default: {DEFAULT_CACHE_DIR}).')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute every stage and leave the cache untouched.')
+    parser.add_argument('--parallel-policy', choices=POLICIES, default=DEFAULT_POLICY,
+                        help=f'How parallel edges are reconciled (default: {DEFAULT_POLICY}).')
+    parser.add_argument('--gephi', action='store_true',
+                        help='Also write GraphML and GEXF files for Gephi.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Write a timing and memory profile of every stage next to the outputs '
+                             '(compare two with python -m twnet.profiling).')
+    parser.add_argument('--temporal', action='store_true',
+                        help=f'Add the years built to the store of snapshots over time in '
+                             f'<out>/{TEMPORAL_DIR} (see python -m twnet.temporal).')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: one per year, up to the CPU count).')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    inputs = {}
+    for year in args.years:
+        overrides = {kind: getattr(args, kind) for kind in InputFiles._fields if getattr(args, kind)}
+        if len(overrides) == len(InputFiles._fields):
+            inputs[year] = InputFiles(**overrides)
+        else:
+            try:
+                inputs[year] = find_inputs(args.inputs, year)._replace(**overrides)
+            except FileNotFoundError as error:
+                parser.error(str(error))
+
+    swp_workbook = None
+    if not args.no_swp:
+        swp_workbook = args.swp or (find_swp_workbook(args.inputs) if os.path.isdir(args.inputs) else None)
+
+    start = time.perf_counter()
+    cache_dir = None if args.no_cache else args.cache
+    for summary in build_years(args.years, inputs, args.out, workers=args.workers, cache_dir=cache_dir,
+                               policy=args.parallel_policy, gephi=args.gephi, profile=args.profile,
+                               swp_workbook=swp_workbook):
+        print(f"{summary['year']}: {summary['nodes']} nodes, {summary['edges']} edges")
+        if cache_dir is not None:
+            print(f"  cache hits:   {', '.join(summary['hits']) or '-'}")
+            print(f"  recomputed:   {', '.join(summary['misses']) or '-'}")
+    print(f"Built {len(args.years)} year(s) in {time.perf_counter() - start:.1f}s")
+    if args.temporal:
+        for label, counts in build_store(args.out).items():
+            edges = counts['edges']
+            print(f"{label}: stored {edges.get('added', 0)} edges added, {edges.get('removed', 0)} removed, "
+                  f"{edges.get('changed', 0)} values changed")
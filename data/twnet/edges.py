@@ -0,0 +1,284 @@
+"""
+Edge list builders for the PWS Intake and PWS Sales files.
+
+Both builders can run in two modes. By default the whole file is loaded (through
+the shared, cached loader) and turned into an edge list at once. With a
+`chunksize`, the file is streamed: each chunk is filtered by year first, the
+edge-list columns are derived for the rows that are left, and the chunk is
+yielded (`iter_intake_el` / `iter_sales_el`) or appended to the result
+(`create_intake_el` / `create_sales_el`). Chunks keep their position in the file
+as their index, so edge ids are identical in both modes.
+"""
+import os
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from twnet.loaders import (INTAKE_COLUMNS, INTAKE_DTYPES, SALES_COLUMNS, SALES_DTYPES,
+                           iter_input, read_intake, read_sales)
+from twnet.normalize import normalize_entities
+from twnet.reconcile import reconcile_parallel_edges
+from twnet.sources import resolve_intake_sources
+
+EDGE_COLUMNS = ['source', 'target', 'id', 'yearly_volume', 'type', 'year', 'water_type', 'purchased_self', 'source_file']
+
+# Rows per chunk when streaming and no chunk size is given.
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def _select_edge_columns(edges: pd.DataFrame, columns: Optional[List[str]]) -> pd.DataFrame:
+    if columns:
+        available_columns = [col for col in columns if col in edges.columns]
+        return edges[available_columns]
+    return edges[EDGE_COLUMNS]
+
+
+def _filter_year(frame: pd.DataFrame, column: str, year: Optional[int]) -> pd.DataFrame:
+    if year is None:
+        return frame
+    if column not in frame.columns:
+        return frame.iloc[0:0].copy()
+    return frame.loc[frame[column] == year].copy()
+
+
+def _intake_edges(intake: pd.DataFrame,
+                  df_path: str,
+                  columns: Optional[List[str]],
+                  el: bool,
+                  year: Optional[int]) -> pd.DataFrame:
+    # The source of the water is dependent on a variety of configurations:
+    # - If the water type is reuse and the water is self-supplied, the source is the TWDB Survey Number. A self-loop in the network.
+    # - If the water is purchased, the source is the Seller Survey Number.
+    # - If the water type is groundwater and the water is self-supplied, the source is the Aquifer Source. If the Aquifer Source is "OTHER AQUIFER", the source is the Source Basin.
+    # - If the water type is surface water and the water is self-supplied, the source is the Surface Water Source. If the Surface Water Source is "UNKNOWN", the source is the Source Basin.
+    # The rules are evaluated over whole columns rather than row by row (see twnet/sources.py).
+    intake['source'] = resolve_intake_sources(intake)
+
+    # Create other columns safely(ish)
+    intake['target'] = intake.get('TWDB Survey No', None)
+    intake['id'] = 'intake_' + intake.index.astype(str)
+    intake['type'] = 'intake'
+    intake['yearly_volume'] = intake.get('Total Intake (Gallons)', None) # This defaults to None if the column is not found
+    intake['year'] = intake.get('Year', None)
+    intake['water_type'] = intake.get('Water Type', None)
+    intake['purchased_self'] = intake.get('Purchased / Self-Supplied', None)
+    intake['source_file'] = os.path.basename(df_path)
+
+    if year is not None:
+        intake = intake.query("year == @year")
+
+    if not el:
+        return intake
+
+    # Cleaning rules:
+    intake.loc[:, 'source'] = intake['source'].astype(str)
+    intake.loc[:, 'target'] = intake['target'].astype(str)
+    intake.loc[:, 'source'] = normalize_entities(intake['source'])
+    intake.loc[:, 'target'] = normalize_entities(intake['target'])
+
+    return _select_edge_columns(intake, columns)
+
+
+def _sales_edges(sales: pd.DataFrame,
+                 df_path: str,
+                 columns: Optional[List[str]],
+                 el: bool,
+                 year: Optional[int]) -> pd.DataFrame:
+    # Create columns safely(ish)
+    sales['source'] = sales.get('TWDB Seller Survey No')
+    sales['target'] = sales.get('Buyer Survey No')
+    sales['id'] = 'sales_' + sales.index.astype(str)
+    sales['type'] = 'sale'
+    # Which volume could be reported per transaction? Is this correct?
+    sales['yearly_volume'] = sales.get('Buyer Volume Reported')
+    sales['year'] = sales.get('Year')
+    sales['water_type'] = sales.get('Buyer Water Type')
+    sales['purchased_self'] = 'Purchased'
+    sales['source_file'] = os.path.basename(df_path)
+
+    if year is not None:
+        sales = sales.query("year == @year")
+
+    if not el:
+        return sales
+
+    # Cleaning rules:
+    sales.loc[:, 'source'] = sales['source'].astype(str)
+    sales.loc[:, 'target'] = sales['target'].astype(str)
+
+    return _select_edge_columns(sales, columns)
+
+
+def iter_intake_el(df_path: str,
+                   columns: Optional[List[str]] = None,
+                   el: bool = True,
+                   year: Optional[int] = None,
+                   chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream the intake edge list chunk by chunk.
+
+    Parameters
+    ----------
+    df_path : str
+        Path to intake data.
+    columns : Optional[List[str]], optional
+        Columns to include in edge list, by default None. If None, it selects preset list of columns.
+    el : bool, optional
+        If True, yields edge list chunks, by default True.
+    year : Optional[int], optional
+        Year of data to select, by default None. Applied to each chunk before
+        any column is derived.
+    chunksize : int, optional
+        Rows read per chunk, by default DEFAULT_CHUNKSIZE.
+
+    Yields
+    ------
+    pd.DataFrame
+        Edge list chunks, indexed by row position in the file.
+    """
+    projected = el and not columns
+    for chunk in iter_input(df_path, INTAKE_COLUMNS if projected else None, INTAKE_DTYPES, chunksize):
+        chunk.columns = chunk.columns.str.strip()
+        yield _intake_edges(_filter_year(chunk, 'Year', year), df_path, columns, el, year)
+
+
+def create_intake_el(df_path: str,
+                     columns: Optional[List[str]] = None,
+                     el: bool = True,
+                     year: Optional[int] = None,
+                     chunksize: Optional[int] = None) -> pd.DataFrame:
+    """
+    Create edge list from intake data.
+
+    Parameters
+    ----------
+    df_path : str
+        Path to intake data.
+    columns : Optional[List[str]], optional
+        Columns to include in edge list, by default None. If None, it selects preset list of columns.
+    el : bool, optional
+        If True, returns edge list, by default True.
+    year : Optional[int], optional
+        Year of data to select, by default None.
+    chunksize : Optional[int], optional
+        If given, stream the file in chunks of this many rows (see
+        `iter_intake_el`) instead of loading it whole, by default None.
+
+    Returns
+    -------
+    pd.DataFrame
+        Edge list as defined above.
+    """
+    if chunksize is not None:
+        chunks = list(iter_intake_el(df_path, columns, el, year, chunksize))
+        if chunks:
+            return pd.concat(chunks)
+
+    # Load teh CSG and strip column names from extra spaces. The shared loader
+    # parses the file once per run and, for the default edge list, only reads
+    # the columns we need.
+    intake = read_intake(df_path, projected=el and not columns)
+    intake.columns = intake.columns.str.strip()
+
+    return _intake_edges(intake, df_path, columns, el, year)
+
+
+def iter_sales_el(df_path: str,
+                  columns: Optional[List[str]] = None,
+                  el: bool = True,
+                  year: Optional[int] = None,
+                  chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream the sales edge list chunk by chunk.
+
+    Parameters
+    ----------
+    df_path : str
+        Path to sales data.
+    columns : Optional[List[str]], optional
+        Columns to include in edge list, by default None. If None, it selects preset list of columns.
+    el : bool, optional
+        If True, yields edge list chunks, by default True.
+    year : Optional[int], optional
+        Year of data to filter, by default None. Applied to each chunk before
+        any column is derived.
+    chunksize : int, optional
+        Rows read per chunk, by default DEFAULT_CHUNKSIZE.
+
+    Yields
+    ------
+    pd.DataFrame
+        Edge list chunks, indexed by row position in the file.
+    """
+    projected = el and not columns
+    for chunk in iter_input(df_path, SALES_COLUMNS if projected else None, SALES_DTYPES, chunksize):
+        chunk.columns = chunk.columns.str.strip()
+        yield _sales_edges(_filter_year(chunk, 'Year', year), df_path, columns, el, year)
+
+
+def create_sales_el(df_path: str,
+                    columns: Optional[List[str]] = None,
+                    el: bool = True,
+                    year: Optional[int] = None,
+                    chunksize: Optional[int] = None) -> pd.DataFrame:
+    """
+    Create edge list from sales data.
+
+    Parameters
+    ----------
+    df_path : str
+        Path to sales data.
+    columns : Optional[List[str]], optional
+        Columns to include in edge list, by default None. If None, it selects preset list of columns.
+    el : bool, optional
+        If True, returns edge list, by default True.
+    year : Optional[int], optional
+        Year of data to filter, by default None.
+    chunksize : Optional[int], optional
+        If given, stream the file in chunks of this many rows (see
+        `iter_sales_el`) instead of loading it whole, by default None.
+
+    Returns
+    -------
+    pd.DataFrame
+        Edge list as defined above.
+    """
+    if chunksize is not None:
+        chunks = list(iter_sales_el(df_path, columns, el, year, chunksize))
+        if chunks:
+            return pd.concat(chunks)
+
+    sales = read_sales(df_path, projected=el and not columns)
+    sales.columns = sales.columns.str.strip()
+
+    return _sales_edges(sales, df_path, columns, el, year)
+
+
+def combine_edges(intake_el: pd.DataFrame, sales_el: pd.DataFrame) -> pd.DataFrame:
+    """
+    Row bind the intake and sales edge lists.
+    """
+    return pd.concat([intake_el, sales_el])
+
+
+def remove_parallel_edges(el: pd.DataFrame) -> pd.DataFrame:
+    """
+    Resolve parallel edges by keeping the intake records.
+
+    In May 2025, the TWDB partner asked us to prioritize the intake purchases
+    over the sales when we have parallel edges. Source/target pairs with a
+    single edge are kept as they are; for pairs with several edges, only the
+    intake edges are kept. See `twnet.reconcile` for the other policies and
+    the log of dropped rows.
+
+    Parameters
+    ----------
+    el : pd.DataFrame
+        Combined intake and sales edge list.
+
+    Returns
+    -------
+    pd.DataFrame
+        Edge list without the parallel sales edges.
+    """
+    return reconcile_parallel_edges(el, 'prefer_intake').edges
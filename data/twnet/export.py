@@ -0,0 +1,752 @@
+"""
+Exports of the final node and edge lists: the CSV files shared with Gephi
+users, the Cytoscape.js JSON used by the front-end application, the network
+metadata shown on its scorecards (counts, plus the graph metrics of
+`twnet.metrics`), and GraphML/GEXF files for Gephi.
+
+`export_network` walks the node and edge lists once, a chunk of rows at a time,
+and hands every chunk to each of its targets (`CsvTarget`, `CytoJsonTarget`,
+`MetaDataTarget`, `GraphMLTarget`, `GexfTarget`). Column encodings (JSON
+literals, escaped XML text) are computed at most once per chunk and shared by
+the targets that need them, so adding an output format adds its writing, not
+another pass over the tables. `write_exports` runs the usual set of targets
+from an `ExportPaths`.
+
+The Cytoscape.js JSON is streamed: each column is encoded to JSON literals at
+once and the records are assembled and written a chunk at a time, so neither
+per-row dicts nor the whole document are ever held in memory. Its output parses
+to exactly what `create_cyto_json` returns. Its gzip (and, when the `brotli`
+package is installed, brotli) variants served to the browser are compressed
+from the same stream.
+"""
+import gzip
+import json
+from json.encoder import encode_basestring_ascii
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+import pandas as pd
+
+from twnet.metrics import graph_metrics
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# Records encoded and written per chunk by `write_cyto_json`.
+RECORDS_PER_CHUNK = 1_000
+
+# Extensions of the compressed variants `compress_file` can write.
+COMPRESSED_EXTENSIONS = ['gz', 'br'] if HAS_BROTLI else ['gz']
+
+# Brotli's maximum quality (11) is another ~20% smaller but ~50x slower.
+BROTLI_QUALITY = 9
+_COPY_BLOCK = 1 << 20
+
+# Quotes are escaped too, so escaped text can go in attribute values.
+_XML_ATTRIBUTE = {'"': '&quot;'}
+
+
+def create_cyto_json(nl: pd.DataFrame, el: pd.DataFrame) -> dict:
+    """
+    Create a JSON object for Cytoscape.js.
+
+    Parameters:
+        nl (pd.DataFrame): Node list.
+        el (pd.DataFrame): Edge list.
+
+    Returns:
+        dict: JSON object for Cytoscape.js.
+    """
+    out = {}
+    out["elements"] = {}
+
+    out["elements"]["nodes"] = [{"data": record} for record in nl.where(pd.notnull(nl), None).replace({np.nan: None}).to_dict(orient='records')]
+    out["elements"]["edges"] = [{"data": record} for record in el.where(pd.notnull(el), None).replace({np.nan: None}).to_dict(orient='records')]
+
+    return out
+
+
+class _MetaData:
+    # Accumulates the metadata from chunks of the node and edge lists.
+
+    def __init__(self) -> None:
+        self.sources: Dict[str, str] = {}
+        self.systems: Dict[str, str] = {}
+        self.edges: List[pd.DataFrame] = []
+
+    def add_nodes(self, nl: pd.DataFrame) -> None:
+        # Nodes without a name get an empty one: NaN is not valid JSON.
+        names = nl['unified_name'].fillna('').astype(str).str.upper()
+        sources = ((nl['preliminary_type'] == 'water source') & (~nl['id'].str.contains('BASIN'))).to_numpy()
+        systems = (nl['preliminary_type'] == 'water system').to_numpy()
+        self.sources.update(zip(nl['id'].to_numpy()[sources], names.to_numpy()[sources]))
+        self.systems.update(zip(nl['id'].to_numpy()[systems], names.to_numpy()[systems]))
+
+    def add_edges(self, el: pd.DataFrame) -> None:
+        self.edges.append(el[['source', 'target', 'year']])
+
+    def result(self) -> dict:
+        el = pd.concat(self.edges) if self.edges else pd.DataFrame(columns=['source', 'target', 'year'])
+        metrics = graph_metrics(el)
+        return {
+            'nodes' : {'title': 'Nodes',
+                       'value': metrics['nodes'],
+                       'description': 'These are key points where water is sourced, sold, stored, transferred, or consumed.'},
+            'edges' : {'title': 'Connections',
+                       'value': metrics['edges'],
+                       'description': 'These represent the pathways through which water moves between nodes.'},
+            'directed': True,
+            'year': float(el['year'].iloc[0]) if len(el) else None,
+            'sources': {'title': 'Water Source Nodes',
+                       'value': len(self.sources),
+                       'description': 'Points in the network where water originates, such as ground and surface water.',
+                        'url': '/netexplorer/sources',
+                       'kvs': self.sources},
+            'systems': {'title': 'Water System Nodes',
+                        'value': len(self.systems),
+                        'description': 'Points in the networks involved in the sale and distribution of water.',
+                        'url': '/netexplorer/systems',
+                        'kvs': self.systems},
+            'density': {'title': 'Density',
+                        'value': metrics['density'],
+                        'description': 'Share of all possible connections between nodes that exist.'},
+            'reciprocity': {'title': 'Reciprocity',
+                            'value': metrics['reciprocity'],
+                            'description': 'Share of connections matched by a connection in the opposite direction.'},
+            'components': {'title': 'Connected Groups',
+                           'value': metrics['weak_components'],
+                           'description': 'Groups of nodes linked to each other, ignoring the direction of the water.'},
+            'strong_components': {'title': 'Mutually Reachable Groups',
+                                  'value': metrics['strong_components'],
+                                  'description': 'Groups of nodes where water can move from any node to every other.'},
+            'metrics': metrics
+        }
+
+
+def create_meta_data(nl: pd.DataFrame, el: pd.DataFrame) -> dict:
+    """
+    Summarize the network for the application's scorecards.
+
+    Parameters:
+        nl (pd.DataFrame): Node list.
+        el (pd.DataFrame): Edge list without parallel edges.
+
+    Returns:
+        dict: Node, edge, source and system counts, plus id -> name lookups,
+        scorecards for the density, reciprocity and components, and every
+        metric of `twnet.metrics.graph_metrics` under 'metrics'.
+    """
+    meta = _MetaData()
+    meta.add_nodes(nl)
+    meta.add_edges(el)
+    return meta.result()
+
+
+def write_json(data: dict, path: str) -> None:
+    """
+    Write a JSON export the way the application expects it.
+    """
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def write_csv(df: pd.DataFrame, path: str) -> None:
+    """
+    Write a node or edge list as the CSV shared with Gephi users.
+    """
+    df.to_csv(path, index=False)
+
+
+def _json_literals(column: pd.Series) -> np.ndarray:
+    # Encode a column as JSON literals, the way json.dumps would encode the
+    # values create_cyto_json puts in its records (missing values as null).
+    kind = column.dtype.kind
+    if kind in 'biu' and column.hasnans:
+        # Nullable integers or booleans: the present values as plain ones.
+        missing = column.isna().to_numpy()
+        out = np.full(len(column), 'null', dtype=object)
+        out[~missing] = _json_literals(column[~missing].astype(column.dtype.numpy_dtype))
+        return out
+    values = column.to_numpy()
+    if kind == 'b':
+        return np.where(values, 'true', 'false').astype(object)
+    if kind in 'iu':
+        return values.astype(str).astype(object)
+
+    missing = pd.isna(column).to_numpy()
+    out = np.full(len(values), 'null', dtype=object)
+    if kind == 'f':
+        present = values[~missing]
+        encoded = np.array(list(map(float.__repr__, present.tolist())), dtype=object)
+        encoded[present == np.inf] = 'Infinity'
+        encoded[present == -np.inf] = '-Infinity'
+        out[~missing] = encoded
+        return out
+
+    def encode(value) -> str:
+        if isinstance(value, str):
+            return encode_basestring_ascii(value)
+        if isinstance(value, np.generic):
+            value = value.item()
+        return json.dumps(value)
+
+    out[~missing] = list(map(encode, values[~missing].tolist()))
+    return out
+
+
+def _xml_texts(column: pd.Series) -> np.ndarray:
+    # Encode a column as escaped XML text (usable in attribute values too),
+    # with None for missing values.
+    kind = column.dtype.kind
+    if kind in 'biu' and column.hasnans:
+        missing = column.isna().to_numpy()
+        out = np.full(len(column), None, dtype=object)
+        out[~missing] = _xml_texts(column[~missing].astype(column.dtype.numpy_dtype))
+        return out
+    values = column.to_numpy()
+    if kind == 'b':
+        return np.where(values, 'true', 'false').astype(object)
+    if kind in 'iu':
+        return values.astype(str).astype(object)
+
+    missing = pd.isna(column).to_numpy()
+    out = np.full(len(values), None, dtype=object)
+    present = values[~missing].tolist()
+    if kind == 'f':
+        out[~missing] = list(map(float.__repr__, present))
+    else:
+        out[~missing] = [escape(str(value), _XML_ATTRIBUTE) for value in present]
+    return out
+
+
+def _xml_type(dtype: np.dtype) -> str:
+    # GraphML and GEXF attribute type of a column.
+    return {'b': 'boolean', 'i': 'long', 'u': 'long', 'f': 'double'}.get(dtype.kind, 'string')
+
+
+class ExportChunk:
+    """
+    A chunk of rows of the node or edge list, with the encodings of its
+    columns computed on first use and shared by every export target.
+    """
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        self.frame = frame
+        self._encoded: Dict[tuple, np.ndarray] = {}
+
+    def _encode(self, kind: str, position: int, encoder) -> np.ndarray:
+        if (kind, position) not in self._encoded:
+            self._encoded[kind, position] = encoder(self.frame.iloc[:, position])
+        return self._encoded[kind, position]
+
+    def json(self, position: int) -> np.ndarray:
+        """
+        JSON literals of the column at `position` (missing values as null).
+        """
+        return self._encode('json', position, _json_literals)
+
+    def xml(self, position: int) -> np.ndarray:
+        """
+        Escaped XML text of the column at `position` (None if missing).
+        """
+        return self._encode('xml', position, _xml_texts)
+
+    def cyto_records(self) -> np.ndarray:
+        """
+        One compact, ASCII-only `{"data":{...}}` JSON string per row.
+        """
+        if ('cyto', -1) not in self._encoded:
+            keys = [encode_basestring_ascii(str(name)) + ':' for name in self.frame.columns]
+            records = np.full(len(self.frame), '{"data":{', dtype=object)
+            for i, key in enumerate(keys):
+                records = records + ((',' if i else '') + key) + self.json(i)
+            self._encoded['cyto', -1] = records + '}}'
+        return self._encoded['cyto', -1]
+
+
+def iter_cyto_records(df: pd.DataFrame, chunksize: int = RECORDS_PER_CHUNK) -> Iterator[np.ndarray]:
+    """
+    Yield the Cytoscape.js records of `df`, a chunk of rows at a time.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Node or edge list.
+    chunksize : int, optional
+        Rows encoded per chunk, by default RECORDS_PER_CHUNK.
+
+    Yields
+    ------
+    np.ndarray
+        Object array with one compact, ASCII-only JSON string per row, of
+        the form `{"data":{...}}`.
+    """
+    for start in range(0, len(df), chunksize):
+        yield ExportChunk(df.iloc[start:start + chunksize]).cyto_records()
+
+
+def cyto_records(df: pd.DataFrame) -> np.ndarray:
+    """
+    Return the Cytoscape.js records of `df` (see `iter_cyto_records`) as one
+    object array, positioned like its rows.
+    """
+    chunks = list(iter_cyto_records(df))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=object)
+
+
+def json_list(encoded: Iterable[str]) -> str:
+    """
+    Join values already encoded as JSON into a JSON list.
+    """
+    return '[' + ','.join(encoded) + ']'
+
+
+class _CompressedFile:
+    # Binary file object compressing what is written to it, gzip or brotli
+    # depending on whether `path` ends in `.gz` or `.br`.
+
+    def __init__(self, path: str) -> None:
+        if path.endswith('.gz'):
+            self._raw = open(path, 'wb')
+            # No timestamp in the header, so unchanged inputs give identical files.
+            self._gzip = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=9, mtime=0)
+            self._brotli = None
+        elif path.endswith('.br'):
+            if not HAS_BROTLI:
+                raise ImportError("Brotli compression requires the brotli package (pip install brotli).")
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._raw = open(path, 'wb')
+            self._gzip = None
+        else:
+            raise ValueError(f"Unknown compressed extension for {path!r} (expected .gz or .br).")
+
+    def write(self, data: bytes) -> None:
+        if self._gzip is not None:
+            self._gzip.write(data)
+        else:
+            self._raw.write(self._brotli.process(data))
+
+    def close(self) -> None:
+        if self._gzip is not None:
+            self._gzip.close()
+        else:
+            self._raw.write(self._brotli.finish())
+        self._raw.close()
+
+
+class ExportTarget:
+    """
+    One output of `export_network`. It is given the whole node and edge lists
+    first (for headers), then every chunk of nodes, then every chunk of edges.
+    """
+
+    def begin(self, nl: pd.DataFrame, el: pd.DataFrame) -> None:
+        pass
+
+    def write_nodes(self, chunk: ExportChunk) -> None:
+        pass
+
+    def end_nodes(self) -> None:
+        pass
+
+    def write_edges(self, chunk: ExportChunk) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class CsvTarget(ExportTarget):
+    """
+    The node or edge list as CSV (see `write_csv`).
+
+    Parameters
+    ----------
+    path : str
+        File to write.
+    table : str
+        'nodes' or 'edges'.
+    """
+
+    def __init__(self, path: str, table: str) -> None:
+        if table not in ('nodes', 'edges'):
+            raise ValueError(f"Unknown table {table!r}; expected 'nodes' or 'edges'.")
+        self.path = path
+        self.table = table
+        self._file = None
+
+    def begin(self, nl: pd.DataFrame, el: pd.DataFrame) -> None:
+        self._file = open(self.path, 'w', newline='')
+        (nl if self.table == 'nodes' else el).iloc[0:0].to_csv(self._file, index=False)
+
+    def write_nodes(self, chunk: ExportChunk) -> None:
+        if self.table == 'nodes':
+            chunk.frame.to_csv(self._file, header=False, index=False)
+
+    def write_edges(self, chunk: ExportChunk) -> None:
+        if self.table == 'edges':
+            chunk.frame.to_csv(self._file, header=False, index=False)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class CytoJsonTarget(ExportTarget):
+    """
+    The compact Cytoscape.js JSON (see `write_cyto_json`), plus compressed
+    copies of it.
+
+    Parameters
+    ----------
+    path : str
+        File to write.
+    compressed : Sequence[str], optional
+        `.gz` / `.br` copies to compress from the same stream, by default none.
+    """
+
+    def __init__(self, path: str, compressed: Sequence[str] = ()) -> None:
+        self.path = path
+        self.compressed = list(compressed)
+        self._sinks: List[BinaryIO] = []
+        self._empty = True
+
+    def _write(self, text: str) -> None:
+        data = text.encode('ascii')
+        for sink in self._sinks:
+            sink.write(data)
+
+    def _records(self, chunk: ExportChunk) -> None:
+        records = chunk.cyto_records()
+        if len(records):
+            self._write(('' if self._empty else ',') + ','.join(records))
+            self._empty = False
+
+    def begin(self, nl: pd.DataFrame, el: pd.DataFrame) -> None:
+        self._sinks = [open(self.path, 'wb')]
+        self._sinks.extend(_CompressedFile(path) for path in self.compressed)
+        self._write('{"elements":{"nodes":[')
+
+    def write_nodes(self, chunk: ExportChunk) -> None:
+        self._records(chunk)
+
+    def end_nodes(self) -> None:
+        self._write('],"edges":[')
+        self._empty = True
+
+    def write_edges(self, chunk: ExportChunk) -> None:
+        self._records(chunk)
+
+    def close(self) -> None:
+        if self._sinks:
+            self._write(']}}')
+        for sink in self._sinks:
+            sink.close()
+
+
+class MetaDataTarget(ExportTarget):
+    """
+    The network metadata JSON (see `create_meta_data`).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._meta = _MetaData()
+
+    def write_nodes(self, chunk: ExportChunk) -> None:
+        self._meta.add_nodes(chunk.frame)
+
+    def write_edges(self, chunk: ExportChunk) -> None:
+        self._meta.add_edges(chunk.frame)
+
+    def close(self) -> None:
+        write_json(self._meta.result(), self.path)
+
+
+class _XmlTarget(ExportTarget):
+    # Shared by the GraphML and GEXF targets: node ids come from the `id`
+    # column, edge ends from `source`/`target` (and edge ids from `id`); every
+    # other column is written as an attribute, and missing values are left out.
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = None
+
+    def _attributes(self, df: pd.DataFrame, reserved: Sequence[str]) -> List[tuple]:
+        # (position, name, type) of the attribute columns.
+        return [(i, str(name), _xml_type(dtype)) for i, (name, dtype) in enumerate(df.dtypes.items())
+                if name not in reserved]
+
+    def _position(self, df: pd.DataFrame, name: str) -> int:
+        return list(df.columns).index(name)
+
+    def _write(self, elements: np.ndarray) -> None:
+        if len(elements):
+            self._file.write(''.join(elements))
+
+    def begin(self, nl: pd.DataFrame, el: pd.DataFrame) -> None:
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._node_id = self._position(nl, 'id')
+        self._edge_ends = (self._position(el, 'source'), self._position(el, 'target'))
+        self._edge_id = self._position(el, 'id') if 'id' in el.columns else None
+        self._node_attributes = self._attributes(nl, ['id'])
+        self._edge_attributes = self._attributes(el, ['source', 'target', 'id'])
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def _optional(texts: np.ndarray, prefix: str, suffix: str) -> np.ndarray:
+    # `prefix + text + suffix` where the text is present, '' where it is not.
+    out = np.full(len(texts), '', dtype=object)
+    present = pd.notna(texts)
+    out[present] = prefix + texts[present] + suffix
+    return out
+
+
+class GraphMLTarget(_XmlTarget):
+    """
+    The network as GraphML, for Gephi and other graph tools.
+    """
+
+    def begin(self, nl: pd.DataFrame, el: pd.DataFrame) -> None:
+        super().begin(nl, el)
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                         '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+                         'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                         'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+                         'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
+        for kind, attributes in (('node', self._node_attributes), ('edge', self._edge_attributes)):
+            for i, name, xml_type in attributes:
+                self._file.write(f'<key id="{kind[0]}{i}" for="{kind}" '
+                                 f'attr.name={quoteattr(name)} attr.type="{xml_type}"/>\n')
+        self._file.write('<graph edgedefault="directed">\n')
+
+    def _data(self, chunk: ExportChunk, kind: str, attributes: List[tuple]) -> np.ndarray:
+        data = np.full(len(chunk.frame), '', dtype=object)
+        for i, _, _ in attributes:
+            data = data + _optional(chunk.xml(i), f'<data key="{kind[0]}{i}">', '</data>')
+        return data
+
+    def write_nodes(self, chunk: ExportChunk) -> None:
+        self._write('<node id="' + chunk.xml(self._node_id) + '">'
+                    + self._data(chunk, 'node', self._node_attributes) + '</node>\n')
+
+    def write_edges(self, chunk: ExportChunk) -> None:
+        source, target = self._edge_ends
+        ids = '' if self._edge_id is None else _optional(chunk.xml(self._edge_id), ' id="', '"')
+        self._write('<edge' + ids + ' source="' + chunk.xml(source) + '" target="' + chunk.xml(target) + '">'
+                    + self._data(chunk, 'edge', self._edge_attributes) + '</edge>\n')
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.write('</graph>\n</graphml>\n')
+        super().close()
+
+
+class GexfTarget(_XmlTarget):
+    """
+    The network as GEXF 1.2, Gephi's native exchange format. Nodes are
+    labelled with their `unified_name` when there is one.
+    """
+
+    def begin(self, nl: pd.DataFrame, el: pd.DataFrame) -> None:
+        super().begin(nl, el)
+        self._label = self._position(nl, 'unified_name') if 'unified_name' in nl.columns else self._node_id
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                         '<gexf xmlns="http://www.gexf.net/1.2draft" version="1.2">\n'
+                         '<graph mode="static" defaultedgetype="directed">\n')
+        for kind, attributes in (('node', self._node_attributes), ('edge', self._edge_attributes)):
+            self._file.write(f'<attributes class="{kind}">\n')
+            for i, name, xml_type in attributes:
+                self._file.write(f'<attribute id="{i}" title={quoteattr(name)} type="{xml_type}"/>\n')
+            self._file.write('</attributes>\n')
+        self._file.write('<nodes>\n')
+
+    def _attvalues(self, chunk: ExportChunk, attributes: List[tuple]) -> np.ndarray:
+        values = np.full(len(chunk.frame), '', dtype=object)
+        for i, _, _ in attributes:
+            values = values + _optional(chunk.xml(i), f'<attvalue for="{i}" value="', '"/>')
+        return _optional(np.where(values == '', None, values), '<attvalues>', '</attvalues>')
+
+    def write_nodes(self, chunk: ExportChunk) -> None:
+        ids = chunk.xml(self._node_id)
+        labels = chunk.xml(self._label)
+        labels = np.where(pd.notna(labels), labels, ids)
+        self._write('<node id="' + ids + '" label="' + labels + '">'
+                    + self._attvalues(chunk, self._node_attributes) + '</node>\n')
+
+    def end_nodes(self) -> None:
+        self._file.write('</nodes>\n<edges>\n')
+
+    def write_edges(self, chunk: ExportChunk) -> None:
+        source, target = self._edge_ends
+        ids = _optional(chunk.xml(self._edge_id), ' id="', '"') if self._edge_id is not None else ''
+        self._write('<edge' + ids + ' source="' + chunk.xml(source) + '" target="' + chunk.xml(target) + '">'
+                    + self._attvalues(chunk, self._edge_attributes) + '</edge>\n')
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.write('</edges>\n</graph>\n</gexf>\n')
+        super().close()
+
+
+def export_network(nl: pd.DataFrame,
+                   el: pd.DataFrame,
+                   targets: Sequence[ExportTarget],
+                   chunksize: int = RECORDS_PER_CHUNK) -> None:
+    """
+    Write the node and edge lists to every target in a single pass.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list.
+    el : pd.DataFrame
+        Edge list.
+    targets : Sequence[ExportTarget]
+        Outputs to write.
+    chunksize : int, optional
+        Rows handed to the targets at a time, by default RECORDS_PER_CHUNK.
+    """
+    for target in targets:
+        target.begin(nl, el)
+    try:
+        for start in range(0, len(nl), chunksize):
+            chunk = ExportChunk(nl.iloc[start:start + chunksize])
+            for target in targets:
+                target.write_nodes(chunk)
+        for target in targets:
+            target.end_nodes()
+        for start in range(0, len(el), chunksize):
+            chunk = ExportChunk(el.iloc[start:start + chunksize])
+            for target in targets:
+                target.write_edges(chunk)
+    finally:
+        for target in targets:
+            target.close()
+
+
+class ExportPaths(NamedTuple):
+    """
+    Files written by `write_exports`; formats left as None are skipped.
+    """
+    nodes_csv: Optional[str] = None
+    edges_csv: Optional[str] = None
+    cyto_json: Optional[str] = None
+    cyto_json_gz: Optional[str] = None
+    cyto_json_br: Optional[str] = None
+    meta_json: Optional[str] = None
+    graphml: Optional[str] = None
+    gexf: Optional[str] = None
+
+    def with_compressed_cyto(self) -> 'ExportPaths':
+        """
+        Return these paths with every compressed variant of the Cytoscape.js
+        JSON that can be written (see `compressed_paths`).
+        """
+        variants = {f'cyto_json_{path.rsplit(".", 1)[1]}': path for path in compressed_paths(self.cyto_json)}
+        return self._replace(**variants)
+
+
+def write_exports(nl: pd.DataFrame,
+                  el: pd.DataFrame,
+                  paths: ExportPaths,
+                  chunksize: int = RECORDS_PER_CHUNK) -> None:
+    """
+    Write the node and edge lists to every format in `paths`, in one pass
+    (see `export_network`).
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Tidy node list.
+    el : pd.DataFrame
+        Edge list without parallel edges.
+    paths : ExportPaths
+        Files to write.
+    chunksize : int, optional
+        Rows handed to the writers at a time, by default RECORDS_PER_CHUNK.
+    """
+    targets = []
+    if paths.nodes_csv:
+        targets.append(CsvTarget(paths.nodes_csv, 'nodes'))
+    if paths.edges_csv:
+        targets.append(CsvTarget(paths.edges_csv, 'edges'))
+    compressed = [path for path in (paths.cyto_json_gz, paths.cyto_json_br) if path]
+    if paths.cyto_json:
+        targets.append(CytoJsonTarget(paths.cyto_json, compressed))
+    elif compressed:
+        raise ValueError("Compressed copies of the Cytoscape.js JSON need its path too (cyto_json).")
+    if paths.meta_json:
+        targets.append(MetaDataTarget(paths.meta_json))
+    if paths.graphml:
+        targets.append(GraphMLTarget(paths.graphml))
+    if paths.gexf:
+        targets.append(GexfTarget(paths.gexf))
+    export_network(nl, el, targets, chunksize)
+
+
+def write_cyto_json(nl: pd.DataFrame,
+                    el: pd.DataFrame,
+                    path: str,
+                    compact: bool = True,
+                    chunksize: int = RECORDS_PER_CHUNK) -> None:
+    """
+    Stream the Cytoscape.js JSON of a node and edge list to a file.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list.
+    el : pd.DataFrame
+        Edge list.
+    path : str
+        File to write.
+    compact : bool, optional
+        If True (default), write compact JSON, streamed a chunk of records at
+        a time. If False, build the document with `create_cyto_json` and write
+        it indented, as earlier versions of the notebook did.
+    chunksize : int, optional
+        Records encoded per chunk, by default RECORDS_PER_CHUNK.
+    """
+    if not compact:
+        write_json(create_cyto_json(nl, el), path)
+        return
+    export_network(nl, el, [CytoJsonTarget(path)], chunksize)
+
+
+def compress_file(source: str, path: str) -> None:
+    """
+    Write a compressed copy of `source`, gzip or brotli depending on whether
+    `path` ends in `.gz` or `.br`.
+
+    The gzip header carries no timestamp, so unchanged inputs give
+    byte-identical files. Brotli requires the `brotli` package.
+    """
+    with open(source, 'rb') as src:
+        dst = _CompressedFile(path)
+        try:
+            for block in iter(lambda: src.read(_COPY_BLOCK), b''):
+                dst.write(block)
+        finally:
+            dst.close()
+
+
+def compressed_paths(path: str) -> List[str]:
+    """
+    Return the paths of the compressed variants of `path` that can be written.
+    """
+    return [f'{path}.{extension}' for extension in COMPRESSED_EXTENSIONS]
+
+
+def write_meta_data(nl: pd.DataFrame, el: pd.DataFrame, path: str) -> None:
+    """
+    Write the network metadata JSON of a node and edge list.
+    """
+    write_json(create_meta_data(nl, el), path)
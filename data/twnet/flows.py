@@ -0,0 +1,262 @@
+"""
+Attribution of every node's water to the water sources it originates from.
+
+Edges carry the volume a node passes on to another; chained through
+wholesalers, they tell what share of a city's water comes from, e.g., the
+Ogallala Aquifer. `transfer_matrix` builds a sparse, column-normalized matrix
+`T` whose column `j` holds the fraction of node `j`'s inflow coming from every
+node. The shares of the sources in every node (`S`, nodes by sources) then
+solve
+
+    S = B + T' S
+
+where `B` makes every source its own origin. The system is solved for all
+nodes and sources at once, either by a direct sparse LU solve (the default),
+restricted to the nodes a source feeds so it is never singular, or by
+iterating the sparse product, which is exact after as many steps as the
+longest chain of purchases and converges geometrically inside cycles of
+sales.
+
+Rules
+-----
+- Water sources take no inflow: their incoming edges, if any, are ignored,
+  and they have no row in the long table (they are their own primary source).
+- Edges without a positive volume carry no attributed flow.
+- Self-loops (a system reusing its own water) are left out: recirculated
+  water has the mix of the node's other inflows.
+- Water bought from a node no source feeds (e.g., a seller whose intake was
+  not reported) is unattributed, and so is water circulating in a cycle of
+  sales that no source feeds.
+
+`attribute_flows` returns the shares as a long table, one row per node and
+source, and a summary per node, which `join_flows` adds to the node list as
+the `FLOW_NODE_COLUMNS`; `write_flows` writes the long table next to the
+node list as `flows_{date}.csv`.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from twnet.export import write_csv
+from twnet.reconcile import parse_volumes
+from twnet.registry import WATER_SOURCE, NodeRegistry
+
+METHODS = ('solve', 'iterate')
+DEFAULT_METHOD = 'solve'
+
+# Largest change of a share between two steps of the 'iterate' method at
+# which it stops, and the most steps it takes.
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 1_000
+
+# Columns added to the node list by `join_flows`.
+FLOW_NODE_COLUMNS = ['inflow_volume', 'flow_sources', 'primary_source', 'primary_source_share', 'unattributed_share']
+
+
+class TransferMatrix(NamedTuple):
+    """
+    The column-normalized transfer matrix of a network.
+    """
+    registry: NodeRegistry
+    # Entry (i, j) is the fraction of node j's inflow that comes from node i.
+    matrix: sparse.csc_matrix
+    # Volume of every node's attributed inflow (0 if none)
+    inflow: np.ndarray
+    # Codes of the water sources: column `k` of the shares is `sources[k]`
+    sources: np.ndarray
+
+
+class FlowAttribution(NamedTuple):
+    """
+    Shares of the water sources in every node: `shares` has a row per node
+    and source feeding it (`id`, `source`, `share` of the node's inflow and
+    attributed `volume`), and `nodes` a row per node with its `id` and the
+    `FLOW_NODE_COLUMNS`.
+    """
+    shares: pd.DataFrame
+    nodes: pd.DataFrame
+
+
+def transfer_matrix(nl: pd.DataFrame, el: pd.DataFrame, volume: str = 'yearly_volume') -> TransferMatrix:
+    """
+    Build the column-normalized transfer matrix of a network.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list, with `id` and `preliminary_type` columns; its water
+        sources are the origins the flows are attributed to.
+    el : pd.DataFrame
+        Edge list, with `source` and `target` columns. Parallel edges are
+        summed.
+    volume : str, optional
+        Volume column, by default 'yearly_volume' (reported volumes such as
+        ' 5,025,258,000 ' are parsed).
+
+    Returns
+    -------
+    TransferMatrix
+    """
+    registry = NodeRegistry.from_edges(el)
+    source, target = registry.edge_codes(el)
+    registry.intern(nl['id'].astype(str))
+    n = len(registry)
+
+    sources = np.unique(registry.codes_of(nl.loc[nl['preliminary_type'] == WATER_SOURCE, 'id'].astype(str)))
+    sources = sources[sources >= 0]
+    is_source = np.zeros(n, dtype=bool)
+    is_source[sources] = True
+
+    volumes = parse_volumes(el[volume])
+    keep = (volumes > 0) & (source != target) & ~is_source[target]
+    volumes, source, target = volumes[keep], source[keep], target[keep]
+    inflow = np.bincount(target, weights=volumes, minlength=n)
+    matrix = sparse.csc_matrix((volumes / inflow[target], (source, target)), shape=(n, n))
+    return TransferMatrix(registry, matrix, inflow, sources)
+
+
+def _fed(transposed: sparse.csr_matrix, origins: sparse.csr_matrix) -> np.ndarray:
+    # Nodes reached from a source along edges with a volume.
+    fed = np.asarray(origins.sum(axis=1)).ravel() > 0
+    while True:
+        grown = fed | (transposed @ fed.astype(float) > 0)
+        if (grown == fed).all():
+            return fed
+        fed = grown
+
+
+def _solve(transposed: sparse.csr_matrix, origins: sparse.csr_matrix) -> sparse.csr_matrix:
+    # Only the nodes a source feeds: every share of the others is 0, and a
+    # cycle of sales no source feeds would make the system singular.
+    rows = np.flatnonzero(_fed(transposed, origins))
+    system = sparse.identity(len(rows), format='csc') - transposed[rows][:, rows].tocsc()
+    lu = splu(system)
+    right = origins[rows].tocsc()
+    # One triangular solve per source, densifying one column at a time and
+    # keeping the shares found sparse, so memory stays linear in the nodes.
+    found_rows, found_columns = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    found_shares = [np.empty(0)]
+    for k in range(origins.shape[1]):
+        column = lu.solve(right[:, [k]].toarray().ravel())
+        present = np.flatnonzero(column > 0)
+        found_rows.append(rows[present])
+        found_columns.append(np.full(len(present), k))
+        found_shares.append(column[present])
+    return sparse.csr_matrix((np.concatenate(found_shares), (np.concatenate(found_rows), np.concatenate(found_columns))),
+                             shape=origins.shape)
+
+
+def _iterate(transposed: sparse.csr_matrix, origins: sparse.csr_matrix, tol: float, max_iter: int) -> sparse.csr_matrix:
+    shares = origins
+    for _ in range(max_iter):
+        following = (origins + transposed @ shares).tocsr()
+        change = abs(following - shares).max() if following.nnz else 0.0
+        shares = following
+        if change <= tol:
+            return shares
+    raise RuntimeError(f"The flow shares did not converge in {max_iter} iterations; use method='solve'.")
+
+
+def attribute_flows(nl: pd.DataFrame,
+                    el: pd.DataFrame,
+                    volume: str = 'yearly_volume',
+                    method: str = DEFAULT_METHOD,
+                    tol: float = TOLERANCE,
+                    max_iter: int = MAX_ITERATIONS) -> FlowAttribution:
+    """
+    Attribute the inflow of every node to the water sources it comes from.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list, with `id` and `preliminary_type` columns.
+    el : pd.DataFrame
+        Edge list, with `source` and `target` columns and volumes.
+    volume : str, optional
+        Volume column, by default 'yearly_volume'.
+    method : str, optional
+        One of `METHODS`, by default 'solve'. 'solve' factors the system once
+        and solves it for one source at a time; 'iterate' repeats the sparse
+        product until no share changes by more than `tol`.
+    tol : float, optional
+        Tolerance of 'iterate', by default TOLERANCE.
+    max_iter : int, optional
+        Most steps of 'iterate', by default MAX_ITERATIONS.
+
+    Returns
+    -------
+    FlowAttribution
+
+    Raises
+    ------
+    ValueError
+        If `method` is not one of `METHODS`.
+    RuntimeError
+        If 'iterate' does not converge in `max_iter` steps.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown flow attribution method {method!r}; expected one of {METHODS}.")
+
+    transfer = transfer_matrix(nl, el, volume)
+    registry, inflow, sources = transfer.registry, transfer.inflow, transfer.sources
+    n, m = len(registry), len(sources)
+    origins = sparse.csr_matrix((np.ones(m), (sources, np.arange(m))), shape=(n, m))
+    transposed = transfer.matrix.T.tocsr()
+    if method == 'solve':
+        shares = _solve(transposed, origins)
+    else:
+        shares = _iterate(transposed, origins, tol, max_iter)
+
+    labels = np.asarray(registry.labels.astype(str), dtype=object)
+    is_source = np.zeros(n, dtype=bool)
+    is_source[sources] = True
+    found = shares.tocoo()
+    order = np.lexsort((found.col, found.row))
+    rows, columns, values = found.row[order], found.col[order], found.data[order]
+    # Sources feed themselves only; they have no row.
+    through = ~is_source[rows]
+    long = pd.DataFrame({'id': labels[rows[through]], 'source': labels[sources[columns[through]]],
+                         'share': values[through], 'volume': values[through] * inflow[rows[through]]})
+
+    counts = np.bincount(rows, minlength=n)
+    fed = counts > 0
+    # Largest share of every node first; lexsort is stable, so ties go to
+    # the first source.
+    largest = np.lexsort((-values, rows))
+    leaders = largest[np.r_[True, rows[largest][1:] != rows[largest][:-1]]] if len(rows) else largest
+    primary = np.full(n, None, dtype=object)
+    primary[rows[leaders]] = labels[sources[columns[leaders]]]
+    primary_share = np.full(n, np.nan)
+    primary_share[rows[leaders]] = values[leaders]
+    attributed = np.bincount(rows, weights=values, minlength=n)
+    nodes = pd.DataFrame({'id': labels,
+                          'inflow_volume': inflow,
+                          'flow_sources': counts,
+                          'primary_source': pd.Series(primary, dtype=object).where(fed),
+                          'primary_source_share': primary_share,
+                          'unattributed_share': np.where(is_source, 0.0,
+                                                         np.where(inflow > 0, np.clip(1 - attributed, 0.0, 1.0), np.nan))})
+    return FlowAttribution(long, nodes)
+
+
+def join_flows(nl: pd.DataFrame, flows: FlowAttribution) -> pd.DataFrame:
+    """
+    Add the `FLOW_NODE_COLUMNS` of `flows` to a node list, matched on `id`.
+    """
+    summary = flows.nodes.set_index('id').reindex(nl['id'].astype(str))
+    nl = nl.copy()
+    for column in FLOW_NODE_COLUMNS:
+        nl[column] = summary[column].to_numpy()
+    return nl
+
+
+def write_flows(nl: pd.DataFrame, el: pd.DataFrame, path: str) -> str:
+    """
+    Attribute the flows of `nl` and `el` (see `attribute_flows`) and write
+    the shares, one row per node and source, to the CSV file `path`.
+    """
+    write_csv(attribute_flows(nl, el).shares, path)
+    return path
@@ -0,0 +1,434 @@
+"""
+Degree of fragmentation for large directed graphs.
+
+The degree of fragmentation is
+
+    (2 * sum(1/d_ij)) / (n * (n-1))
+
+where d_ij is the shortest path distance from node i to node j (unreachable
+pairs contribute nothing) and n is the number of nodes.
+
+Rather than materializing all-pairs shortest path lengths, the engine runs a
+breadth-first search from every source and accumulates the reciprocal
+distances level by level. Sources are processed in batches: the frontier of a
+batch is a bitset per node (one bit per source), and one BFS level for the
+whole batch is a gather over the edges followed by a segmented OR per target
+node. Memory is O(n) per batch, whatever the size of the graph. Sources
+without outgoing edges reach nothing and are skipped. Batches can be spread
+over a process pool, and a sampled estimator with a confidence interval is
+available for quick runs.
+
+For what-if analysis (e.g., how fragmented does the network become if the
+Ogallala drops out?), `fragmentation_baseline` keeps each source's
+contribution, and `fragmentation_without` / `removal_scenarios` rerun the BFS
+only from the sources whose distances can change.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple, Union
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+# Sources searched together in one batched BFS.
+BATCH_SIZE = 256
+
+
+class EdgeArrays(NamedTuple):
+    """
+    A directed graph as integer arrays, with edges grouped by target node.
+    """
+    n: int
+    # Source node of every edge, ordered by target
+    edge_sources: np.ndarray
+    # Target nodes that have at least one incoming edge, and where each one's
+    # edges start in `edge_sources`
+    targets: np.ndarray
+    starts: np.ndarray
+
+
+class FragmentationEstimate(NamedTuple):
+    """
+    Sampled degree of fragmentation with a confidence interval.
+    """
+    value: float
+    low: float
+    high: float
+    sample_size: int
+    confidence: float
+
+
+def edge_arrays(source: Sequence[int], target: Sequence[int], n: int) -> EdgeArrays:
+    """
+    Build `EdgeArrays` from integer-coded edges.
+
+    Parameters
+    ----------
+    source : Sequence[int]
+        Source code of every edge, in [0, n).
+    target : Sequence[int]
+        Target code of every edge, in [0, n).
+    n : int
+        Number of nodes.
+
+    Returns
+    -------
+    EdgeArrays
+        The graph, ready for `reciprocal_distance_sums`.
+    """
+    source = np.asarray(source, dtype=np.int64)
+    target = np.asarray(target, dtype=np.int64)
+    order = np.argsort(target, kind='stable')
+    targets, starts = np.unique(target[order], return_index=True)
+    return EdgeArrays(n=int(n), edge_sources=source[order], targets=targets, starts=starts)
+
+
+def graph_arrays(G: nx.DiGraph) -> EdgeArrays:
+    """
+    Build `EdgeArrays` from a networkx graph. Nodes are coded by their
+    position in `G.nodes`; undirected graphs get an edge in each direction.
+    """
+    codes = {node: i for i, node in enumerate(G.nodes)}
+    pairs = np.array([(codes[u], codes[v]) for u, v in G.edges], dtype=np.int64).reshape(-1, 2)
+    source, target = pairs[:, 0], pairs[:, 1]
+    if not G.is_directed():
+        source, target = np.concatenate([source, target]), np.concatenate([target, source])
+    return edge_arrays(source, target, G.number_of_nodes())
+
+
+def reciprocal_distance_sums(graph: EdgeArrays, sources: Sequence[int]) -> np.ndarray:
+    """
+    Sum of 1/d(s, j) over every node j reachable from each source s.
+
+    Parameters
+    ----------
+    graph : EdgeArrays
+        The graph.
+    sources : Sequence[int]
+        Source codes. They are searched together, so keep batches modest
+        (see `BATCH_SIZE`); memory is O(n * len(sources) / 64).
+
+    Returns
+    -------
+    np.ndarray
+        One sum per source.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    batch = np.arange(len(sources))
+    sums = np.zeros(len(sources))
+    if len(graph.edge_sources) == 0 or len(sources) == 0:
+        return sums
+
+    # Bit i of a node's row is set when source i has visited the node
+    words = (len(sources) + 63) // 64
+    visited = np.zeros((graph.n, words), dtype=np.uint64)
+    np.bitwise_or.at(visited, (sources, batch // 64),
+                     np.left_shift(np.uint64(1), (batch % 64).astype(np.uint64)))
+    frontier = visited.copy()
+    reached = np.zeros_like(visited)
+    distance = 0
+    while True:
+        distance += 1
+        # One BFS level for the whole batch: a node is reached by a source if
+        # any of its in-neighbours was on that source's frontier.
+        reached[graph.targets] = np.bitwise_or.reduceat(frontier[graph.edge_sources],
+                                                        graph.starts, axis=0)
+        np.bitwise_and(reached, ~visited, out=frontier)
+        rows = np.flatnonzero(frontier.any(axis=1))
+        if len(rows) == 0:
+            return sums
+        visited[rows] |= frontier[rows]
+        bits = np.unpackbits(frontier[rows].astype('<u8').view(np.uint8),
+                             axis=1, bitorder='little')
+        sums += bits.sum(axis=0)[:len(sources)] / distance
+
+
+def _spreaders(graph: EdgeArrays, sources: np.ndarray) -> np.ndarray:
+    # Sources with at least one outgoing edge; the rest contribute nothing.
+    has_out_edges = np.zeros(graph.n, dtype=bool)
+    has_out_edges[graph.edge_sources] = True
+    return sources[has_out_edges[sources]]
+
+
+def _batches(sources: np.ndarray, batch_size: int) -> list:
+    return [sources[i:i + batch_size] for i in range(0, len(sources), batch_size)]
+
+
+def _sums(graph: EdgeArrays, sources: np.ndarray, workers: Optional[int],
+          batch_size: int) -> np.ndarray:
+    batches = _batches(sources, batch_size)
+    if not batches:
+        return np.zeros(0)
+    if workers is not None and workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(reciprocal_distance_sums, [graph] * len(batches), batches))
+    else:
+        results = [reciprocal_distance_sums(graph, batch) for batch in batches]
+    return np.concatenate(results)
+
+
+def degree_of_fragmentation(graph: EdgeArrays,
+                            workers: Optional[int] = None,
+                            batch_size: int = BATCH_SIZE) -> float:
+    """
+    Exact degree of fragmentation of integer-coded graph.
+
+    Parameters
+    ----------
+    graph : EdgeArrays
+        The graph.
+    workers : Optional[int], optional
+        Worker processes to spread the source batches over, by default None
+        (run in this process).
+    batch_size : int, optional
+        Sources per batched BFS, by default BATCH_SIZE.
+
+    Returns
+    -------
+    float
+        The degree of fragmentation.
+    """
+    n = graph.n
+    if n <= 1:
+        return 0.0
+    total = _sums(graph, _spreaders(graph, np.arange(n)), workers, batch_size).sum()
+    return (2.0 * total) / (n * (n - 1))
+
+
+def estimate_degree_of_fragmentation(graph: EdgeArrays,
+                                     sample_size: int,
+                                     confidence: float = 0.95,
+                                     seed: Optional[int] = None,
+                                     workers: Optional[int] = None,
+                                     batch_size: int = BATCH_SIZE) -> FragmentationEstimate:
+    """
+    Estimate the degree of fragmentation from a random sample of sources.
+
+    Sources without outgoing edges contribute nothing and are left out of the
+    population; sources are sampled from the rest. Each sampled source's
+    reciprocal distance sum is computed exactly, the total over the population
+    is estimated from their mean, and the interval uses the normal
+    approximation with a finite population correction. When a few sources
+    dominate the total, small samples give intervals that are too narrow.
+
+    Parameters
+    ----------
+    graph : EdgeArrays
+        The graph.
+    sample_size : int
+        Number of sources to sample (without replacement).
+    confidence : float, optional
+        Confidence level of the interval, by default 0.95.
+    seed : Optional[int], optional
+        Seed for the sample, by default None.
+    workers : Optional[int], optional
+        Worker processes, by default None.
+    batch_size : int, optional
+        Sources per batched BFS, by default BATCH_SIZE.
+
+    Returns
+    -------
+    FragmentationEstimate
+        Point estimate and interval bounds.
+    """
+    n = graph.n
+    population = _spreaders(graph, np.arange(n))
+    if n <= 1 or len(population) == 0:
+        return FragmentationEstimate(0.0, 0.0, 0.0, 0, confidence)
+
+    k = min(int(sample_size), len(population))
+    sample = np.sort(np.random.default_rng(seed).choice(population, size=k, replace=False))
+    sums = _sums(graph, sample, workers, batch_size)
+
+    # Estimated total = population size * sample mean
+    scale = 2.0 * len(population) / (n * (n - 1))
+    value = scale * sums.mean()
+    standard_error = 0.0
+    if 1 < k < len(population):
+        standard_error = sums.std(ddof=1) / np.sqrt(k) * np.sqrt(1 - k / len(population))
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * standard_error * scale
+    return FragmentationEstimate(float(value), float(max(value - margin, 0.0)),
+                                 float(value + margin), k, confidence)
+
+
+def calculate_degree_of_fragmentation(mod_G: nx.Graph,
+                                      workers: Optional[int] = None) -> float:
+    """
+    Calculate the degree of fragmentation for a graph.
+
+    The degree of fragmentation is calculated as:
+    (2 * sum(1/d_ij)) / (n * (n-1))
+
+    where d_ij is the shortest path distance between nodes i and j,
+    and n is the total number of nodes.
+    """
+    return degree_of_fragmentation(graph_arrays(mod_G), workers=workers)
+
+
+class FragmentationBaseline(NamedTuple):
+    """
+    Per-source reciprocal distance sums of a graph, kept for what-if analysis.
+    """
+    graph: EdgeArrays
+    # Reciprocal distance sum of every node, positioned by code
+    sums: np.ndarray
+    # Node labels positioned by code, if the graph came from labelled nodes
+    labels: Optional[pd.Index] = None
+
+    @property
+    def value(self) -> float:
+        """
+        Degree of fragmentation of the baseline graph.
+        """
+        n = self.graph.n
+        return 0.0 if n <= 1 else (2.0 * self.sums.sum()) / (n * (n - 1))
+
+    def codes_of(self, nodes: Iterable) -> np.ndarray:
+        """
+        Translate node labels into codes (codes pass through when the baseline
+        has no labels).
+        """
+        if self.labels is None:
+            return np.asarray(list(nodes), dtype=np.int64)
+        codes = self.labels.get_indexer(pd.Index(list(nodes), dtype=object))
+        if (codes < 0).any():
+            raise KeyError(f"Unknown nodes: {list(np.asarray(list(nodes), dtype=object)[codes < 0])}")
+        return codes
+
+
+def fragmentation_baseline(G: Union[nx.Graph, EdgeArrays],
+                           workers: Optional[int] = None,
+                           batch_size: int = BATCH_SIZE) -> FragmentationBaseline:
+    """
+    Compute and keep every source's reciprocal distance sum.
+
+    Parameters
+    ----------
+    G : Union[nx.Graph, EdgeArrays]
+        A networkx graph (nodes are then addressed by label) or integer-coded
+        edge arrays (nodes are addressed by code).
+    workers : Optional[int], optional
+        Worker processes, by default None.
+    batch_size : int, optional
+        Sources per batched BFS, by default BATCH_SIZE.
+
+    Returns
+    -------
+    FragmentationBaseline
+        The baseline for `fragmentation_without` and `removal_scenarios`.
+    """
+    labels = None
+    if isinstance(G, nx.Graph):
+        labels = pd.Index(list(G.nodes), dtype=object)
+        G = graph_arrays(G)
+    sums = np.zeros(G.n)
+    spreaders = _spreaders(G, np.arange(G.n))
+    sums[spreaders] = _sums(G, spreaders, workers, batch_size)
+    return FragmentationBaseline(graph=G, sums=sums, labels=labels)
+
+
+def _edge_targets(graph: EdgeArrays) -> np.ndarray:
+    # Target of every edge, aligned with `graph.edge_sources`
+    counts = np.diff(np.append(graph.starts, len(graph.edge_sources)))
+    return np.repeat(graph.targets, counts)
+
+
+def ancestors(graph: EdgeArrays, nodes: Sequence[int]) -> np.ndarray:
+    """
+    Flag every node that can reach any of `nodes` (the nodes included).
+    """
+    edge_targets = _edge_targets(graph)
+    visited = np.zeros(graph.n, dtype=bool)
+    frontier = np.zeros(graph.n, dtype=bool)
+    frontier[np.asarray(nodes, dtype=np.int64)] = True
+    while frontier.any():
+        visited |= frontier
+        frontier = np.zeros(graph.n, dtype=bool)
+        frontier[graph.edge_sources[visited[edge_targets]]] = True
+        frontier &= ~visited
+    return visited
+
+
+def fragmentation_without(baseline: FragmentationBaseline,
+                          nodes: Iterable = (),
+                          edges: Iterable[Tuple] = (),
+                          workers: Optional[int] = None,
+                          batch_size: int = BATCH_SIZE) -> float:
+    """
+    Degree of fragmentation after removing nodes and/or edges.
+
+    Only sources that could reach a removed node, or the tail of a removed
+    edge, can see their distances change; the BFS is rerun from those alone
+    and every other source keeps its baseline contribution.
+
+    Parameters
+    ----------
+    baseline : FragmentationBaseline
+        Baseline from `fragmentation_baseline`.
+    nodes : Iterable, optional
+        Nodes to remove, by label (or by code for unlabelled baselines).
+    edges : Iterable[Tuple], optional
+        Directed (source, target) edges to remove.
+    workers : Optional[int], optional
+        Worker processes, by default None.
+    batch_size : int, optional
+        Sources per batched BFS, by default BATCH_SIZE.
+
+    Returns
+    -------
+    float
+        The degree of fragmentation of the reduced graph.
+    """
+    graph = baseline.graph
+    n = graph.n
+    edges = list(edges)
+    removed_nodes = baseline.codes_of(nodes)
+    edge_tails = baseline.codes_of([u for u, _ in edges])
+    edge_heads = baseline.codes_of([v for _, v in edges])
+
+    removed = np.zeros(n, dtype=bool)
+    removed[removed_nodes] = True
+    edge_sources = graph.edge_sources
+    edge_targets = _edge_targets(graph)
+    keep = ~(removed[edge_sources] | removed[edge_targets])
+    if len(edges):
+        keep &= ~np.isin(edge_sources * n + edge_targets, edge_tails * n + edge_heads)
+
+    affected = ancestors(graph, np.concatenate([removed_nodes, edge_tails])) & ~removed
+    reduced = edge_arrays(edge_sources[keep], edge_targets[keep], n)
+    spreaders = _spreaders(reduced, np.flatnonzero(affected))
+    total = baseline.sums[~(removed | affected)].sum() + _sums(reduced, spreaders, workers, batch_size).sum()
+
+    n_left = n - int(removed.sum())
+    if n_left <= 1:
+        return 0.0
+    return (2.0 * total) / (n_left * (n_left - 1))
+
+
+def removal_scenarios(baseline: FragmentationBaseline,
+                      nodes: Optional[Iterable] = None,
+                      batch_size: int = BATCH_SIZE) -> pd.Series:
+    """
+    Degree of fragmentation after removing each node on its own.
+
+    Parameters
+    ----------
+    baseline : FragmentationBaseline
+        Baseline from `fragmentation_baseline`.
+    nodes : Optional[Iterable], optional
+        Nodes to try, by default None (every node).
+    batch_size : int, optional
+        Sources per batched BFS, by default BATCH_SIZE.
+
+    Returns
+    -------
+    pd.Series
+        Fragmentation per removed node, indexed by node.
+    """
+    if nodes is None:
+        nodes = baseline.labels if baseline.labels is not None else range(baseline.graph.n)
+    nodes = list(nodes)
+    return pd.Series([fragmentation_without(baseline, nodes=[node], batch_size=batch_size)
+                      for node in nodes],
+                     index=pd.Index(nodes, dtype=object), name='fragmentation')
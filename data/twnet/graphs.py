@@ -0,0 +1,149 @@
+"""
+Loading an exported network snapshot as a `networkx` graph.
+
+The network-data maker writes dated snapshots to `outputs/`, e.g.
+`nodes_20250604.csv` and `edges_20250604.csv` (plus Parquet copies when
+`pyarrow` is installed). `load_graph` picks the latest snapshot that has both
+files, builds the directed graph from its edge list and attaches every node
+attribute in one call, rather than one `iterrows` row (a Series plus a dict)
+per node.
+
+The built graph is stored in the stage cache (see `twnet.cache`) as a pickle,
+keyed by the content of the snapshot files, so later runs on the same snapshot
+load it instead of parsing the tables and building it again.
+"""
+import os
+import re
+from typing import List, Optional, Tuple
+
+import networkx as nx
+import pandas as pd
+
+from twnet import staging
+from twnet.cache import DEFAULT_CACHE_DIR, StageCache
+
+OUTPUTS_DIR = 'outputs'
+
+# Dated snapshots, e.g. `edges_20250604.csv`.
+_SNAPSHOT = re.compile(r'^(nodes|edges)_(\d{8})\.(csv|parquet)$')
+
+
+def find_snapshots(folder: str = OUTPUTS_DIR) -> List[str]:
+    """
+    Return the dates (`YYYYMMDD`) of the snapshots in `folder` that have both
+    a node and an edge list, oldest first.
+    """
+    tables = {'nodes': set(), 'edges': set()}
+    for name in os.listdir(folder):
+        match = _SNAPSHOT.match(name)
+        if match is not None:
+            tables[match.group(1)].add(match.group(2))
+    return sorted(tables['nodes'] & tables['edges'])
+
+
+def latest_snapshot(folder: str = OUTPUTS_DIR) -> str:
+    """
+    Return the date of the latest complete snapshot in `folder`.
+
+    Raises
+    ------
+    FileNotFoundError
+        If `folder` holds no snapshot with both a node and an edge list.
+    """
+    dates = find_snapshots(folder)
+    if not dates:
+        raise FileNotFoundError(f"No nodes_YYYYMMDD/edges_YYYYMMDD snapshot in {folder}.")
+    return dates[-1]
+
+
+def snapshot_files(folder: str, date: str) -> Tuple[str, str]:
+    """
+    Return the edge and node files of a snapshot, preferring Parquet (as
+    `twnet.staging.read_output` does).
+    """
+    files = []
+    for table in ('edges', 'nodes'):
+        stem = os.path.join(folder, f'{table}_{date}')
+        if staging.HAS_PYARROW and os.path.exists(stem + '.parquet'):
+            files.append(stem + '.parquet')
+        elif os.path.exists(stem + '.csv'):
+            files.append(stem + '.csv')
+        else:
+            raise FileNotFoundError(f"No {table} list for snapshot {date} in {folder}.")
+    return files[0], files[1]
+
+
+def read_snapshot_table(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read a snapshot's node or edge list (CSV or Parquet), keeping node and
+    edge ids as strings.
+    """
+    if path.endswith('.parquet'):
+        return staging.read_table(path, columns=columns)
+    return pd.read_csv(path, usecols=columns, dtype={'id': str, 'source': str, 'target': str})
+
+
+def build_graph(edges_path: str, nodes_path: str) -> nx.DiGraph:
+    """
+    Build the directed graph of a snapshot, with the node list's columns as
+    node attributes.
+
+    Parameters
+    ----------
+    edges_path : str
+        Edge list (CSV or Parquet), with `source` and `target` columns.
+    nodes_path : str
+        Node list (CSV or Parquet), with an `id` column.
+
+    Returns
+    -------
+    nx.DiGraph
+        One node per id in the edge list, with the attributes of its row in
+        the node list (node list rows without edges are left out).
+    """
+    edges = read_snapshot_table(edges_path, ['source', 'target'])
+    nodes = read_snapshot_table(nodes_path).set_index('id')
+
+    G = nx.from_pandas_edgelist(edges, source='source', target='target', create_using=nx.DiGraph)
+    present = nodes.index.isin(list(G))
+    G.add_nodes_from(zip(nodes.index[present], nodes[present].to_dict('records')))
+    return G
+
+
+def load_graph(folder: str = OUTPUTS_DIR,
+               date: Optional[str] = None,
+               cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> nx.DiGraph:
+    """
+    Load a network snapshot as a directed graph.
+
+    Parameters
+    ----------
+    folder : str, optional
+        Folder holding the snapshots, by default 'outputs'.
+    date : Optional[str], optional
+        Snapshot date (`YYYYMMDD`), by default None (the latest snapshot).
+    cache_dir : Optional[str], optional
+        Folder of the stage cache, by default DEFAULT_CACHE_DIR. With None,
+        the graph is built from the tables every time.
+
+    Returns
+    -------
+    nx.DiGraph
+        The snapshot's graph (see `build_graph`). Its date is in
+        `G.graph['snapshot']`.
+
+    Examples
+    --------
+    >>> G = load_graph()                      # doctest: +SKIP
+    >>> G.graph['snapshot']                   # doctest: +SKIP
+    '20250604'
+    """
+    if date is None:
+        date = latest_snapshot(folder)
+    edges_path, nodes_path = snapshot_files(folder, date)
+    if cache_dir is None:
+        G = build_graph(edges_path, nodes_path)
+    else:
+        G = StageCache(cache_dir).run('graph', build_graph, edges_path, nodes_path)
+    G.graph['snapshot'] = date
+    return G
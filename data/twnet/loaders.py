@@ -0,0 +1,225 @@
+"""
+Read-once loader for the PWS input CSVs.
+
+A single run of the pipeline needs the intake and sales files in several
+places (edge lists, node list, node enrichment). Instead of each caller parsing
+the whole file again, `read_input` parses a file once, keeps only the columns
+that are asked for, declares their dtypes up front, and caches the result.
+Cached frames are keyed by path, modification time, column set and dtypes, so
+an edited input is picked up automatically.
+
+When `pyarrow` is installed, files are parsed with its multi-threaded CSV
+reader; otherwise pandas' default C engine is used. Both produce the same frame.
+If a fresh Parquet copy of the file has been staged (see `twnet.staging`), the
+requested columns are read from it instead of parsing the CSV.
+"""
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from twnet import staging
+
+# Columns (with surrounding spaces stripped) and dtypes shared by every reader
+# of each input. Survey numbers are read as strings because they are node ids.
+INTAKE_COLUMNS = [
+    'Year', 'TWDB Survey No', 'PWS Name', 'Water Type', 'Purchased / Self-Supplied',
+    'Source Basin', 'Aquifer Source', 'Surface Water Source',
+    'Seller Survey Number', 'Seller Name', 'Total Intake (Gallons)'
+]
+INTAKE_DTYPES = {
+    'TWDB Survey No': str, 'PWS Name': str, 'Water Type': str,
+    'Purchased / Self-Supplied': str, 'Source Basin': str, 'Aquifer Source': str,
+    'Surface Water Source': str, 'Seller Survey Number': str, 'Seller Name': str,
+    'Total Intake (Gallons)': str
+}
+
+SALES_COLUMNS = [
+    'Year', 'TWDB Seller Survey No', 'PWS Name', 'Buyer Survey No', 'Buyer Name',
+    'Buyer Water Type', 'Buyer Volume Reported'
+]
+SALES_DTYPES = {
+    'TWDB Seller Survey No': str, 'PWS Name': str, 'Buyer Survey No': str,
+    'Buyer Name': str, 'Buyer Water Type': str, 'Buyer Volume Reported': str
+}
+
+RETAIL_DTYPES = {'TWDB Survey No': str}
+BRIDGE_DTYPES = {'TWDB Survey Number': str}
+
+# Dtypes each input is staged with, keyed by the start of its file name.
+INPUT_DTYPES = {
+    'PWS Intake': INTAKE_DTYPES,
+    'PWS Sales': SALES_DTYPES,
+    'PWS Retail': RETAIL_DTYPES,
+    'PWS BridgeTable': BRIDGE_DTYPES,
+}
+
+_CACHE: Dict[tuple, pd.DataFrame] = {}
+
+
+def _raw_arguments(path: str,
+                   columns: Optional[Iterable[str]],
+                   dtype: Optional[Dict[str, object]]) -> tuple:
+    # Map stripped column names onto the names used in the file's header.
+    header = pd.read_csv(path, nrows=0).columns
+    raw_names = {name.strip(): name for name in header}
+    usecols = None
+    if columns is not None:
+        # Listed in file order so both CSV engines keep the file's layout.
+        wanted = set(columns)
+        usecols = [name for name in header if name.strip() in wanted]
+    raw_dtype = None
+    if dtype is not None:
+        raw_dtype = {raw_names[name]: kind for name, kind in dtype.items() if name in raw_names}
+    return usecols, raw_dtype
+
+
+def read_input(path: str,
+               columns: Optional[Iterable[str]] = None,
+               dtype: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+    """
+    Read a CSV input once and return a cached frame.
+
+    Parameters
+    ----------
+    path : str
+        Path to the CSV file.
+    columns : Optional[Iterable[str]], optional
+        Columns to read, matched after stripping surrounding spaces, by default
+        None (all columns). Columns missing from the file are ignored.
+    dtype : Optional[Dict[str, object]], optional
+        Dtypes keyed by stripped column name, by default None.
+
+    Returns
+    -------
+    pd.DataFrame
+        Frame with the file's original (unstripped) column names. It is a
+        shallow copy of the cached frame, so callers may add, drop or rename
+        columns but should not modify existing values in place.
+    """
+    stat = os.stat(path)
+    columns_key = None if columns is None else tuple(sorted(set(columns)))
+    dtype_key = None if dtype is None else tuple(sorted((k, str(v)) for k, v in dtype.items()))
+    key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size, columns_key, dtype_key)
+
+    if key not in _CACHE:
+        # Drop stale entries for this file before parsing it again.
+        for stale in [k for k in _CACHE if k[0] == key[0] and k[1:3] != key[1:3]]:
+            del _CACHE[stale]
+
+        usecols, raw_dtype = _raw_arguments(path, columns, dtype)
+        staged = staging.find_staged(path, dtype)
+        if staged is not None:
+            _CACHE[key] = staging.read_table(staged, columns=usecols)
+        elif staging.HAS_PYARROW:
+            _CACHE[key] = staging.to_frame(staging.read_csv_arrow(path, usecols, raw_dtype))
+        else:
+            _CACHE[key] = pd.read_csv(path, usecols=usecols, dtype=raw_dtype)
+
+    return _CACHE[key].copy(deep=False)
+
+
+def iter_input(path: str,
+               columns: Optional[Iterable[str]] = None,
+               dtype: Optional[Dict[str, object]] = None,
+               chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+    """
+    Stream a CSV input in chunks, without caching it.
+
+    Chunks are read from the staged Parquet copy when it is fresh and from the
+    CSV otherwise. Either way, every chunk is indexed by its rows' positions in
+    the file, exactly as `read_input` would index them.
+
+    Parameters
+    ----------
+    path : str
+        Path to the CSV file.
+    columns : Optional[Iterable[str]], optional
+        Columns to read, matched after stripping surrounding spaces, by default
+        None (all columns).
+    dtype : Optional[Dict[str, object]], optional
+        Dtypes keyed by stripped column name, by default None.
+    chunksize : int, optional
+        Rows per chunk, by default 100,000.
+
+    Yields
+    ------
+    pd.DataFrame
+        Chunks with the file's original (unstripped) column names.
+    """
+    usecols, raw_dtype = _raw_arguments(path, columns, dtype)
+    staged = staging.find_staged(path, dtype)
+    if staged is not None:
+        yield from staging.iter_table(staged, columns=usecols, chunksize=chunksize)
+    else:
+        with pd.read_csv(path, usecols=usecols, dtype=raw_dtype, chunksize=chunksize) as reader:
+            yield from reader
+
+
+def read_intake(path: str, projected: bool = True) -> pd.DataFrame:
+    """
+    Read the PWS Intake file with the shared column set and dtypes.
+
+    Parameters
+    ----------
+    path : str
+        Path to the intake CSV.
+    projected : bool, optional
+        If True, read only `INTAKE_COLUMNS`, by default True. Otherwise read
+        every column.
+
+    Returns
+    -------
+    pd.DataFrame
+        Cached intake frame (see `read_input`).
+    """
+    return read_input(path, INTAKE_COLUMNS if projected else None, INTAKE_DTYPES)
+
+
+def read_sales(path: str, projected: bool = True) -> pd.DataFrame:
+    """
+    Read the PWS Sales file with the shared column set and dtypes.
+
+    Parameters
+    ----------
+    path : str
+        Path to the sales CSV.
+    projected : bool, optional
+        If True, read only `SALES_COLUMNS`, by default True. Otherwise read
+        every column.
+
+    Returns
+    -------
+    pd.DataFrame
+        Cached sales frame (see `read_input`).
+    """
+    return read_input(path, SALES_COLUMNS if projected else None, SALES_DTYPES)
+
+
+def stage_inputs(folder: str) -> List[str]:
+    """
+    Stage every known PWS input CSV in `folder` as Parquet (see `twnet.staging`).
+
+    Parameters
+    ----------
+    folder : str
+        Folder holding the raw survey CSVs.
+
+    Returns
+    -------
+    List[str]
+        Paths to the staged Parquet files.
+    """
+    staged = []
+    for name in sorted(os.listdir(folder)):
+        for prefix, dtype in INPUT_DTYPES.items():
+            if name.startswith(prefix) and name.lower().endswith('.csv'):
+                staged.append(staging.stage_input(os.path.join(folder, name), dtype))
+    return staged
+
+
+def clear_cache() -> None:
+    """
+    Drop every cached frame.
+    """
+    _CACHE.clear()
@@ -0,0 +1,278 @@
+"""
+Whole-network metrics computed on integer-coded edge arrays.
+
+The edge list is interned into node codes once (see `twnet.registry`), parallel
+edges are collapsed (the network is summarized as a simple directed graph, as
+`nx.DiGraph` would), and every metric is a handful of array operations over the
+edges:
+
+- in/out/total degrees and their histograms with `np.bincount`,
+- weak components by min-label propagation with pointer jumping,
+- strong components by trimming nodes without incoming or outgoing edges, then
+  forward max-label propagation and a backward sweep from each label's root,
+- density and reciprocity from edge counts and a reverse-edge lookup,
+- betweenness estimated from a sample of pivot nodes (Brandes' accumulation,
+  one breadth-first level at a time), reported for the top nodes.
+
+`graph_metrics` gathers them into the JSON-ready dictionary written to
+`network-meta-data.json`.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from twnet.registry import NodeRegistry
+
+# Pivot nodes sampled to estimate betweenness, and nodes reported.
+BETWEENNESS_PIVOTS = 256
+TOP_NODES = 10
+
+
+def simple_edges(source: np.ndarray, target: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Drop repeated (source, target) pairs, keeping the first of each.
+    """
+    source = np.asarray(source, dtype=np.int64)
+    target = np.asarray(target, dtype=np.int64)
+    _, first = np.unique(source * max(n, 1) + target, return_index=True)
+    first.sort()
+    return source[first], target[first]
+
+
+def degree_histogram(degrees: np.ndarray) -> Dict[str, list]:
+    """
+    Return the degrees that occur and how many nodes have each, as lists.
+    """
+    counts = np.bincount(degrees) if len(degrees) else np.zeros(0, dtype=np.int64)
+    present = np.flatnonzero(counts)
+    return {'degree': present.tolist(), 'count': counts[present].tolist()}
+
+
+def _dense(labels: np.ndarray) -> np.ndarray:
+    # Renumber labels 0..k-1 in order of first appearance.
+    return pd.factorize(labels)[0]
+
+
+def weak_components(source: np.ndarray, target: np.ndarray, n: int) -> np.ndarray:
+    """
+    Return the weak component of every node, numbered from 0.
+    """
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[source], labels[target])
+        updated = labels.copy()
+        np.minimum.at(updated, source, low)
+        np.minimum.at(updated, target, low)
+        # Pointer jumping: follow labels to their own label until stable.
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return _dense(labels)
+        labels = updated
+
+
+def strong_components(source: np.ndarray, target: np.ndarray, n: int) -> np.ndarray:
+    """
+    Return the strong component of every node, numbered from 0.
+    """
+    labels = np.full(n, -1, dtype=np.int64)
+    nodes = np.arange(n)
+    active = np.ones(n, dtype=bool)
+    loops = source == target
+    while active.any():
+        # Trim: a node without incoming or outgoing edges from active nodes is
+        # a component on its own.
+        while True:
+            live = active[source] & active[target] & ~loops
+            trivial = active & ((np.bincount(target[live], minlength=n) == 0)
+                                | (np.bincount(source[live], minlength=n) == 0))
+            if not trivial.any():
+                break
+            labels[trivial] = nodes[trivial]
+            active &= ~trivial
+        if not active.any():
+            break
+
+        s, t = source[live], target[live]
+        # Every node gets the largest code among the nodes that reach it.
+        color = np.where(active, nodes, -1)
+        while True:
+            updated = color.copy()
+            np.maximum.at(updated, t, color[s])
+            if np.array_equal(updated, color):
+                break
+            color = updated
+        # A root's component: the nodes of its color that reach it.
+        same = color[s] == color[t]
+        s, t = s[same], t[same]
+        found = active & (color == nodes)
+        while True:
+            updated = found.copy()
+            updated[s[found[t]]] = True
+            if np.array_equal(updated, found):
+                break
+            found = updated
+        labels[found] = color[found]
+        active &= ~found
+    return _dense(labels)
+
+
+def density(n_nodes: int, n_edges: int) -> float:
+    """
+    Return the density of a simple directed graph, m / (n * (n - 1)).
+    """
+    return n_edges / (n_nodes * (n_nodes - 1)) if n_nodes > 1 else 0.0
+
+
+def reciprocity(source: np.ndarray, target: np.ndarray, n: int) -> float:
+    """
+    Return the share of (non-loop) edges whose reverse edge also exists, over
+    all edges of a simple directed graph (as `nx.reciprocity`).
+    """
+    if not len(source):
+        return 0.0
+    keys = source * max(n, 1) + target
+    reverse = target * max(n, 1) + source
+    return float(np.count_nonzero(np.isin(reverse, keys) & (source != target)) / len(source))
+
+
+def _out_edges(source: np.ndarray, target: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Targets grouped by source (CSR), and where each source's run starts.
+    order = np.argsort(source, kind='stable')
+    starts = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(source, minlength=n), out=starts[1:])
+    return target[order], starts
+
+
+def _gather(heads: np.ndarray, starts: np.ndarray, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Every (tail, head) edge leaving the frontier.
+    lengths = starts[frontier + 1] - starts[frontier]
+    total = int(lengths.sum())
+    offsets = np.repeat(starts[frontier] - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    return np.repeat(frontier, lengths), heads[offsets]
+
+
+def approximate_betweenness(source: np.ndarray,
+                            target: np.ndarray,
+                            n: int,
+                            pivots: Optional[int] = BETWEENNESS_PIVOTS,
+                            seed: int = 0) -> np.ndarray:
+    """
+    Estimate every node's betweenness centrality from shortest paths out of a
+    sample of pivot nodes.
+
+    Values are normalized as `nx.betweenness_centrality(G, k=pivots,
+    normalized=True)` does for a directed graph. With `pivots` of None, or at
+    least the number of nodes, every node is a pivot and the values are exact.
+
+    Parameters
+    ----------
+    source, target : np.ndarray
+        Node codes of every edge of a simple directed graph.
+    n : int
+        Number of nodes.
+    pivots : Optional[int], optional
+        Number of pivots, by default BETWEENNESS_PIVOTS.
+    seed : int, optional
+        Seed of the pivot sample, by default 0.
+
+    Returns
+    -------
+    np.ndarray
+        Betweenness of every node.
+    """
+    heads, starts = _out_edges(source, target, n)
+    if pivots is None or pivots >= n:
+        sample = np.arange(n)
+    else:
+        sample = np.random.default_rng(seed).choice(n, pivots, replace=False)
+
+    betweenness = np.zeros(n)
+    for pivot in sample:
+        distance = np.full(n, -1, dtype=np.int64)
+        sigma = np.zeros(n)
+        distance[pivot], sigma[pivot] = 0, 1.0
+        frontier, depth, levels = np.array([pivot]), 0, []
+        while len(frontier):
+            tails, next_heads = _gather(heads, starts, frontier)
+            unseen = distance[next_heads] < 0
+            distance[np.unique(next_heads[unseen])] = depth + 1
+            on_path = distance[next_heads] == depth + 1
+            tails, next_heads = tails[on_path], next_heads[on_path]
+            np.add.at(sigma, next_heads, sigma[tails])
+            levels.append((tails, next_heads))
+            frontier = np.unique(next_heads)
+            depth += 1
+        delta = np.zeros(n)
+        for tails, next_heads in reversed(levels):
+            np.add.at(delta, tails, sigma[tails] / sigma[next_heads] * (1 + delta[next_heads]))
+        delta[pivot] = 0
+        betweenness += delta
+
+    if n > 2:
+        betweenness *= 1 / ((n - 1) * (n - 2))
+        if len(sample) < n:
+            betweenness *= n / len(sample)
+    return betweenness
+
+
+def graph_metrics(el: pd.DataFrame,
+                  pivots: Optional[int] = BETWEENNESS_PIVOTS,
+                  top: int = TOP_NODES,
+                  seed: int = 0) -> dict:
+    """
+    Summarize an edge list as a simple directed graph.
+
+    Parameters
+    ----------
+    el : pd.DataFrame
+        Edge list, with `source` and `target` columns.
+    pivots : Optional[int], optional
+        Pivots used to estimate betweenness, by default BETWEENNESS_PIVOTS
+        (None for exact values).
+    top : int, optional
+        Number of nodes with the highest betweenness to report, by default
+        TOP_NODES.
+    seed : int, optional
+        Seed of the pivot sample, by default 0.
+
+    Returns
+    -------
+    dict
+        Node and edge counts, density, reciprocity, component counts and
+        sizes, in/out/total degree histograms, and the top betweenness nodes,
+        ready to be written as JSON.
+    """
+    registry = NodeRegistry()
+    source, target = registry.edge_codes(el)
+    n = len(registry)
+    source, target = simple_edges(source, target, n)
+
+    in_degree = np.bincount(target, minlength=n)
+    out_degree = np.bincount(source, minlength=n)
+    weak = np.bincount(weak_components(source, target, n)) if n else np.zeros(0, dtype=np.int64)
+    strong = np.bincount(strong_components(source, target, n)) if n else np.zeros(0, dtype=np.int64)
+
+    betweenness = approximate_betweenness(source, target, n, pivots, seed)
+    ranked = np.argsort(-betweenness, kind='stable')[:top]
+
+    return {
+        'nodes': n,
+        'edges': len(source),
+        'density': density(n, len(source)),
+        'reciprocity': reciprocity(source, target, n),
+        'weak_components': len(weak),
+        'largest_weak_component': int(weak.max()) if len(weak) else 0,
+        'strong_components': len(strong),
+        'largest_strong_component': int(strong.max()) if len(strong) else 0,
+        'degree_histograms': {'in': degree_histogram(in_degree),
+                              'out': degree_histogram(out_degree),
+                              'total': degree_histogram(in_degree + out_degree)},
+        'betweenness': {'pivots': n if pivots is None else min(pivots, n),
+                        'top': [{'id': registry.labels[code], 'value': float(betweenness[code])}
+                                for code in ranked]},
+    }
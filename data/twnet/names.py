@@ -0,0 +1,125 @@
+"""
+Name resolution for the node list.
+
+The node list used to get its names by left-merging the nodes with the retail,
+survey number, intake, buyer, seller and intake-seller tables one after the
+other. Most of those tables have one row per transaction, so every merge
+multiplied the rows of a node, and the duplicates were only thrown away when
+the node list was tidied. `NameIndex` keeps one deduplicated id -> name lookup
+per source instead, and resolves every node's `unified_name` from them, in
+priority order, with vectorized lookups.
+
+Each lookup holds the name on the first row of its source for each id, which
+is the name the first (kept) row of the old merge cascade ended up with.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from twnet.normalize import normalize, normalize_entities
+from twnet.registry import WATER_SYSTEM
+
+# Name columns, in the order a water system's unified name is taken from them.
+NAME_PRIORITY = ['sur_name', 'retail_name', 'intake_name', 'buyer_name', 'seller_name', 'intake_seller_name']
+
+
+def _first_names(frame: pd.DataFrame, id_column: str, name_column: str) -> pd.Series:
+    # Name on the first row of each id, indexed by id.
+    first = frame.loc[frame[id_column].notna(), [id_column, name_column]].drop_duplicates(id_column)
+    return pd.Series(first[name_column].to_numpy(), index=pd.Index(first[id_column], dtype=object),
+                     name=name_column)
+
+
+class NameIndex:
+    """
+    Deduplicated id -> name lookups, one per source, and the number of rows
+    each source has per id.
+
+    Parameters
+    ----------
+    names : Dict[str, pd.Series]
+        Names indexed by unique id, keyed by name column (see NAME_PRIORITY).
+    row_counts : Dict[str, pd.Series]
+        Rows per id in each source table, keyed like `names`.
+    """
+
+    def __init__(self, names: Dict[str, pd.Series], row_counts: Dict[str, pd.Series]) -> None:
+        self.names = names
+        self.row_counts = row_counts
+
+    @classmethod
+    def from_tables(cls,
+                    retail: pd.DataFrame,
+                    survey_no: pd.DataFrame,
+                    intake: pd.DataFrame,
+                    sales: pd.DataFrame) -> 'NameIndex':
+        """
+        Build the lookups from the renamed retail and survey number tables
+        (see `get_retail_nodes` / `get_survey_nodes`) and the raw intake and
+        sales tables (with stripped column names).
+        """
+        sellers = intake[['Seller Survey Number', 'Seller Name']].dropna(subset=['Seller Name'])
+        sources = {
+            'sur_name': (survey_no, 'id', 'sur_name'),
+            'retail_name': (retail, 'id', 'retail_name'),
+            'intake_name': (intake, 'TWDB Survey No', 'PWS Name'),
+            'buyer_name': (sales, 'Buyer Survey No', 'Buyer Name'),
+            'seller_name': (sales, 'TWDB Seller Survey No', 'PWS Name'),
+            'intake_seller_name': (sellers, 'Seller Survey Number', 'Seller Name'),
+        }
+        names, row_counts = {}, {}
+        for column, (frame, id_column, name_column) in sources.items():
+            names[column] = _first_names(frame, id_column, name_column).rename(column)
+            row_counts[column] = frame[id_column].value_counts()
+        # Intake sellers were grouped by id, so they never added rows; their
+        # names drop a trailing number.
+        names['intake_seller_name'] = normalize(names['intake_seller_name'], 'trailing_number')
+        row_counts['intake_seller_name'] = pd.Series(1, index=names['intake_seller_name'].index)
+        return cls(names, row_counts)
+
+    def lookup(self, column: str, ids: pd.Series) -> np.ndarray:
+        """
+        Return the `column` name of each id (NaN where the source has none).
+        """
+        return self.names[column].reindex(pd.Index(ids, dtype=object)).to_numpy()
+
+    def resolve(self, ids: pd.Series, preliminary_types: pd.Series) -> pd.Series:
+        """
+        Pick every node's unified name.
+
+        Water systems take the first available name in NAME_PRIORITY order;
+        water sources are named by their id. Names are stripped and
+        title-cased.
+
+        Parameters
+        ----------
+        ids : pd.Series
+            Node ids.
+        preliminary_types : pd.Series
+            'water source' or 'water system', aligned to `ids`.
+
+        Returns
+        -------
+        pd.Series
+            Unified names, aligned to (and indexed like) `ids`.
+        """
+        is_system = (preliminary_types == WATER_SYSTEM).to_numpy()
+        unified = np.where(is_system, None, ids.to_numpy(dtype=object))
+        for column in NAME_PRIORITY:
+            missing = pd.isna(unified)
+            if not missing.any():
+                break
+            unified[missing] = self.lookup(column, ids[missing])
+        return normalize_entities(pd.Series(unified, index=ids.index, dtype=object))
+
+    def cascade_rows(self, ids: pd.Series) -> int:
+        """
+        Return how many rows left-merging nodes with `ids` onto every source,
+        one after the other, would have produced.
+        """
+        rows = np.ones(len(ids))
+        index = pd.Index(ids, dtype=object)
+        for counts in self.row_counts.values():
+            rows *= np.maximum(counts.reindex(index).fillna(1).to_numpy(), 1)
+        return int(rows.sum())
@@ -0,0 +1,191 @@
+"""
+Node list builders: the base node list, its enrichment with the retail,
+bridge, intake and sales attributes, and the tidy export columns.
+"""
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from twnet.loaders import BRIDGE_DTYPES, RETAIL_DTYPES, read_input, read_intake, read_sales
+from twnet.names import NameIndex
+from twnet.normalize import normalize_entities
+from twnet.registry import NodeRegistry
+from twnet.sources import UNKNOWN_BASIN_SUFFIX
+
+
+def water_source_names(intake: pd.DataFrame) -> pd.Index:
+    """
+    Return the cleaned names of every aquifer, surface water source and
+    unknown-source basin in the intake data.
+    """
+    names = np.concatenate([
+        intake['Aquifer Source'].dropna().astype(str).unique(),
+        intake['Surface Water Source'].dropna().astype(str).unique(),
+        intake['Source Basin'].dropna().astype(str).unique() + UNKNOWN_BASIN_SUFFIX,
+    ])
+    return normalize_entities(pd.Index(names, dtype=object)).unique()
+
+
+def create_nodes_list(el: pd.DataFrame,
+                      intake_file: str,
+                      registry: Optional[NodeRegistry] = None) -> pd.DataFrame:
+    """
+    Create a DataFrame with unique node IDs and classify them as either 'water source' or 'water system'.
+
+    Parameters:
+        el (pd.DataFrame): A DataFrame containing 'source' and 'target' columns.
+        intake_file (str): Path to the CSV file containing intake data.
+        registry (Optional[NodeRegistry]): Registry to intern the node ids in. A new
+            one is built from `el` if None. Water sources are flagged in it.
+
+    Returns:
+        pd.DataFrame: A DataFrame with 'id' and 'preliminary_type' columns.
+    """
+    if registry is None:
+        registry = NodeRegistry()
+
+    # Unique node codes, sources first, in order of first appearance
+    source_codes, target_codes = registry.edge_codes(el)
+    codes = pd.unique(np.concatenate([source_codes, target_codes]))
+
+    # Flag the aquifers, surface sources and basins named in the intake data
+    registry.mark_sources(water_source_names(read_intake(intake_file)))
+
+    nodes = pd.DataFrame()
+    nodes['id'] = registry.labels_of(codes)
+    nodes['preliminary_type'] = registry.preliminary_types(codes)
+
+    return nodes
+
+
+def get_retail_nodes(retail_df_path: str,
+                    year: Optional[int] = None) -> pd.DataFrame:
+    """
+    Reads and processes the retail PWS dataset.
+
+    Parameters:
+        retail_df_path (str): Path to the CSV file.
+        year (int): Year to filter the data.
+
+    Returns:
+        pd.DataFrame: Processed DataFrame with retail nodes.
+    """
+    out = (read_input(retail_df_path, dtype=RETAIL_DTYPES)
+            .rename(columns={'TWDB Survey No': 'id', 'PWS Name': 'retail_name'})
+           )
+
+    if year is not None:
+        out = out.query("Year == @year")
+
+    return out
+
+
+def get_survey_nodes(survey_df_path: str) -> pd.DataFrame:
+    """
+    Reads and processes the survey number dataset.
+
+    Parameters:
+        survey_df_path (str): Path to the CSV file.
+
+    Returns:
+        pd.DataFrame: Processed DataFrame with survey nodes.
+    """
+    out = (read_input(survey_df_path, dtype=BRIDGE_DTYPES)
+            .rename(columns={'TWDB Survey Number': 'id',
+                             'PWS Name': 'sur_name'})
+           )
+
+    return out
+
+
+def enrich_nodes(nodes: pd.DataFrame,
+                 retail_df_path: str,
+                 survey_df_path: str,
+                 intake_df_path: str,
+                 sales_df_path: str,
+                 year: Optional[int] = None) -> pd.DataFrame:
+    """
+    Processes multiple PWS-related datasets and merges them into a unified node dataset.
+
+    Every node keeps one row: the retail and survey attributes are those of
+    the first matching row, and the names come from a `NameIndex` (see
+    twnet/names.py) instead of merging every intake and sales transaction.
+    """
+    # Load and clean Retail data
+    retail = get_retail_nodes(retail_df_path, year=year)
+
+    # Load and clean Survey Number data
+    survey_no = get_survey_nodes(survey_df_path)
+
+    index = NameIndex.from_tables(retail, survey_no, read_intake(intake_df_path), read_sales(sales_df_path))
+
+    # Merge Retail and Survey Data
+    nodes_retail_no = (nodes
+                      .merge(retail.drop_duplicates(subset='id'), on='id', how='left')
+                      .merge(survey_no.drop_duplicates(subset='id'), on='id', how='left'))
+
+    # TODO: After joining, there are ~2k nodes that do not have a name.
+    # This suggests that they are not in the retail or survey number
+    # files. After quickly drilling down on these, they appear to have
+    # a name on the intake sheet and other data sets.
+    nodes_retail_no['unified_name'] = index.resolve(nodes_retail_no['id'], nodes_retail_no['preliminary_type'])
+    for column in ['intake_name', 'buyer_name', 'seller_name', 'intake_seller_name']:
+        nodes_retail_no[column] = index.lookup(column, nodes_retail_no['id'])
+
+    return nodes_retail_no
+
+
+def name_merge_report(nodes: pd.DataFrame,
+                      retail_df_path: str,
+                      survey_df_path: str,
+                      intake_df_path: str,
+                      sales_df_path: str,
+                      year: Optional[int] = None) -> pd.Series:
+    """
+    Compare the rows of the enriched node list with the rows the former merge
+    cascade (one left merge per name source) produced for the same nodes.
+
+    Parameters:
+        nodes (pd.DataFrame): Node list, as passed to `enrich_nodes`.
+        retail_df_path, survey_df_path, intake_df_path, sales_df_path (str): Input files.
+        year (Optional[int]): Year of the retail data.
+
+    Returns:
+        pd.Series: 'nodes', 'cascade_rows' and 'rows_avoided'.
+    """
+    index = NameIndex.from_tables(get_retail_nodes(retail_df_path, year=year),
+                                  get_survey_nodes(survey_df_path),
+                                  read_intake(intake_df_path),
+                                  read_sales(sales_df_path))
+    cascade_rows = index.cascade_rows(nodes['id'])
+    return pd.Series({'nodes': len(nodes),
+                      'cascade_rows': cascade_rows,
+                      'rows_avoided': cascade_rows - len(nodes)})
+
+
+# Columns kept in the exported node list
+NODE_COLUMNS = [
+    'id', 'unified_name', 'preliminary_type', 'Year', 'TWDB Estimated?', ' Population Served ',
+    ' Single Family Volumes ', ' Single Family Connections ', ' Multi-Family Volumes ',
+    ' Multi-Family Connections ', ' Commercial Volume ', ' Commercial Connections ',
+    ' Industrial Volumes ', ' Industrial Connections ', ' Institutional Volume ',
+    ' Institutional Connections ', ' Agricultural Volumes ', ' Agricultural Connections ',
+    ' Total Metered Volume ', ' Total Metered Connections ', ' Total Un-metered Volume ',
+    ' Total Un-metered Connections ', 'TCEQ PWS Code', 'Wholesale System?',
+    'Water Use Survey Form Type', 'PWS System Class'
+]
+
+
+def tidy_nodes(nl: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Select the export columns and remove duplicate IDs, keeping the first row.
+
+    Parameters:
+        nl (pd.DataFrame): Enriched node list.
+        columns (Optional[List[str]]): Columns to keep, by default NODE_COLUMNS.
+
+    Returns:
+        pd.DataFrame: Tidy node list.
+    """
+    return nl.loc[~nl.duplicated(subset='id', keep='first'), columns or NODE_COLUMNS]
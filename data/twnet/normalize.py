@@ -0,0 +1,156 @@
+"""
+Normalization of entity names (aquifers, basins, surface water sources and
+water systems).
+
+The same few thousand names repeat over hundreds of thousands of intake and
+sales rows, so names are normalized per distinct value: the values are
+factorized, the uniques not seen before are normalized with vectorized string
+operations, and the results are mapped back onto the rows. Every raw name ->
+canonical name pair is remembered for the rest of the process, and can be
+saved to and loaded from a JSON file (`save_names` / `load_names`), so later
+runs and other years only normalize names they have not met yet. The file
+records a digest of this module's source, and names saved by other rules are
+ignored when it is loaded.
+
+Rules
+-----
+entity
+    Strip surrounding spaces and title-case (`' LAKE TRAVIS '` -> `'Lake Travis'`).
+trailing_number
+    Drop a trailing space-separated number (`'CITY OF AUSTIN 2'` ->
+    `'CITY OF AUSTIN'`), as done for the intake seller names.
+
+Values that are not strings (e.g. missing values) are returned as they are.
+"""
+import hashlib
+import json
+import os
+from typing import Callable, Dict, TypeVar
+
+import numpy as np
+import pandas as pd
+
+NAMES_FILE = 'entity-names.json'
+
+_RULES: Dict[str, Callable[[pd.Series], pd.Series]] = {
+    'entity': lambda names: names.str.strip().str.title(),
+    'trailing_number': lambda names: names.str.replace(r'\s\d+$', '', regex=True),
+}
+
+# Digest of the rules the names in memory were normalized with.
+with open(__file__, 'rb') as _source:
+    _RULES_DIGEST = hashlib.blake2b(_source.read(), digest_size=20).hexdigest()
+
+# Raw -> canonical names, per rule.
+_NAMES: Dict[str, Dict[str, str]] = {rule: {} for rule in _RULES}
+_dirty = False
+
+Values = TypeVar('Values', pd.Series, pd.Index, np.ndarray)
+
+
+def _canonical(uniques: np.ndarray, rule: str) -> np.ndarray:
+    # Canonical name of every unique value, normalizing only unseen strings.
+    global _dirty
+    known = _NAMES[rule]
+    result = np.array([known.get(value, value) if isinstance(value, str) else value for value in uniques],
+                      dtype=object)
+    unseen = np.array([isinstance(value, str) and value not in known for value in uniques], dtype=bool)
+    if unseen.any():
+        raw = uniques[unseen]
+        result[unseen] = _RULES[rule](pd.Series(raw, dtype=object)).to_numpy(dtype=object)
+        known.update(zip(raw.tolist(), result[unseen].tolist()))
+        _dirty = True
+    return result
+
+
+def normalize(values: Values, rule: str = 'entity') -> Values:
+    """
+    Normalize names with one of the rules above.
+
+    Parameters
+    ----------
+    values : pd.Series, pd.Index or np.ndarray
+        Names to normalize.
+    rule : str, optional
+        'entity' or 'trailing_number', by default 'entity'.
+
+    Returns
+    -------
+    pd.Series, pd.Index or np.ndarray
+        The normalized names, of the same type as `values` (a Series keeps
+        its index and name).
+    """
+    raw = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(raw)
+    canonical = _canonical(np.asarray(uniques, dtype=object), rule)
+    out = raw.copy()
+    present = codes >= 0
+    out[present] = canonical[codes[present]]
+    if isinstance(values, pd.Series):
+        return pd.Series(out, index=values.index, name=values.name, dtype=object)
+    if isinstance(values, pd.Index):
+        return pd.Index(out, name=values.name, dtype=object)
+    return out
+
+
+def normalize_entities(values: Values) -> Values:
+    """
+    Strip and title-case names (the 'entity' rule).
+    """
+    return normalize(values, 'entity')
+
+
+def load_names(path: str) -> int:
+    """
+    Add the raw -> canonical names saved in `path` to the ones in memory.
+
+    Returns the number of names loaded (0 if the file is missing, unreadable
+    or was saved with other rules).
+    """
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if not isinstance(saved, dict) or saved.get('rules') != _RULES_DIGEST:
+        return 0
+    loaded = 0
+    for rule, names in saved['names'].items():
+        if rule in _NAMES:
+            _NAMES[rule].update(names)
+            loaded += len(names)
+    return loaded
+
+
+def save_names(path: str) -> bool:
+    """
+    Save the raw -> canonical names in memory to `path`, merged with the ones
+    already saved there (e.g. by another worker). Names saved there with other
+    rules are dropped.
+
+    Returns whether the file was written; it is not if no new name was
+    normalized since the last load or save.
+    """
+    global _dirty
+    if not _dirty:
+        return False
+    load_names(path)
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'rules': _RULES_DIGEST, 'names': _NAMES}, f, separators=(',', ':'))
+    os.replace(tmp, path)
+    _dirty = False
+    return True
+
+
+def clear_names() -> None:
+    """
+    Forget every name normalized or loaded so far.
+    """
+    global _dirty
+    for names in _NAMES.values():
+        names.clear()
+    _dirty = False
@@ -0,0 +1,322 @@
+"""
+The notebook's build steps as plain functions, one survey year at a time.
+
+`build_network` runs the same steps as `network-data-maker.py` (edge lists,
+node list, enrichment, tidying, parallel-edge removal and flow attribution)
+for a given year and set of input files (optionally joined with the State
+Water Plan workbook, see `twnet.swp`). `build_years` writes the outputs of
+several years, each built in its own worker process; it backs the
+`python -m twnet` command line.
+Given a stage cache (see `twnet.cache`), stages whose code and inputs have not
+changed since a previous run are loaded instead of recomputed, and the
+normalized entity names (see `twnet.normalize`) are kept alongside it. With
+`profile`, every stage is timed and memory-profiled (see `twnet.profiling`)
+and the run log is written next to the outputs.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from twnet import staging
+from twnet.cache import StageCache
+from twnet.edges import combine_edges, create_intake_el, create_sales_el
+from twnet.export import ExportPaths, write_csv, write_exports
+from twnet.flows import attribute_flows, join_flows, write_flows
+from twnet.nodes import NODE_COLUMNS, create_nodes_list, enrich_nodes, tidy_nodes
+from twnet.normalize import NAMES_FILE, load_names, save_names
+from twnet.profiling import Profiler
+from twnet.reachability import write_reachability
+from twnet.reconcile import DEFAULT_POLICY, reconcile_parallel_edges
+from twnet.shards import write_ego_shards
+from twnet.spatial import write_spatial
+from twnet.swp import SWP_NODE_COLUMNS, join_swp_edges, join_swp_nodes, read_swp, stage_workbook
+
+# Survey files cover a range of years, e.g. `PWS Intake_2022-2023.csv`.
+_YEAR_RANGE = re.compile(r'(\d{4})(?:-(\d{4}))?')
+
+
+class InputFiles(NamedTuple):
+    """
+    Paths to the four PWS survey files a network is built from.
+    """
+    intake: str
+    sales: str
+    retail: str
+    bridge: str
+
+
+_PREFIXES = InputFiles(intake='PWS Intake', sales='PWS Sales',
+                       retail='PWS Retail', bridge='PWS BridgeTable')
+
+
+def _covers(name: str, year: int) -> bool:
+    match = _YEAR_RANGE.search(name)
+    if match is None:
+        return False
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    return first <= year <= last
+
+
+def find_inputs(folder: str, year: int) -> InputFiles:
+    """
+    Find the survey files in `folder` whose year range covers `year`.
+
+    Parameters
+    ----------
+    folder : str
+        Folder holding the raw survey CSVs.
+    year : int
+        Survey year.
+
+    Returns
+    -------
+    InputFiles
+        Paths to the intake, sales, retail and bridge files.
+
+    Raises
+    ------
+    FileNotFoundError
+        If one of the four files is missing for `year`.
+    """
+    names = sorted(os.listdir(folder))
+    found = {}
+    for kind, prefix in zip(InputFiles._fields, _PREFIXES):
+        matches = [name for name in names
+                   if name.startswith(prefix) and name.lower().endswith('.csv') and _covers(name, year)]
+        if not matches:
+            raise FileNotFoundError(f"No '{prefix}' file covering {year} in {folder}.")
+        # Prefer the file with the latest range if several cover the year.
+        found[kind] = os.path.join(folder, matches[-1])
+    return InputFiles(**found)
+
+
+def _call(name: str, func: Callable, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def _writer(profiler: Profiler) -> Callable:
+    # Writes a file with `writer(*args, path)` outside of a cache, measured by
+    # `profiler` when it is enabled.
+    def write(name: str, path: str, writer: Callable, *args) -> str:
+        with profiler.stage(name, args):
+            writer(*args, path)
+        return path
+    return write
+
+
+def build_network(year: int,
+                  inputs: InputFiles,
+                  cache: Optional[StageCache] = None,
+                  policy: str = DEFAULT_POLICY,
+                  profiler: Optional[Profiler] = None,
+                  swp_workbook: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Build one year's network exactly as the notebook does.
+
+    Parameters
+    ----------
+    year : int
+        Survey year.
+    inputs : InputFiles
+        Survey files to read.
+    cache : Optional[StageCache], optional
+        If given, every stage is looked up in and stored to this cache, by
+        default None.
+    policy : str, optional
+        Parallel edge policy (see `twnet.reconcile`), by default
+        'prefer_intake'.
+    profiler : Optional[Profiler], optional
+        Measures every stage when there is no cache (a cache carries its own
+        profiler), by default None.
+    swp_workbook : Optional[str], optional
+        State Water Plan workbook whose entities, centroids and transactions
+        are joined into the node and edge lists (see `twnet.swp`), by default
+        None (no join).
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]
+        Tidy node list (with the flow attribution of `twnet.flows`),
+        reconciled edge list, the full enriched node list, and the log of
+        dropped edges.
+    """
+    if cache is not None:
+        run = cache.run
+    else:
+        run = _call if profiler is None else profiler.run
+
+    intake_el = run('intake_el', create_intake_el, inputs.intake, el=True, year=year)
+    sales_el = run('sales_el', create_sales_el, inputs.sales, el=True, year=year)
+    el = run('el', combine_edges, intake_el, sales_el)
+
+    nodes = run('nodes', create_nodes_list, el, inputs.intake)
+    nl = run('enriched_nodes', enrich_nodes, nodes, inputs.retail, inputs.bridge, inputs.intake, inputs.sales, year=year)
+
+    reconciled = run('reconciled_edges', reconcile_parallel_edges, el, policy=policy)
+    edges, columns = reconciled.edges, NODE_COLUMNS
+
+    if swp_workbook is not None:
+        swp = run('swp_tables', read_swp, swp_workbook)
+        nl = run('swp_nodes', join_swp_nodes, nl, swp)
+        edges = run('swp_edges', join_swp_edges, edges, nl, swp)
+        columns = NODE_COLUMNS + SWP_NODE_COLUMNS
+
+    nodes = run('tidy_nodes', tidy_nodes, nl, columns)
+    flows = run('flows', attribute_flows, nodes, edges)
+    return run('flow_nodes', join_flows, nodes, flows), edges, nl, reconciled.dropped
+
+
+def write_network(year: int,
+                  inputs: InputFiles,
+                  out_dir: str,
+                  cache_dir: Optional[str] = None,
+                  policy: str = DEFAULT_POLICY,
+                  gephi: bool = False,
+                  profile: bool = False,
+                  swp_workbook: Optional[str] = None) -> Dict[str, object]:
+    """
+    Build one year's network and write its node and edge lists and JSON files.
+
+    Files are named after the year: `nodes_{year}.csv`, `edges_{year}.csv`,
+    `dropped_edges_{year}.csv` (the parallel edges left out, and why)
+    (plus Parquet copies when `pyarrow` is installed), `flows_{year}.csv`
+    (every node's share of each water source, see `twnet.flows`),
+    `reachability_{year}.npz`
+    (every node's upstream sources and downstream dependents, see
+    `twnet.reachability`), `network-data_{year}.json`
+    (plus its gzip and brotli copies), `network-meta-data_{year}.json`,
+    optionally `network_{year}.graphml` and `network_{year}.gexf`, the
+    ego-network shards in `ego_{year}/` (see `twnet.shards`), and, when the
+    nodes have State Water Plan coordinates, the spatial index and map tiles
+    in `spatial_{year}/` (see `twnet.spatial`). The node and edge lists are
+    written to every format but Parquet in a single pass (see
+    `twnet.export.write_exports`). With `profile`, the stage profile is
+    written to `profile_{year}.json` and `profile_{year}.csv`.
+
+    Parameters
+    ----------
+    year : int
+        Survey year.
+    inputs : InputFiles
+        Survey files to read.
+    out_dir : str
+        Folder to write to.
+    cache_dir : Optional[str], optional
+        Folder of the stage cache (see `twnet.cache`), by default None (no
+        caching).
+    policy : str, optional
+        Parallel edge policy (see `twnet.reconcile`), by default
+        'prefer_intake'.
+    gephi : bool, optional
+        Also write GraphML and GEXF files, by default False.
+    profile : bool, optional
+        Time and memory-profile every stage (see `twnet.profiling`), by
+        default False.
+    swp_workbook : Optional[str], optional
+        State Water Plan workbook to join (see `build_network`), by default
+        None.
+
+    Returns
+    -------
+    Dict[str, object]
+        The year, its node and edge counts, the files written, and the names
+        of the stages that were (`hits`) and were not (`misses`) cache hits.
+    """
+    profiler = Profiler(enabled=profile)
+    cache = None if cache_dir is None else StageCache(cache_dir, profiler)
+    write = _writer(profiler) if cache is None else cache.write
+    if cache_dir is not None:
+        load_names(os.path.join(cache_dir, NAMES_FILE))
+
+    nl_tidy, el_noparallel, _, dropped = build_network(year, inputs, cache, policy, profiler, swp_workbook)
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = ExportPaths(nodes_csv=os.path.join(out_dir, f'nodes_{year}.csv'),
+                        edges_csv=os.path.join(out_dir, f'edges_{year}.csv'),
+                        cyto_json=os.path.join(out_dir, f'network-data_{year}.json'),
+                        meta_json=os.path.join(out_dir, f'network-meta-data_{year}.json'),
+                        graphml=os.path.join(out_dir, f'network_{year}.graphml') if gephi else None,
+                        gexf=os.path.join(out_dir, f'network_{year}.gexf') if gephi else None).with_compressed_cyto()
+    files = [path for path in write('exports', paths, write_exports, nl_tidy, el_noparallel) if path]
+    files.append(write('dropped_edges_csv', os.path.join(out_dir, f'dropped_edges_{year}.csv'), write_csv, dropped))
+    files.append(write('flows_csv', os.path.join(out_dir, f'flows_{year}.csv'), write_flows, nl_tidy, el_noparallel))
+    files.append(write('reachability', os.path.join(out_dir, f'reachability_{year}.npz'), write_reachability,
+                       nl_tidy, el_noparallel))
+    if staging.HAS_PYARROW:
+        files.append(write('nodes_parquet', os.path.join(out_dir, f'nodes_{year}.parquet'), staging.write_table, nl_tidy))
+        files.append(write('edges_parquet', os.path.join(out_dir, f'edges_{year}.parquet'), staging.write_table, el_noparallel))
+    files.extend(profiler.run('ego_shards', write_ego_shards, nl_tidy, el_noparallel,
+                              os.path.join(out_dir, f'ego_{year}')))
+    if 'latitude' in nl_tidy:
+        files.extend(profiler.run('spatial', write_spatial, nl_tidy, os.path.join(out_dir, f'spatial_{year}')))
+
+    if cache_dir is not None:
+        save_names(os.path.join(cache_dir, NAMES_FILE))
+    files.extend(profiler.save(os.path.join(out_dir, f'profile_{year}')))
+
+    records = [] if cache is None else cache.records
+    return {'year': year, 'nodes': len(nl_tidy), 'edges': len(el_noparallel), 'files': files,
+            'hits': [record.name for record in records if record.hit],
+            'misses': [record.name for record in records if not record.hit]}
+
+
+def build_years(years: Sequence[int],
+                inputs: Dict[int, InputFiles],
+                out_dir: str,
+                workers: Optional[int] = None,
+                cache_dir: Optional[str] = None,
+                policy: str = DEFAULT_POLICY,
+                gephi: bool = False,
+                profile: bool = False,
+                swp_workbook: Optional[str] = None) -> List[Dict[str, object]]:
+    """
+    Build and write several years' networks, one worker process per year.
+
+    Parameters
+    ----------
+    years : Sequence[int]
+        Survey years to build.
+    inputs : Dict[int, InputFiles]
+        Survey files for each year.
+    out_dir : str
+        Folder to write to.
+    workers : Optional[int], optional
+        Number of worker processes, by default one per year up to the number
+        of CPUs. With 1, every year is built in this process.
+    cache_dir : Optional[str], optional
+        Folder of the stage cache shared by the workers, by default None (no
+        caching).
+    policy : str, optional
+        Parallel edge policy (see `twnet.reconcile`), by default
+        'prefer_intake'.
+    gephi : bool, optional
+        Also write GraphML and GEXF files, by default False.
+    profile : bool, optional
+        Write every year's stage profile next to its outputs, by default
+        False.
+    swp_workbook : Optional[str], optional
+        State Water Plan workbook to join (see `build_network`), by default
+        None. It is converted to columnar copies here, before the workers
+        start, so they do not all convert it.
+
+    Returns
+    -------
+    List[Dict[str, object]]
+        One summary per year (see `write_network`), in the order of `years`.
+    """
+    if workers is None:
+        workers = min(len(years), os.cpu_count() or 1)
+    if swp_workbook is not None:
+        stage_workbook(swp_workbook)
+    if workers <= 1 or len(years) <= 1:
+        return [write_network(year, inputs[year], out_dir, cache_dir, policy, gephi, profile, swp_workbook)
+                for year in years]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(write_network, year, inputs[year], out_dir, cache_dir, policy, gephi, profile,
+                               swp_workbook)
+                   for year in years]
+        return [future.result() for future in futures]
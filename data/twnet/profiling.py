@@ -0,0 +1,280 @@
+"""
+Opt-in timing and memory profile of the pipeline stages.
+
+A `Profiler` measures each stage it wraps: wall and CPU time, the process'
+resident memory (RSS) after the stage, how much the stage added to it, the
+process' peak RSS so far, optionally the peak of Python allocations traced by
+`tracemalloc` during the stage, and the rows, nodes and edges of the stage's
+inputs and output. Stages run through a `StageCache` given a profiler are
+measured automatically (with whether they were cache hits); other steps can be
+wrapped with `Profiler.run` or `Profiler.stage`.
+
+Profiling is off unless asked for: the notebooks enable it when the
+`TWNET_PROFILE` environment variable is set (`TWNET_PROFILE=trace` also turns
+on tracemalloc, which slows Python-heavy stages down), and the command line
+with `--profile`. A disabled profiler calls straight through.
+
+Profiles are saved as a JSON run log and a CSV table (`Profiler.save`), and two
+runs can be compared stage by stage::
+
+    python -m twnet.profiling outputs/profile_20250604.json outputs/profile_20250610.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+import networkx as nx
+import pandas as pd
+import psutil
+
+PROFILE_ENV = 'TWNET_PROFILE'
+
+_MIB = 2**20
+
+
+class StageProfile(NamedTuple):
+    """
+    Measurements of one stage run. Counts are None where they do not apply
+    (e.g. no node count for a table).
+    """
+    stage: str
+    # Whether a cached stage was loaded instead of computed (None if the stage
+    # did not run through the cache)
+    hit: Optional[bool]
+    wall_seconds: float
+    cpu_seconds: float
+    rss_mib: float
+    rss_delta_mib: float
+    peak_rss_mib: Optional[float]
+    traced_peak_mib: Optional[float]
+    rows_in: Optional[int]
+    nodes_in: Optional[int]
+    edges_in: Optional[int]
+    rows_out: Optional[int]
+    nodes_out: Optional[int]
+    edges_out: Optional[int]
+
+
+class StageRun:
+    """
+    Handle on a stage being measured; set `output` (and `hit`) before it ends.
+    """
+
+    def __init__(self) -> None:
+        self.output = None
+        self.hit: Optional[bool] = None
+
+
+def _counts(value) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    # Rows, nodes and edges of a stage input or output.
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value), None, None
+    if isinstance(value, nx.Graph):
+        return None, value.number_of_nodes(), value.number_of_edges()
+    if hasattr(value, 'edge_sources') and hasattr(value, 'n'):
+        # twnet.fragmentation.EdgeArrays
+        return None, value.n, len(value.edge_sources)
+    if isinstance(value, dict) and isinstance(value.get('elements'), dict):
+        # Cytoscape.js document
+        return None, len(value['elements'].get('nodes', ())), len(value['elements'].get('edges', ()))
+    if isinstance(value, (tuple, list)):
+        totals = [None, None, None]
+        for item in value:
+            for i, count in enumerate(_counts(item)):
+                if count is not None:
+                    totals[i] = (totals[i] or 0) + count
+        return totals[0], totals[1], totals[2]
+    if hasattr(value, 'graph'):
+        # twnet.fragmentation.FragmentationBaseline
+        return _counts(value.graph)
+    return None, None, None
+
+
+def _peak_rss() -> Optional[int]:
+    # The process' peak resident memory so far, in bytes.
+    info = psutil.Process().memory_info()
+    if hasattr(info, 'peak_wset'):
+        return info.peak_wset
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Profiler:
+    """
+    Collects a `StageProfile` per stage it measures.
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        Measure stages, by default True. A disabled profiler only runs them.
+    trace_memory : bool, optional
+        Also trace Python allocations with `tracemalloc` to report each
+        stage's peak, by default False.
+
+    Examples
+    --------
+    >>> profiler = Profiler.from_environment()                   # doctest: +SKIP
+    >>> cache = StageCache(profiler=profiler)                     # doctest: +SKIP
+    >>> ego_files = profiler.run('ego_shards', write_ego_shards, nl, el, 'ego')  # doctest: +SKIP
+    >>> profiler.save('outputs/profile_20250604')                 # doctest: +SKIP
+    """
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = False) -> None:
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.records: List[StageProfile] = []
+        self.started = datetime.now()
+
+    @classmethod
+    def from_environment(cls) -> 'Profiler':
+        """
+        Return a profiler enabled by the `TWNET_PROFILE` environment variable
+        (any value but '' or '0'; 'trace' also traces Python allocations).
+        """
+        value = os.environ.get(PROFILE_ENV, '').strip().lower()
+        return cls(enabled=value not in ('', '0'), trace_memory=value == 'trace')
+
+    @contextmanager
+    def stage(self, name: str, inputs: tuple = ()) -> Iterator[StageRun]:
+        """
+        Measure the code run inside the `with` block as stage `name`.
+        """
+        run = StageRun()
+        if not self.enabled:
+            yield run
+            return
+
+        process = psutil.Process()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        rss_before = process.memory_info().rss
+        cpu_before = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield run
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu_before
+            rss = process.memory_info().rss
+            traced = None
+            if self.trace_memory:
+                traced = (tracemalloc.get_traced_memory()[1] - traced_before) / _MIB
+            peak = _peak_rss()
+            self.records.append(StageProfile(
+                name, run.hit, wall, cpu, rss / _MIB, (rss - rss_before) / _MIB,
+                None if peak is None else max(peak, rss) / _MIB, traced,
+                *_counts(inputs), *_counts(run.output)))
+
+    def run(self, name: str, func: Callable, *args, **kwargs):
+        """
+        Return `func(*args, **kwargs)`, measured as stage `name`.
+        """
+        with self.stage(name, args + tuple(kwargs.values())) as run:
+            run.output = func(*args, **kwargs)
+        return run.output
+
+    def report(self) -> pd.DataFrame:
+        """
+        Return the stages measured so far, one row each.
+        """
+        return pd.DataFrame(self.records, columns=StageProfile._fields)
+
+    def save(self, stem: str) -> List[str]:
+        """
+        Write the run log to `{stem}.json` and the stage table to `{stem}.csv`.
+
+        Returns the paths written (none if the profiler is disabled).
+        """
+        if not self.enabled:
+            return []
+        folder = os.path.dirname(stem)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        log = {
+            'started': self.started.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'trace_memory': self.trace_memory,
+            'stages': [record._asdict() for record in self.records],
+        }
+        with open(stem + '.json', 'w') as f:
+            json.dump(log, f, indent=2)
+        self.report().to_csv(stem + '.csv', index=False)
+        return [stem + '.json', stem + '.csv']
+
+
+def load_profile(path: str) -> pd.DataFrame:
+    """
+    Read the stage table of a saved profile (its JSON run log or CSV).
+    """
+    if path.endswith('.json'):
+        with open(path) as f:
+            return pd.DataFrame(json.load(f)['stages'], columns=StageProfile._fields)
+    return pd.read_csv(path)
+
+
+def compare_profiles(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compare two runs' profiles stage by stage.
+
+    Stages measured several times in a run are summed (times, RSS added) or
+    maxed (peaks). Stages found in only one run are kept, with NaN for the
+    other.
+
+    Parameters
+    ----------
+    before, after : pd.DataFrame
+        Stage tables, from `Profiler.report` or `load_profile`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Per stage, in the order of `after`: wall and CPU time, RSS added and
+        traced peak of both runs, the change in wall time (`wall_change`,
+        after / before), and the output rows of both runs.
+    """
+    aggregations = {'wall_seconds': 'sum', 'cpu_seconds': 'sum', 'rss_delta_mib': 'sum',
+                    'traced_peak_mib': 'max', 'rows_out': 'max'}
+
+    def summary(profile: pd.DataFrame) -> pd.DataFrame:
+        return profile.groupby('stage', sort=False).agg(aggregations)
+
+    merged = summary(after).join(summary(before), how='outer', lsuffix='_after', rsuffix='_before')
+    order = list(dict.fromkeys(list(after['stage']) + list(before['stage'])))
+    merged = merged.reindex(order)
+    merged['wall_change'] = merged['wall_seconds_after'] / merged['wall_seconds_before']
+    columns = []
+    for name in aggregations:
+        columns += [f'{name}_before', f'{name}_after']
+        if name == 'wall_seconds':
+            columns.append('wall_change')
+    return merged[columns]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m twnet.profiling',
+                                     description='Compare the stage profiles of two runs.')
+    parser.add_argument('before', help='Profile (JSON or CSV) of the earlier run.')
+    parser.add_argument('after', help='Profile (JSON or CSV) of the later run.')
+    args = parser.parse_args(argv)
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.max_rows', None):
+        print(compare_profiles(load_profile(args.before), load_profile(args.after)).round(3))
+
+
+if __name__ == '__main__':
+    main()
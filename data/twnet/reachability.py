@@ -0,0 +1,287 @@
+"""
+Which water sources feed every node, and which nodes depend on it.
+
+"Which aquifers and surface sources ultimately feed this system, through any
+chain of purchases?" is answered for every node at once. The directed network
+is condensed into its strong components (see `twnet.metrics`; a cycle of
+sales is one component, whose members share their sources), and the
+condensation is ordered topologically. Then:
+
+- upstream sources are bitsets over the water sources: one pass in
+  topological order ORs every component's bits into its successors', so each
+  edge of the condensation is visited once;
+- downstream dependents are found the same way in reverse order, as bitsets
+  over the components, a block of components at a time to bound memory, and
+  stored as a CSR list of the components each component reaches.
+
+`Reachability` holds the result per component with each node's component,
+and is saved next to the node list as `reachability_{date}.npz`.
+"""
+import os
+from typing import Iterator, List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from twnet.metrics import strong_components
+from twnet.registry import WATER_SOURCE, NodeRegistry, grouped, runs
+
+# Memory for the downstream bitsets of one block of components.
+BLOCK_BYTES = 64 * 2**20
+
+
+class Condensation(NamedTuple):
+    """
+    The strong components of a directed graph, as a directed acyclic graph.
+    """
+    # Component of every node, numbered in topological order (every edge
+    # between components goes from a lower to a higher number)
+    component: np.ndarray
+    # Edges between components (no loops or duplicates)
+    source: np.ndarray
+    target: np.ndarray
+    # Topological level of every component: the longest path to it from a
+    # component without incoming edges
+    level: np.ndarray
+
+
+def _set_bits(n_rows: int, rows: np.ndarray, bits: np.ndarray, words: int) -> np.ndarray:
+    # Bitsets with bit `bits[i]` set in row `rows[i]`.
+    out = np.zeros((n_rows, words), dtype=np.uint64)
+    np.bitwise_or.at(out, (rows, bits // 64), np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64)))
+    return out
+
+
+def _bit_positions(bitset: np.ndarray) -> np.ndarray:
+    # Positions of the set bits of one row of words, ascending.
+    return np.flatnonzero(np.unpackbits(bitset.view(np.uint8), bitorder='little'))
+
+
+def condensation(source: np.ndarray, target: np.ndarray, n: int) -> Condensation:
+    """
+    Condense a directed graph into its strong components.
+
+    Parameters
+    ----------
+    source, target : np.ndarray
+        Integer-coded edges, in [0, n).
+    n : int
+        Number of nodes.
+
+    Returns
+    -------
+    Condensation
+    """
+    labels = strong_components(source, target, n)
+    c = int(labels.max()) + 1 if n else 0
+    pairs = np.unique(np.stack([labels[source], labels[target]], axis=1), axis=0).reshape(-1, 2)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    s, t = pairs[:, 0], pairs[:, 1]
+
+    # Kahn's algorithm, a whole frontier (level) of components at a time.
+    order, starts = grouped(s, c)
+    indegree = np.bincount(t, minlength=c)
+    rank = np.full(c, -1, dtype=np.int64)
+    level = np.zeros(c, dtype=np.int64)
+    frontier = np.flatnonzero(indegree == 0)
+    done = depth = 0
+    while len(frontier):
+        rank[frontier] = np.arange(done, done + len(frontier))
+        level[frontier] = depth
+        done, depth = done + len(frontier), depth + 1
+        reached = t[runs(order, starts, frontier)]
+        np.subtract.at(indegree, reached, 1)
+        reached = np.unique(reached)
+        frontier = reached[indegree[reached] == 0]
+    ranked_level = np.empty(c, dtype=np.int64)
+    ranked_level[rank] = level
+    return Condensation(rank[labels], rank[s], rank[t], ranked_level)
+
+
+class Reachability:
+    """
+    Upstream water sources and downstream dependents of every node.
+
+    Build one from the node and edge lists with `Reachability.build`, or read
+    a saved one with `Reachability.load`.
+
+    Examples
+    --------
+    >>> reach = Reachability.build(nl_tidy, el_noparallel)       # doctest: +SKIP
+    >>> reach.upstream_sources('1010001')                         # doctest: +SKIP
+    ['Trinity Aquifer']
+    >>> reach.summary().head()                                    # doctest: +SKIP
+    """
+
+    def __init__(self,
+                 ids: np.ndarray,
+                 component: np.ndarray,
+                 sources: np.ndarray,
+                 upstream: np.ndarray,
+                 downstream_starts: np.ndarray,
+                 downstream: np.ndarray) -> None:
+        # Node ids by code, and each node's component (in topological order).
+        self.ids = ids
+        self.component = component
+        # Codes of the water sources: bit `i` of a bitset is `sources[i]`.
+        self.sources = sources
+        # Bitset of the sources upstream of each component (itself included).
+        self.upstream = upstream
+        # Components reached from each component (itself excluded), CSR.
+        self.downstream_starts = downstream_starts
+        self.downstream = downstream
+        self._codes = pd.Index(ids)
+        self._member_order, self._member_starts = grouped(component, len(downstream_starts) - 1)
+
+    @classmethod
+    def build(cls, nl: pd.DataFrame, el: pd.DataFrame, block_bytes: int = BLOCK_BYTES) -> 'Reachability':
+        """
+        Compute the upstream sources and downstream dependents of every node.
+
+        Parameters
+        ----------
+        nl : pd.DataFrame
+            Node list, with `id` and `preliminary_type` columns; its water
+            sources are the sources tracked.
+        el : pd.DataFrame
+            Edge list, with `source` and `target` columns.
+        block_bytes : int, optional
+            Memory for the downstream bitsets of one block of components, by
+            default BLOCK_BYTES. Smaller blocks mean more passes over the
+            edges.
+
+        Returns
+        -------
+        Reachability
+        """
+        registry = NodeRegistry.from_edges(el)
+        source, target = registry.edge_codes(el)
+        registry.intern(nl['id'].astype(str))
+        n = len(registry)
+        dag = condensation(source, target, n)
+        component, s, t = dag.component, dag.source, dag.target
+        c = len(dag.level)
+
+        sources = np.unique(registry.codes_of(nl.loc[nl['preliminary_type'] == WATER_SOURCE, 'id'].astype(str)))
+        sources = sources[sources >= 0]
+        words = max((len(sources) + 63) // 64, 1)
+
+        # Upstream: in topological order, each component takes the sources
+        # of its predecessors. Edges are grouped by the level of their
+        # target, so every predecessor is final when it is read.
+        upstream = _set_bits(c, component[sources], np.arange(len(sources)), words)
+        for level_edges in _by_level(dag, forward=True):
+            np.bitwise_or.at(upstream, t[level_edges], upstream[s[level_edges]])
+
+        # Downstream: in reverse order, each component takes what its
+        # successors reach, for one block of components at a time.
+        block = max(64, block_bytes // max(c, 1) // 8 * 64)
+        levels = list(_by_level(dag, forward=False))
+        pairs = []
+        for first in range(0, c, block):
+            members = np.arange(first, min(first + block, c))
+            reach = _set_bits(c, members, members - first, (len(members) + 63) // 64)
+            for level_edges in levels:
+                np.bitwise_or.at(reach, s[level_edges], reach[t[level_edges]])
+            rows, bits = np.nonzero(np.unpackbits(reach.view(np.uint8), axis=1, bitorder='little')[:, :len(members)])
+            keep = rows != bits + first
+            pairs.append((rows[keep], bits[keep] + first))
+        rows = np.concatenate([p[0] for p in pairs]) if pairs else np.empty(0, dtype=np.int64)
+        reached = np.concatenate([p[1] for p in pairs]) if pairs else np.empty(0, dtype=np.int64)
+        order, downstream_starts = grouped(rows, c)
+
+        ids = np.asarray(registry.labels.astype(str), dtype=str)
+        return cls(ids, component, sources, upstream, downstream_starts, reached[order])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def code(self, node_id: str) -> int:
+        """
+        Return the code of a node id.
+
+        Raises
+        ------
+        KeyError
+            If the id is not a node.
+        """
+        return int(self._codes.get_loc(node_id))
+
+    def upstream_sources(self, node_id: str) -> List[str]:
+        """
+        Return the water sources that feed a node through any chain of
+        edges (not the node itself, if it is a source).
+        """
+        code = self.code(node_id)
+        found = self.sources[_bit_positions(self.upstream[self.component[code]])]
+        return self.ids[found[found != code]].tolist()
+
+    def downstream_dependents(self, node_id: str) -> List[str]:
+        """
+        Return the nodes a node feeds through any chain of edges (its own
+        strong component included, the node itself not).
+        """
+        code = self.code(node_id)
+        own = self.component[code]
+        components = np.concatenate([[own], self.downstream[self.downstream_starts[own]:self.downstream_starts[own + 1]]])
+        found = runs(self._member_order, self._member_starts, components)
+        return self.ids[np.sort(found[found != code])].tolist()
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Return, per node, its component and how many upstream sources and
+        downstream dependents it has.
+        """
+        is_source = np.zeros(len(self.ids), dtype=np.int64)
+        is_source[self.sources] = 1
+        sources = np.bitwise_count(self.upstream).sum(axis=1, dtype=np.int64)[self.component] - is_source
+        # Members of the own component (but the node) and of every component
+        # reached.
+        sizes = np.bincount(self.component, minlength=len(self.upstream))
+        dependents = sizes - 1
+        reaching = np.repeat(np.arange(len(sizes)), np.diff(self.downstream_starts))
+        np.add.at(dependents, reaching, sizes[self.downstream])
+        return pd.DataFrame({'id': self.ids, 'component': self.component,
+                             'upstream_sources': sources,
+                             'downstream_dependents': dependents[self.component]})
+
+    def save(self, path: str) -> str:
+        """
+        Write the result to `path` (an `.npz` file) and return the path.
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, ids=self.ids.astype(str), component=self.component, sources=self.sources,
+                                upstream=self.upstream, downstream_starts=self.downstream_starts,
+                                downstream=self.downstream)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'Reachability':
+        """
+        Read a result written by `save`.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['ids'], data['component'], data['sources'], data['upstream'],
+                       data['downstream_starts'], data['downstream'])
+
+
+def _by_level(dag: Condensation, forward: bool) -> Iterator[np.ndarray]:
+    # The condensation's edges grouped by the level of their target (forward,
+    # levels ascending) or of their source (backward, levels descending).
+    key = dag.level[dag.target] if forward else -dag.level[dag.source]
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    bounds = np.concatenate([[0], np.flatnonzero(key[1:] != key[:-1]) + 1, [len(key)]])
+    for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        yield order[start:stop]
+
+
+def write_reachability(nl: pd.DataFrame, el: pd.DataFrame, path: str) -> str:
+    """
+    Compute the reachability of `nl` and `el` (see `Reachability.build`) and
+    save it to `path`.
+    """
+    return Reachability.build(nl, el).save(path)
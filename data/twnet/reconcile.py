@@ -0,0 +1,161 @@
+"""
+Reconciliation of parallel edges, i.e. several edges between the same source
+and target (typically an intake purchase and the matching sale).
+
+`reconcile_parallel_edges` interns the node ids into integer codes, groups the
+source/target pairs with a single hash factorization, and applies one of the
+policies below to every group with more than one edge. It returns the
+reconciled edge list together with a log of the rows it dropped and why.
+
+Policies
+--------
+prefer_intake
+    Keep only the intake edges of each parallel group (the May 2025 request
+    from the TWDB partner, and the default). Groups without intake edges are
+    dropped entirely.
+prefer_sale
+    Keep only the sale edges of each parallel group.
+sum
+    Keep the first edge of each group, with the group's total volume.
+max
+    Keep the edge with the largest volume in each group (the first on ties).
+keep_both
+    Keep every edge, with the size of its group in a `multiplicity` column.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from twnet.registry import NodeRegistry
+
+POLICIES = ('prefer_intake', 'prefer_sale', 'sum', 'max', 'keep_both')
+DEFAULT_POLICY = 'prefer_intake'
+
+_PREFERRED_TYPE = {'prefer_intake': 'intake', 'prefer_sale': 'sale'}
+
+
+class Reconciliation(NamedTuple):
+    """
+    Reconciled edge list, and the rows dropped from it with the policy that
+    dropped them (`reason`) and the id of an edge kept for the same pair
+    (`kept_id`, missing if none was kept).
+    """
+    edges: pd.DataFrame
+    dropped: pd.DataFrame
+
+
+def parallel_groups(el: pd.DataFrame,
+                    source: str = 'source',
+                    target: str = 'target') -> np.ndarray:
+    """
+    Return a group code per edge; parallel edges share a code.
+
+    Codes are dense and numbered in order of first appearance.
+    """
+    registry = NodeRegistry()
+    source_codes, target_codes = registry.edge_codes(el, source=source, target=target)
+    pairs = source_codes.astype(np.int64) * max(len(registry), 1) + target_codes
+    return pd.factorize(pairs)[0]
+
+
+def parse_volumes(volumes: pd.Series) -> np.ndarray:
+    """
+    Parse reported volumes such as ' 5,025,258,000 ' into floats (NaN if
+    missing or unparseable).
+    """
+    if volumes.dtype.kind in 'iuf':
+        return volumes.to_numpy(dtype=float)
+    cleaned = volumes.astype(str).str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=float)
+
+
+def _first_of(groups: np.ndarray, rows: np.ndarray, n_groups: int) -> np.ndarray:
+    # Position of the first of `rows` in each group, -1 if the group has none.
+    first = np.full(n_groups, -1, dtype=np.int64)
+    present, position = np.unique(groups[rows], return_index=True)
+    first[present] = rows[position]
+    return first
+
+
+def reconcile_parallel_edges(el: pd.DataFrame,
+                             policy: str = DEFAULT_POLICY,
+                             volume: str = 'yearly_volume') -> Reconciliation:
+    """
+    Resolve parallel edges with one of the `POLICIES`.
+
+    Parameters
+    ----------
+    el : pd.DataFrame
+        Combined intake and sales edge list, with `source`, `target`, `id` and
+        `type` columns.
+    policy : str, optional
+        One of `POLICIES`, by default 'prefer_intake'.
+    volume : str, optional
+        Volume column used by the 'sum' and 'max' policies, by default
+        'yearly_volume'. With 'sum', it is returned parsed as numbers.
+
+    Returns
+    -------
+    Reconciliation
+        The edge list, in its original row order and index, and the dropped
+        rows.
+
+    Raises
+    ------
+    ValueError
+        If `policy` is not one of `POLICIES`.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown parallel edge policy {policy!r}; expected one of {POLICIES}.")
+
+    groups = parallel_groups(el)
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    counts = np.bincount(groups, minlength=n_groups)
+    parallel = counts[groups] > 1
+    rows = np.arange(len(el))
+
+    if policy == 'keep_both':
+        edges = el.copy()
+        edges['multiplicity'] = counts[groups]
+        return Reconciliation(edges, _dropped(el, np.ones(len(el), dtype=bool), groups, rows, policy))
+
+    if policy in _PREFERRED_TYPE:
+        keep = ~parallel | (el['type'] == _PREFERRED_TYPE[policy]).to_numpy()
+    else:
+        volumes = parse_volumes(el[volume])
+        if policy == 'sum':
+            keep_rows = _first_of(groups, rows, n_groups)
+        else:
+            # Largest volume first within each group; lexsort is stable, so
+            # ties (and missing volumes) keep their original order.
+            order = np.lexsort((-np.nan_to_num(volumes, nan=-np.inf), groups))
+            leaders = np.r_[True, groups[order][1:] != groups[order][:-1]] if len(order) else order
+            keep_rows = order[leaders]
+        keep = np.zeros(len(el), dtype=bool)
+        keep[keep_rows] = True
+
+    edges = el[keep]
+    if policy == 'sum':
+        present = ~np.isnan(volumes)
+        totals = np.bincount(groups, weights=np.where(present, volumes, 0.0), minlength=n_groups)
+        reported = np.bincount(groups, weights=present, minlength=n_groups)
+        edges = edges.copy()
+        edges[volume] = np.where(reported > 0, totals, np.nan)[groups[keep]]
+
+    return Reconciliation(edges, _dropped(el, keep, groups, rows, policy))
+
+
+def _dropped(el: pd.DataFrame,
+             keep: np.ndarray,
+             groups: np.ndarray,
+             rows: np.ndarray,
+             policy: str) -> pd.DataFrame:
+    # Log of the rows not kept, with the id of the first kept edge of their pair.
+    first_kept = _first_of(groups, rows[keep], int(groups.max()) + 1 if len(groups) else 0)
+    dropped = el.loc[~keep, [column for column in ('id', 'source', 'target', 'type', 'yearly_volume')
+                             if column in el.columns]].copy()
+    kept = first_kept[groups[~keep]]
+    dropped['reason'] = policy
+    dropped['kept_id'] = np.where(kept >= 0, el['id'].to_numpy()[np.maximum(kept, 0)], None)
+    return dropped
@@ -0,0 +1,178 @@
+"""
+Interned integer ids for the nodes of the water network.
+
+Every survey number, aquifer, surface water source and basin that appears in
+the edge list is interned once into a dense integer code (0, 1, 2, ...) in
+order of first appearance. The registry keeps a hashed reverse index from
+labels to codes, so encoding a column, looking a label up, or checking whether
+a node is a water source are vectorized hash lookups instead of scans over
+Python lists. Graph analyses can work on the integer `source`/`target` arrays
+returned by `edge_codes`; labels are only needed again at export. `grouped`
+and `runs` lay integer-coded edges out by node (CSR) and read them back.
+"""
+from typing import Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+WATER_SOURCE = 'water source'
+WATER_SYSTEM = 'water system'
+
+
+class NodeRegistry:
+    """
+    Dense integer codes for node labels, with a reverse index.
+
+    Examples
+    --------
+    >>> registry = NodeRegistry()
+    >>> registry.intern(['Ogallala Aquifer', '10', '10'])
+    array([0, 1, 1])
+    >>> registry.labels_of([1, 0])
+    array(['10', 'Ogallala Aquifer'], dtype=object)
+    """
+
+    def __init__(self) -> None:
+        self._index = pd.Index([], dtype=object)
+        self._is_source = np.zeros(0, dtype=bool)
+
+    @classmethod
+    def from_edges(cls, el: pd.DataFrame,
+                   source: str = 'source',
+                   target: str = 'target') -> 'NodeRegistry':
+        """
+        Build a registry from an edge list, sources first, then targets.
+        """
+        registry = cls()
+        registry.edge_codes(el, source=source, target=target)
+        return registry
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, label: object) -> bool:
+        return label in self._index
+
+    @property
+    def labels(self) -> pd.Index:
+        """
+        Node labels, positioned by code.
+        """
+        return self._index
+
+    @property
+    def is_source(self) -> np.ndarray:
+        """
+        Boolean array, positioned by code, flagging water sources.
+        """
+        return self._is_source
+
+    def codes_of(self, values: Iterable) -> np.ndarray:
+        """
+        Look labels up without interning them; unknown labels map to -1.
+        """
+        return self._index.get_indexer(pd.Index(values, dtype=object))
+
+    def intern(self, values: Iterable) -> np.ndarray:
+        """
+        Return the codes of `values`, adding labels not seen before.
+
+        Parameters
+        ----------
+        values : Iterable
+            Node labels.
+
+        Returns
+        -------
+        np.ndarray
+            Integer codes, aligned to `values`.
+        """
+        # Hash the values once, then only look their distinct labels up.
+        local_codes, uniques = pd.factorize(pd.Index(values, dtype=object), use_na_sentinel=False)
+        codes = self._index.get_indexer(pd.Index(uniques, dtype=object))
+        missing = codes < 0
+        if missing.any():
+            start = len(self._index)
+            self._index = self._index.append(pd.Index(uniques[missing], dtype=object))
+            self._is_source = np.concatenate([self._is_source,
+                                              np.zeros(int(missing.sum()), dtype=bool)])
+            codes[missing] = np.arange(start, len(self._index))
+        return codes[local_codes]
+
+    def labels_of(self, codes: Iterable[int]) -> np.ndarray:
+        """
+        Translate codes back into labels.
+        """
+        return self._index.to_numpy()[np.asarray(codes, dtype=np.int64)]
+
+    def edge_codes(self, el: pd.DataFrame,
+                   source: str = 'source',
+                   target: str = 'target') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Intern an edge list's endpoints and return them as integer arrays.
+
+        Parameters
+        ----------
+        el : pd.DataFrame
+            Edge list.
+        source : str, optional
+            Source column, by default 'source'.
+        target : str, optional
+            Target column, by default 'target'.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Source and target codes, aligned to the rows of `el`.
+        """
+        # One pass over both columns; sources are interned before targets.
+        codes = self.intern(np.concatenate([el[source].astype(str).to_numpy(dtype=object),
+                                            el[target].astype(str).to_numpy(dtype=object)]))
+        return codes[:len(el)], codes[len(el):]
+
+    def mark_sources(self, values: Iterable) -> None:
+        """
+        Flag the given labels as water sources. Unknown labels are ignored.
+        """
+        codes = self.codes_of(values)
+        self._is_source[codes[codes >= 0]] = True
+
+    def preliminary_types(self, codes: Iterable[int]) -> np.ndarray:
+        """
+        Return 'water source' or 'water system' for each code.
+        """
+        return np.where(self._is_source[np.asarray(codes, dtype=np.int64)],
+                        WATER_SOURCE, WATER_SYSTEM).astype(object)
+
+
+def grouped(keys: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group positions by integer key, in CSR layout.
+
+    Parameters
+    ----------
+    keys : np.ndarray
+        Integer keys in [0, n), e.g. the source codes of the edges.
+    n : int
+        Number of keys.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The positions sorted by key (stable), and where the run of every key
+        starts in them (`n + 1` offsets).
+    """
+    order = np.argsort(keys, kind='stable')
+    starts = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=starts[1:])
+    return order, starts
+
+
+def runs(order: np.ndarray, starts: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    Return the entries of `order` in the runs of every key in `keys`, key
+    after key, for `order` and `starts` from `grouped`.
+    """
+    lengths = starts[keys + 1] - starts[keys]
+    offsets = np.repeat(starts[keys] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    return order[offsets]
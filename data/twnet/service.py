@@ -0,0 +1,367 @@
+"""
+Local HTTP service answering graph queries on an exported network snapshot.
+
+The explorer loads and scans the whole `network-data.json` for every query.
+This service loads a snapshot's node and edge lists (see `twnet.graphs`) once
+into a `QueryGraph`: integer node codes (see `twnet.registry`), the edges
+grouped by source and by target (CSR offsets), and every node and edge record
+encoded to Cytoscape.js JSON once, as for the ego shards
+(`twnet.shards.EgoGraph`). Queries walk the integer arrays and join
+the pre-encoded records into the response, so nothing is re-serialized.
+
+Every response body is kept in an `LRUCache`, keyed by the query, with hit,
+miss and eviction counters (served at `/cache`). Routes (all GET, JSON):
+
+- `/health`: snapshot date, node and edge counts;
+- `/ego?id=`: a node's ego network, as in the ego shards (`twnet.shards`);
+- `/neighbourhood?id=&hops=2&direction=both`: the nodes within `hops` steps
+  (`direction` is `out`, `in` or `both`), with their distance and the edges
+  between them;
+- `/upstream?id=` and `/downstream?id=`: every node that reaches, or is
+  reached from, a node (optionally up to `max_hops`);
+- `/search?q=&limit=20`: nodes whose id or name contains `q`;
+- `/cache`: the response cache's counters.
+
+Run it offline against the outputs (from the `data/` directory)::
+
+    python -m twnet.service --folder outputs --port 8765
+
+`benchmarks/bench_service.py` load-tests it and reports latency percentiles.
+"""
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from twnet.graphs import OUTPUTS_DIR, latest_snapshot, read_snapshot_table, snapshot_files
+from twnet.registry import runs
+from twnet.shards import EgoGraph
+
+# Responses kept by the service's cache.
+CACHE_SIZE = 1024
+DEFAULT_PORT = 8765
+SEARCH_LIMIT = 20
+DIRECTIONS = ('out', 'in', 'both')
+
+
+class LRUCache:
+    """
+    Least-recently-used cache of computed values, with counters.
+
+    Thread-safe; a value is computed outside the lock, so two threads missing
+    the same key at once may both compute it.
+
+    Examples
+    --------
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache.get_or_compute('a', lambda: 1)
+    1
+    >>> cache.get_or_compute('a', lambda: 2)
+    1
+    >>> cache.stats()['hits']
+    1
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._values: 'OrderedDict[Hashable, object]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        """
+        Return the value cached for `key`, computing and caching it if absent.
+        """
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return self._values[key]
+            self.misses += 1
+        value = compute()
+        if self.maxsize <= 0:
+            return value
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        """
+        Drop every cached value and reset the counters.
+        """
+        with self._lock:
+            self._values.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Return the size, capacity, hits, misses, evictions and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._values), 'maxsize': self.maxsize, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else None}
+
+
+class QueryGraph(EgoGraph):
+    """
+    A network snapshot as integer arrays, with pre-encoded JSON records (see
+    `twnet.shards.EgoGraph`), and a search index of node ids and names.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list, with `id` (and `unified_name`, for search) columns.
+    el : pd.DataFrame
+        Edge list, with `source`, `target` and `id` columns.
+    snapshot : Optional[str], optional
+        Date of the snapshot, reported by `/health`, by default None.
+    """
+
+    def __init__(self, nl: pd.DataFrame, el: pd.DataFrame, snapshot: Optional[str] = None) -> None:
+        super().__init__(nl, el)
+        self.snapshot = snapshot
+
+        # Search text: one `id<TAB>name` line per code, case-folded, with the
+        # offset where each line starts.
+        names = pd.Series([''] * self.n, dtype=object)
+        if 'unified_name' in nl:
+            present = self.node_rows >= 0
+            names[present] = nl['unified_name'].iloc[self.node_rows[present]].fillna('').astype(str).to_numpy()
+        self.names = names.to_numpy(dtype=object)
+        lines = [f'{label}\t{name}'.casefold().replace('\n', ' ')
+                 for label, name in zip(self.registry.labels.astype(str), self.names)]
+        self._search_text = '\n'.join(lines)
+        self._line_starts = np.zeros(self.n, dtype=np.int64)
+        np.cumsum([len(line) + 1 for line in lines[:-1]], out=self._line_starts[1:])
+
+    @classmethod
+    def from_snapshot(cls, folder: str = OUTPUTS_DIR, date: Optional[str] = None) -> 'QueryGraph':
+        """
+        Load a snapshot (by default the latest) from `folder`.
+        """
+        if date is None:
+            date = latest_snapshot(folder)
+        edges_path, nodes_path = snapshot_files(folder, date)
+        return cls(read_snapshot_table(nodes_path), read_snapshot_table(edges_path), date)
+
+    def code(self, node_id: str) -> int:
+        """
+        Return the code of a node id.
+
+        Raises
+        ------
+        KeyError
+            If the id is not in the snapshot.
+        """
+        if node_id not in self.registry:
+            raise KeyError(node_id)
+        return int(self.registry.codes_of([node_id])[0])
+
+    def ego(self, node_id: str) -> str:
+        """
+        Return a node's ego network as JSON, the same record as its ego shard
+        (see `twnet.shards.write_ego_shards`).
+        """
+        return self.ego_record(self.code(node_id))
+
+    def reach(self, code: int, direction: str = 'both', hops: Optional[int] = None) -> np.ndarray:
+        """
+        Return the distance in steps from `code` to every node (-1 where
+        unreached), following edges `out` (downstream), `in` (upstream) or
+        both ways, up to `hops` steps (no limit with None).
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}, not {direction!r}")
+        distance = np.full(self.n, -1, dtype=np.int64)
+        distance[code] = 0
+        frontier = np.array([code], dtype=np.int64)
+        step = 0
+        while len(frontier) and (hops is None or step < hops):
+            step += 1
+            reached = []
+            if direction in ('out', 'both'):
+                reached.append(self.target[runs(self.out_order, self.out_starts, frontier)])
+            if direction in ('in', 'both'):
+                reached.append(self.source[runs(self.in_order, self.in_starts, frontier)])
+            frontier = np.unique(np.concatenate(reached))
+            frontier = frontier[distance[frontier] < 0]
+            distance[frontier] = step
+        return distance
+
+    def neighbourhood(self, node_id: str, hops: Optional[int] = 1, direction: str = 'both') -> str:
+        """
+        Return, as JSON, the nodes reached from a node within `hops` steps
+        (see `reach`), their distances, and the Cytoscape.js records of the
+        nodes and of the edges between them.
+        """
+        code = self.code(node_id)
+        distance = self.reach(code, direction, hops)
+        codes = np.flatnonzero(distance >= 0)
+        codes = codes[np.argsort(distance[codes], kind='stable')]
+        reached = distance >= 0
+        edges = np.flatnonzero(reached[self.source] & reached[self.target])
+        distances = ','.join(f'{label}:{d}' for label, d in zip(self.labels[codes], distance[codes].tolist()))
+        return (f'{{"id":{self.labels[code]},"direction":{json.dumps(direction)},"hops":{json.dumps(hops)},'
+                f'"distances":{{{distances}}},'
+                f'"elements":{self.elements(codes, edges)}}}')
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> str:
+        """
+        Return, as JSON, up to `limit` nodes whose id or name contains `query`
+        (case-insensitive): exact matches first, then prefixes, then the rest,
+        each by name.
+        """
+        query = query.strip().casefold()
+        if not query or '\n' in query or '\t' in query:
+            return '[]'
+        text, starts = self._search_text, self._line_starts
+        ranked = []
+        position = text.find(query)
+        while position >= 0:
+            code = int(np.searchsorted(starts, position, side='right')) - 1
+            label, name = (text[starts[code]:starts[code + 1] - 1] if code + 1 < self.n
+                           else text[starts[code]:]).split('\t', 1)
+            rank = 0 if query in (label, name) else 1 if label.startswith(query) or name.startswith(query) else 2
+            ranked.append((rank, name, code))
+            # Carry on from the next line.
+            position = text.find(query, starts[code + 1]) if code + 1 < self.n else -1
+        results = [{'id': str(self.registry.labels[code]), 'name': self.names[code]}
+                   for _, _, code in sorted(ranked)[:limit]]
+        return json.dumps(results)
+
+
+def _json_response(body: Union[str, bytes], status_code: int = 200) -> Response:
+    return Response(body, status_code=status_code, media_type='application/json')
+
+
+def _error(status_code: int, message: str) -> Response:
+    return _json_response(json.dumps({'error': message}), status_code)
+
+
+def create_app(graph: QueryGraph, cache_size: int = CACHE_SIZE) -> Starlette:
+    """
+    Return the Starlette app serving `graph` (see the module docstring for the
+    routes). The response cache is `app.state.cache`.
+    """
+    cache = LRUCache(cache_size)
+
+    def cached(key: Tuple, compute: Callable[[], str]) -> Response:
+        # Bodies are cached encoded, so hits are sent as they are.
+        try:
+            return _json_response(cache.get_or_compute(key, lambda: compute().encode()))
+        except KeyError as error:
+            return _error(404, f'No node {error.args[0]!r} in snapshot {graph.snapshot}.')
+        except ValueError as error:
+            return _error(400, str(error))
+
+    def parse_hops(value: Optional[str], name: str = 'hops') -> Optional[int]:
+        if value is None or value == '':
+            return None
+        try:
+            hops = int(value)
+        except ValueError:
+            raise ValueError(f'{name} must be an integer, not {value!r}') from None
+        if hops < 0:
+            raise ValueError(f'{name} must be at least 0, not {hops}')
+        return hops
+
+    async def health(request):
+        return _json_response(json.dumps({'snapshot': graph.snapshot, 'nodes': graph.n,
+                                          'edges': len(graph.source)}))
+
+    async def ego(request):
+        node_id = request.query_params.get('id')
+        if node_id is None:
+            return _error(400, 'Missing id.')
+        return cached(('ego', node_id), lambda: graph.ego(node_id))
+
+    async def neighbourhood(request):
+        params = request.query_params
+        node_id, direction = params.get('id'), params.get('direction', 'both')
+        if node_id is None:
+            return _error(400, 'Missing id.')
+        try:
+            hops = parse_hops(params.get('hops', '1'))
+        except ValueError as error:
+            return _error(400, str(error))
+        return cached(('neighbourhood', node_id, hops, direction),
+                      lambda: graph.neighbourhood(node_id, hops, direction))
+
+    def trace(direction: str):
+        async def endpoint(request):
+            node_id = request.query_params.get('id')
+            if node_id is None:
+                return _error(400, 'Missing id.')
+            try:
+                hops = parse_hops(request.query_params.get('max_hops'), 'max_hops')
+            except ValueError as error:
+                return _error(400, str(error))
+            return cached(('neighbourhood', node_id, hops, direction),
+                          lambda: graph.neighbourhood(node_id, hops, direction))
+        return endpoint
+
+    async def search(request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', SEARCH_LIMIT))
+        except ValueError:
+            return _error(400, 'limit must be an integer.')
+        if limit < 0:
+            return _error(400, f'limit must be at least 0, not {limit}')
+        return cached(('search', query.strip().casefold(), limit), lambda: graph.search(query, limit))
+
+    async def cache_stats(request):
+        return _json_response(json.dumps(cache.stats()))
+
+    app = Starlette(routes=[
+        Route('/health', health),
+        Route('/ego', ego),
+        Route('/neighbourhood', neighbourhood),
+        Route('/upstream', trace('in')),
+        Route('/downstream', trace('out')),
+        Route('/search', search),
+        Route('/cache', cache_stats),
+    ])
+    app.state.graph = graph
+    app.state.cache = cache
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m twnet.service',
+                                     description='Serve graph queries on a network snapshot.')
+    parser.add_argument('--folder', default=OUTPUTS_DIR,
+                        help='Folder holding the snapshots (default: outputs).')
+    parser.add_argument('--date', default=None, help='Snapshot date (YYYYMMDD), by default the latest.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help=f'Responses kept in the LRU cache (default: {CACHE_SIZE}).')
+    args = parser.parse_args(argv)
+
+    graph = QueryGraph.from_snapshot(args.folder, args.date)
+    print(f"snapshot {graph.snapshot}: {graph.n} nodes, {len(graph.source)} edges")
+    uvicorn.run(create_app(graph, args.cache_size), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
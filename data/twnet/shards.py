@@ -0,0 +1,187 @@
+"""
+Per-node ego-network shards for the network explorer.
+
+Instead of loading the whole `network-data.json` and scanning every edge when a
+node is selected, the explorer can fetch just that node's ego network: its
+incoming edges (inputs), outgoing edges (outputs), neighbours, and the
+Cytoscape.js records of all of them. `write_ego_shards` writes one JSON record
+per node, packed into newline-delimited shard files of about `SHARD_BYTES`
+each, and an `index.json` mapping every node id to `[shard, offset, length]`,
+so a record can be read with a single ranged request or seek.
+
+Everything is built in one pass over integer node codes (an `EgoGraph`):
+edges are grouped by source and by target with a stable sort (CSR offsets),
+and every node and edge record is encoded to JSON once, then reused in each
+ego it belongs to. The query service (`twnet.service`) answers `/ego` from the
+same `EgoGraph`, so its responses are the shard records.
+"""
+import glob
+import json
+import os
+from json.encoder import encode_basestring_ascii
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from twnet.export import cyto_records, json_list
+from twnet.registry import NodeRegistry, grouped
+
+# Target size of one shard file; a shard is closed once it reaches this size.
+SHARD_BYTES = 1 << 20
+INDEX_FILE = 'index.json'
+_SHARD_NAME = 'shard-{:05d}.ndjson'
+
+
+class EgoGraph:
+    """
+    A node and edge list as integer node codes, with edges grouped by target
+    and by source (CSR) and every record encoded to JSON once.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list, with an `id` column.
+    el : pd.DataFrame
+        Edge list, with `source`, `target` and `id` columns.
+    """
+
+    def __init__(self, nl: pd.DataFrame, el: pd.DataFrame) -> None:
+        self.registry = NodeRegistry.from_edges(el)
+        self.source, self.target = self.registry.edge_codes(el)
+        node_codes = self.registry.intern(nl['id'])
+        self.n = len(self.registry)
+
+        # Node list row of each code (the first one if an id is repeated).
+        self.node_rows = np.full(self.n, -1, dtype=np.int64)
+        codes, first = np.unique(node_codes, return_index=True)
+        self.node_rows[codes] = first
+
+        self.node_records = cyto_records(nl)
+        self.edge_records = cyto_records(el)
+        self.labels = np.array([encode_basestring_ascii(str(label)) for label in self.registry.labels],
+                               dtype=object)
+        self.edge_ids = np.array([encode_basestring_ascii(str(edge_id)) for edge_id in el['id']], dtype=object)
+
+        self.in_order, self.in_starts = grouped(self.target, self.n)
+        self.out_order, self.out_starts = grouped(self.source, self.n)
+
+    def elements(self, codes: np.ndarray, edges: np.ndarray) -> str:
+        """
+        Return the Cytoscape.js records of the nodes `codes` and the edges
+        `edges` (positions in the edge list), as a JSON `elements` object.
+        """
+        rows = self.node_rows[codes]
+        return (f'{{"nodes":{json_list(self.node_records[rows[rows >= 0]])},'
+                f'"edges":{json_list(self.edge_records[edges])}}}')
+
+    def ego_record(self, code: int) -> str:
+        """
+        Return the ego network of node `code` as one line of JSON (see
+        `write_ego_shards`).
+        """
+        inputs = self.in_order[self.in_starts[code]:self.in_starts[code + 1]]
+        outputs = self.out_order[self.out_starts[code]:self.out_starts[code + 1]]
+        neighbours = list(dict.fromkeys(self.source[inputs].tolist() + self.target[outputs].tolist()))
+        if code in neighbours:
+            neighbours.remove(code)
+        edges = np.array(list(dict.fromkeys(inputs.tolist() + outputs.tolist())), dtype=np.int64)
+        return (f'{{"id":{self.labels[code]},'
+                f'"inputs":{json_list(self.edge_ids[inputs])},'
+                f'"outputs":{json_list(self.edge_ids[outputs])},'
+                f'"neighbours":{json_list(self.labels[neighbours])},'
+                f'"elements":{self.elements(np.array([code] + neighbours, dtype=np.int64), edges)}}}')
+
+
+def write_ego_shards(nl: pd.DataFrame,
+                     el: pd.DataFrame,
+                     folder: str,
+                     shard_bytes: int = SHARD_BYTES) -> List[str]:
+    """
+    Write every node's ego network to shard files, plus an id -> shard index.
+
+    Each node's record is a single line of JSON::
+
+        {"id": ..., "inputs": [edge ids], "outputs": [edge ids],
+         "neighbours": [node ids],
+         "elements": {"nodes": [...], "edges": [...]}}
+
+    where `elements` holds the Cytoscape.js records (as in `network-data.json`)
+    of the node, its neighbours and its edges. The index is
+    `{"shards": [file names], "nodes": {id: [shard, offset, length]}}`, with
+    byte offsets into the shard file.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list, with an `id` column.
+    el : pd.DataFrame
+        Edge list, with `source`, `target` and `id` columns.
+    folder : str
+        Folder to write to. Shards from a previous run are removed.
+    shard_bytes : int, optional
+        Target shard size in bytes, by default SHARD_BYTES.
+
+    Returns
+    -------
+    List[str]
+        Paths written, the index first.
+    """
+    graph = EgoGraph(nl, el)
+
+    os.makedirs(folder, exist_ok=True)
+    for stale in glob.glob(os.path.join(folder, _SHARD_NAME.replace('{:05d}', '*'))):
+        os.remove(stale)
+
+    shards, index = [], {}
+    shard, offset = None, 0
+    try:
+        for code in range(graph.n):
+            record = graph.ego_record(code)
+            if shard is None or offset >= shard_bytes:
+                if shard is not None:
+                    shard.close()
+                shards.append(_SHARD_NAME.format(len(shards)))
+                shard = open(os.path.join(folder, shards[-1]), 'w')
+                offset = 0
+            # Records are ASCII-only, so characters and bytes line up.
+            shard.write(record + '\n')
+            index[graph.registry.labels[code]] = [len(shards) - 1, offset, len(record)]
+            offset += len(record) + 1
+    finally:
+        if shard is not None:
+            shard.close()
+
+    index_path = os.path.join(folder, INDEX_FILE)
+    with open(index_path, 'w') as f:
+        json.dump({'shards': shards, 'nodes': index}, f, separators=(',', ':'))
+    return [index_path] + [os.path.join(folder, name) for name in shards]
+
+
+def read_ego(folder: str, node_id: str) -> dict:
+    """
+    Read one node's ego network from shards written by `write_ego_shards`.
+
+    Parameters
+    ----------
+    folder : str
+        Folder holding `index.json` and the shard files.
+    node_id : str
+        Node id.
+
+    Returns
+    -------
+    dict
+        The node's ego record.
+
+    Raises
+    ------
+    KeyError
+        If the node is not in the index.
+    """
+    with open(os.path.join(folder, INDEX_FILE)) as f:
+        index = json.load(f)
+    shard, offset, length = index['nodes'][node_id]
+    with open(os.path.join(folder, index['shards'][shard]), 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
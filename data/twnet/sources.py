@@ -0,0 +1,77 @@
+"""
+Source resolution for the intake edge list.
+
+Every intake record needs a `source` node. Which column provides it depends on
+the water type and on whether the water was purchased or self-supplied. The
+rules used to live in a row-wise `process_source` function applied with
+`intake.apply(..., axis=1)`; here they are evaluated as whole-column masks and
+combined with `np.select`, which produces the same values at a fraction of the
+cost on large intake tables.
+"""
+import numpy as np
+import pandas as pd
+
+# Suffix appended to a basin name when the actual aquifer or surface source is
+# not known.
+UNKNOWN_BASIN_SUFFIX = ' BASIN (Source Unknown)'
+
+
+def _column(intake: pd.DataFrame, name: str) -> pd.Series:
+    # Mirror `row.get(name)`: a missing column behaves like a column of None.
+    if name in intake.columns:
+        return intake[name]
+    return pd.Series(None, index=intake.index, dtype=object)
+
+
+def resolve_intake_sources(intake: pd.DataFrame) -> pd.Series:
+    """
+    Resolve the source node of every intake record.
+
+    The rules are evaluated in order and the first match wins:
+
+    - Reuse and self-supplied: the source is the `TWDB Survey No` (a self-loop).
+    - Purchased: the source is the `Seller Survey Number`.
+    - Ground water and self-supplied: the source is the `Aquifer Source`, or the
+      `Source Basin` when the aquifer is "OTHER AQUIFER".
+    - Surface water and self-supplied: the source is the `Surface Water Source`,
+      or the `Source Basin` when the surface source is "UNKNOWN".
+
+    Records that match none of the rules resolve to None.
+
+    Parameters
+    ----------
+    intake : pd.DataFrame
+        Intake data with stripped column names.
+
+    Returns
+    -------
+    pd.Series
+        Object series of sources aligned to `intake.index`.
+    """
+    water_type = _column(intake, 'Water Type')
+    supply = _column(intake, 'Purchased / Self-Supplied')
+    aquifer = _column(intake, 'Aquifer Source')
+    surface = _column(intake, 'Surface Water Source')
+    unknown_basin = _column(intake, 'Source Basin').astype(object) + UNKNOWN_BASIN_SUFFIX
+
+    self_supplied = (supply == 'Self-Supplied').to_numpy()
+    conditions = [
+        (water_type == 'Reuse').to_numpy() & self_supplied,
+        (supply == 'Purchased').to_numpy(),
+        (water_type == 'Ground Water').to_numpy() & self_supplied,
+        (water_type == 'Surface Water').to_numpy() & self_supplied,
+    ]
+    choices = [
+        _column(intake, 'TWDB Survey No').to_numpy(dtype=object),
+        _column(intake, 'Seller Survey Number').to_numpy(dtype=object),
+        np.where((aquifer == 'OTHER AQUIFER').to_numpy(),
+                 unknown_basin.to_numpy(dtype=object),
+                 aquifer.to_numpy(dtype=object)),
+        np.where((surface == 'UNKNOWN').to_numpy(),
+                 unknown_basin.to_numpy(dtype=object),
+                 surface.to_numpy(dtype=object)),
+    ]
+
+    return pd.Series(np.select(conditions, choices, default=None),
+                     index=intake.index,
+                     dtype=object)
@@ -0,0 +1,364 @@
+"""
+Spatial index over the node coordinates, and per-tile node lists for a map.
+
+Water systems get a latitude and longitude from the State Water Plan centroids
+(see `twnet.swp`). `SpatialIndex` buckets the located nodes into a uniform
+grid of `GRID_DEGREES` cells: coordinates are sorted by cell and each cell's
+run starts at an offset (CSR layout), so a query only looks at the cells it
+overlaps instead of scanning every node. It answers bounding-box, radius (in
+miles, great-circle) and k-nearest queries, and is saved as a single `.npz`
+file.
+
+`write_spatial` writes the index next to the exports, plus the located nodes
+split into web map tiles (`z-x-y.json`, Cytoscape.js records as in
+`network-data.json`) and a `tiles.json` listing every tile with its bounds and
+node count, so a map view can load only the tiles in sight.
+"""
+import glob
+import json
+import math
+import os
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from twnet.export import iter_cyto_records
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Side of a grid cell, in degrees (about 7 miles of latitude).
+GRID_DEGREES = 0.1
+
+# Web map zoom level of the tiles (tiles of about 1.4 degrees).
+TILE_ZOOM = 8
+
+INDEX_FILE = 'grid.npz'
+TILES_FILE = 'tiles.json'
+_TILE_NAME = '{}-{}-{}.json'
+
+
+def haversine_miles(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Return the great-circle distances in miles from one point to many.
+    """
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _located(nl: pd.DataFrame) -> pd.DataFrame:
+    # Node list rows with finite coordinates, one per id.
+    nodes = nl.drop_duplicates(subset='id')
+    lat = pd.to_numeric(nodes['latitude'], errors='coerce').to_numpy(dtype=float)
+    lon = pd.to_numeric(nodes['longitude'], errors='coerce').to_numpy(dtype=float)
+    return nodes.loc[np.isfinite(lat) & np.isfinite(lon)]
+
+
+class SpatialIndex:
+    """
+    Uniform grid over node coordinates.
+
+    Build one from a node list with `SpatialIndex.build`, or read a saved one
+    with `SpatialIndex.load`. Queries return node ids and, for radius and
+    nearest queries, their distances in miles, nearest first.
+
+    Examples
+    --------
+    >>> index = SpatialIndex.build(nl_tidy)                     # doctest: +SKIP
+    >>> ids, miles = index.within(30.27, -97.74, 25)            # doctest: +SKIP
+    >>> ids, miles = index.nearest(30.27, -97.74, k=5)          # doctest: +SKIP
+    >>> index.bbox(29.5, -98.5, 30.5, -97.0)                    # doctest: +SKIP
+    """
+
+    def __init__(self,
+                 ids: np.ndarray,
+                 lat: np.ndarray,
+                 lon: np.ndarray,
+                 origin: Tuple[float, float],
+                 cell_degrees: float,
+                 shape: Tuple[int, int],
+                 starts: np.ndarray) -> None:
+        # `ids`, `lat` and `lon` are sorted by cell; cell `c` holds positions
+        # `starts[c]:starts[c + 1]`, cells numbered row by row from `origin`
+        # (the south-west corner).
+        self.ids = ids
+        self.lat = lat
+        self.lon = lon
+        self.origin = origin
+        self.cell_degrees = cell_degrees
+        self.shape = shape
+        self.starts = starts
+
+    @classmethod
+    def build(cls, nl: pd.DataFrame, cell_degrees: float = GRID_DEGREES) -> 'SpatialIndex':
+        """
+        Index the nodes of `nl` that have coordinates.
+
+        Parameters
+        ----------
+        nl : pd.DataFrame
+            Node list, with `id`, `latitude` and `longitude` columns (see
+            `twnet.swp.join_swp_nodes`). Rows without coordinates are left
+            out, as are repeated ids.
+        cell_degrees : float, optional
+            Side of a grid cell in degrees, by default GRID_DEGREES.
+
+        Returns
+        -------
+        SpatialIndex
+        """
+        located = _located(nl)
+        ids = located['id'].astype(str).to_numpy()
+        lat = located['latitude'].to_numpy(dtype=float)
+        lon = located['longitude'].to_numpy(dtype=float)
+        if len(ids) == 0:
+            return cls(ids, lat, lon, (0.0, 0.0), cell_degrees, (1, 1), np.zeros(2, dtype=np.int64))
+
+        origin = (float(lat.min()), float(lon.min()))
+        rows = ((lat - origin[0]) // cell_degrees).astype(np.int64)
+        cols = ((lon - origin[1]) // cell_degrees).astype(np.int64)
+        shape = (int(rows.max()) + 1, int(cols.max()) + 1)
+        cells = rows * shape[1] + cols
+
+        order = np.argsort(cells, kind='stable')
+        starts = np.zeros(shape[0] * shape[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=shape[0] * shape[1]), out=starts[1:])
+        return cls(ids[order], lat[order], lon[order], origin, cell_degrees, shape, starts)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _row(self, lat: float) -> int:
+        return min(max(int((lat - self.origin[0]) // self.cell_degrees), 0), self.shape[0] - 1)
+
+    def _col(self, lon: float) -> int:
+        return min(max(int((lon - self.origin[1]) // self.cell_degrees), 0), self.shape[1] - 1)
+
+    def _block(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        # Positions of the points in cells r0..r1 x c0..c1 (inclusive). The
+        # cells of one row are contiguous, so each row is a single slice.
+        rows = np.arange(r0, r1 + 1) * self.shape[1]
+        lo, hi = self.starts[rows + c0], self.starts[rows + c1 + 1]
+        lengths = hi - lo
+        offsets = np.cumsum(lengths) - lengths
+        return np.repeat(lo - offsets, lengths) + np.arange(lengths.sum())
+
+    def bbox(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """
+        Return the ids of the nodes inside a bounding box (edges included).
+        """
+        top = self.origin[0] + self.shape[0] * self.cell_degrees
+        right = self.origin[1] + self.shape[1] * self.cell_degrees
+        if south > north or west > east or north < self.origin[0] or south > top \
+                or east < self.origin[1] or west > right:
+            return self.ids[:0]
+        found = self._positions(south, west, north, east)
+        lat, lon = self.lat[found], self.lon[found]
+        return self.ids[found[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)]]
+
+    def within(self, lat: float, lon: float, miles: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the ids of the nodes within `miles` of a point, and their
+        distances, nearest first.
+        """
+        dlat = math.degrees(miles / EARTH_RADIUS_MILES)
+        cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = 180.0 if cos_lat < 1e-9 else min(dlat / cos_lat, 180.0)
+        found = self._positions(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        distances = haversine_miles(lat, lon, self.lat[found], self.lon[found])
+        keep = distances <= miles
+        found, distances = found[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return self.ids[found[order]], distances[order]
+
+    def _positions(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        # Positions of the points in the cells overlapping a box (not
+        # filtered to the box itself).
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        return self._block(self._row(south), self._row(north), self._col(west), self._col(east))
+
+    def _outside_miles(self, lat: float, lon: float, r0: int, r1: int, c0: int, c1: int) -> float:
+        # Lower bound on the distance from a point to any indexed point
+        # outside cells r0..r1 x c0..c1.
+        south = self.origin[0] + r0 * self.cell_degrees
+        north = self.origin[0] + (r1 + 1) * self.cell_degrees
+        west = self.origin[1] + c0 * self.cell_degrees
+        east = self.origin[1] + (c1 + 1) * self.cell_degrees
+        if not (south <= lat <= north and west <= lon <= east):
+            return 0.0
+        cos_lat = math.cos(math.radians(lat))
+
+        def to_meridian(dlon: float) -> float:
+            # Distance from the point to a meridian `dlon` degrees away.
+            return EARTH_RADIUS_MILES * math.asin(cos_lat * math.sin(math.radians(min(dlon, 90.0))))
+
+        bound = math.inf
+        if r0 > 0:
+            bound = min(bound, EARTH_RADIUS_MILES * math.radians(lat - south))
+        if r1 < self.shape[0] - 1:
+            bound = min(bound, EARTH_RADIUS_MILES * math.radians(north - lat))
+        if c0 > 0:
+            bound = min(bound, to_meridian(lon - west))
+        if c1 < self.shape[1] - 1:
+            bound = min(bound, to_meridian(east - lon))
+        return bound
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the ids of the `k` nodes nearest to a point, and their
+        distances, nearest first.
+
+        Searches squares of cells around the point's cell, doubling their
+        size, until the `k`-th distance found is no farther than any cell not
+        searched yet.
+        """
+        if len(self) == 0 or k <= 0:
+            return self.ids[:0], np.empty(0)
+        row, col = self._row(lat), self._col(lon)
+        ring = 0
+        while True:
+            r0, r1 = max(row - ring, 0), min(row + ring, self.shape[0] - 1)
+            c0, c1 = max(col - ring, 0), min(col + ring, self.shape[1] - 1)
+            found = self._block(r0, r1, c0, c1)
+            everything = (r0, r1, c0, c1) == (0, self.shape[0] - 1, 0, self.shape[1] - 1)
+            if len(found) >= k or everything:
+                distances = haversine_miles(lat, lon, self.lat[found], self.lon[found])
+                order = np.argsort(distances, kind='stable')[:k]
+                if everything or distances[order[-1]] <= self._outside_miles(lat, lon, r0, r1, c0, c1):
+                    return self.ids[found[order]], distances[order]
+            ring = 2 * ring or 1
+
+    def save(self, path: str) -> str:
+        """
+        Write the index to `path` (an `.npz` file) and return the path.
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, ids=self.ids.astype(str), lat=self.lat, lon=self.lon, starts=self.starts,
+                     origin=np.array(self.origin), cell_degrees=np.array(self.cell_degrees),
+                     shape=np.array(self.shape))
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'SpatialIndex':
+        """
+        Read an index written by `save` (or `write_spatial`, given its folder).
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, INDEX_FILE)
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['ids'], data['lat'], data['lon'], tuple(data['origin'].tolist()),
+                       float(data['cell_degrees']), tuple(data['shape'].tolist()), data['starts'])
+
+
+def tile_of(lat: np.ndarray, lon: np.ndarray, zoom: int = TILE_ZOOM) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the web map (slippy) tile `x` and `y` of coordinates at `zoom`.
+    """
+    n = 2 ** zoom
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = np.floor((np.asarray(lon) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(x: int, y: int, zoom: int = TILE_ZOOM) -> List[float]:
+    """
+    Return the `[south, west, north, east]` bounds of a web map tile.
+    """
+    n = 2 ** zoom
+
+    def latitude(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return [latitude(y + 1), x / n * 360.0 - 180.0, latitude(y), (x + 1) / n * 360.0 - 180.0]
+
+
+def write_tiles(nl: pd.DataFrame, folder: str, zoom: int = TILE_ZOOM) -> List[str]:
+    """
+    Write the located nodes of `nl` split into web map tiles.
+
+    Each tile is `{z}-{x}-{y}.json`, `{"z", "x", "y", "bounds", "nodes"}` with
+    the tile's `[south, west, north, east]` bounds and the Cytoscape.js
+    records of its nodes. `tiles.json` lists
+    `{"zoom": z, "tiles": [{"file", "x", "y", "bounds", "nodes"}]}`, with
+    each tile's node count. Tiles from a previous run are removed.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list, with `id`, `latitude` and `longitude` columns.
+    folder : str
+        Folder to write to.
+    zoom : int, optional
+        Zoom level of the tiles, by default TILE_ZOOM.
+
+    Returns
+    -------
+    List[str]
+        Paths written, `tiles.json` first.
+    """
+    located = _located(nl)
+    x, y = tile_of(located['latitude'].to_numpy(dtype=float), located['longitude'].to_numpy(dtype=float), zoom)
+    chunks = list(iter_cyto_records(located))
+    records = np.concatenate(chunks) if chunks else np.empty(0, dtype=object)
+
+    os.makedirs(folder, exist_ok=True)
+    for stale in glob.glob(os.path.join(folder, '*-*-*.json')):
+        os.remove(stale)
+
+    # Group the rows by tile with one sort.
+    keys = x * 2 ** zoom + y
+    order = np.argsort(keys, kind='stable')
+    tiles, first = np.unique(keys[order], return_index=True)
+    bounds = np.append(first, len(order))
+
+    listing, files = [], []
+    for i, key in enumerate(tiles.tolist()):
+        tx, ty = divmod(key, 2 ** zoom)
+        rows = order[bounds[i]:bounds[i + 1]]
+        name = _TILE_NAME.format(zoom, tx, ty)
+        box = tile_bounds(tx, ty, zoom)
+        with open(os.path.join(folder, name), 'w') as f:
+            f.write(f'{{"z":{zoom},"x":{tx},"y":{ty},"bounds":{json.dumps(box)},'
+                    f'"nodes":[{",".join(records[rows])}]}}')
+        listing.append({'file': name, 'x': tx, 'y': ty, 'bounds': box, 'nodes': len(rows)})
+        files.append(os.path.join(folder, name))
+
+    index_path = os.path.join(folder, TILES_FILE)
+    with open(index_path, 'w') as f:
+        json.dump({'zoom': zoom, 'tiles': listing}, f)
+    return [index_path] + files
+
+
+def write_spatial(nl: pd.DataFrame,
+                  folder: str,
+                  zoom: int = TILE_ZOOM,
+                  cell_degrees: float = GRID_DEGREES) -> List[str]:
+    """
+    Write the spatial index (`grid.npz`) and the map tiles of a node list to
+    `folder`.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list, with `id`, `latitude` and `longitude` columns.
+    folder : str
+        Folder to write to.
+    zoom : int, optional
+        Zoom level of the tiles, by default TILE_ZOOM.
+    cell_degrees : float, optional
+        Side of a grid cell in degrees, by default GRID_DEGREES.
+
+    Returns
+    -------
+    List[str]
+        Paths written, the index first, then `tiles.json` and the tiles.
+    """
+    index_path = SpatialIndex.build(nl, cell_degrees).save(os.path.join(folder, INDEX_FILE))
+    return [index_path] + write_tiles(nl, folder, zoom)
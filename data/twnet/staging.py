@@ -0,0 +1,313 @@
+"""
+Optional columnar (Parquet) staging for the pipeline's inputs and outputs.
+
+Raw survey CSVs can be converted once into compressed, typed Parquet files with
+`stage_input` (or `twnet.loaders.stage_inputs` for the whole inputs folder). The
+staged copy lives in a `staged/` folder next to the CSV and records the CSV's size, modification time
+and the dtypes it was parsed with; `twnet.loaders.read_input` uses it
+automatically while it is fresh and falls back to the CSV otherwise.
+
+The edge and node outputs can be written in the same format with
+`write_table`, and read back, memory-mapped and column-projected, with
+`read_table` / `read_output`. CSV remains the format shared with Gephi users.
+
+Everything here requires `pyarrow`; without it `HAS_PYARROW` is False and the
+pipeline keeps working from the CSVs alone. Derived frames the pipeline keeps
+on disk (the State Water Plan sheets, the temporal store) go through
+`write_frame` / `read_frame`, which fall back to pickles.
+"""
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import csv as pa_csv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# pandas' default missing-value markers, so both parsers agree on what is null.
+NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null'
+]
+
+STAGED_DIR = 'staged'
+# Extension of the files written by `write_frame`.
+FRAME_EXTENSION = '.parquet' if HAS_PYARROW else '.pkl'
+COMPRESSION = 'zstd'
+_METADATA_KEY = b'twnet.staging'
+
+
+def _require_pyarrow() -> None:
+    if not HAS_PYARROW:
+        raise ImportError("Parquet staging requires pyarrow (pip install pyarrow).")
+
+
+def dtype_key(dtype: Optional[Dict[str, object]]) -> Optional[list]:
+    """
+    Return a JSON-friendly, order-independent description of a dtype mapping.
+    """
+    if dtype is None:
+        return None
+    return sorted([name, str(kind)] for name, kind in dtype.items())
+
+
+def read_csv_arrow(path: str,
+                   usecols: Optional[List[str]] = None,
+                   dtype: Optional[Dict[str, object]] = None) -> 'pa.Table':
+    """
+    Parse a CSV with pyarrow's multi-threaded reader.
+
+    Parameters
+    ----------
+    path : str
+        Path to the CSV file.
+    usecols : Optional[List[str]], optional
+        Raw column names to read, by default None (all columns).
+    dtype : Optional[Dict[str, object]], optional
+        Dtypes keyed by raw column name, by default None. `str` maps to an
+        Arrow string column.
+
+    Returns
+    -------
+    pa.Table
+        Parsed table, with pandas' default missing-value markers as nulls.
+    """
+    _require_pyarrow()
+    column_types = {
+        name: pa.string() if kind is str else pa.from_numpy_dtype(np.dtype(kind))
+        for name, kind in (dtype or {}).items()
+    }
+    return pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        convert_options=pa_csv.ConvertOptions(include_columns=usecols,
+                                              column_types=column_types,
+                                              null_values=NA_VALUES,
+                                              strings_can_be_null=True)
+    )
+
+
+def to_frame(table: 'pa.Table') -> pd.DataFrame:
+    """
+    Convert an Arrow table to the frame pandas' own CSV reader would return.
+    """
+    frame = table.to_pandas()
+    # Arrow hands back None for missing strings; pandas uses NaN.
+    with_nulls = {name for name, column in zip(table.column_names, table.columns) if column.null_count}
+    for name in frame.select_dtypes(include=object).columns:
+        if name in with_nulls:
+            frame[name] = frame[name].where(frame[name].notna(), np.nan)
+    return frame
+
+
+def staged_path(csv_path: str) -> str:
+    """
+    Return where the staged Parquet copy of `csv_path` lives.
+    """
+    folder, name = os.path.split(csv_path)
+    return os.path.join(folder, STAGED_DIR, os.path.splitext(name)[0] + '.parquet')
+
+
+def source_stamp(path: str) -> dict:
+    """
+    Return the size and modification time of `path`, to tell whether a copy
+    made from it is still fresh.
+    """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def find_staged(csv_path: str,
+                dtype: Optional[Dict[str, object]] = None) -> Optional[str]:
+    """
+    Return the staged copy of `csv_path` if it is fresh and was parsed with
+    `dtype`, otherwise None.
+    """
+    if not HAS_PYARROW:
+        return None
+    path = staged_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    if _METADATA_KEY not in metadata:
+        return None
+    stamp = json.loads(metadata[_METADATA_KEY])
+    if stamp['source'] != source_stamp(csv_path) or stamp['dtype'] != dtype_key(dtype):
+        return None
+    return path
+
+
+def stage_input(csv_path: str,
+                dtype: Optional[Dict[str, object]] = None,
+                force: bool = False) -> str:
+    """
+    Convert a raw survey CSV to a compressed, typed Parquet file once.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path to the CSV file.
+    dtype : Optional[Dict[str, object]], optional
+        Dtypes keyed by column name, stripped or not, by default None. Use the
+        same mapping the pipeline reads the file with (see `twnet.loaders`).
+    force : bool, optional
+        If True, rewrite the staged file even if it is fresh, by default False.
+
+    Returns
+    -------
+    str
+        Path to the staged Parquet file.
+    """
+    _require_pyarrow()
+    if not force:
+        fresh = find_staged(csv_path, dtype)
+        if fresh is not None:
+            return fresh
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    raw_names = {name.strip(): name for name in header}
+    raw_dtype = {raw_names.get(name, name): kind for name, kind in (dtype or {}).items()
+                 if raw_names.get(name, name) in header}
+
+    table = read_csv_arrow(csv_path, dtype=raw_dtype)
+    stamp = {'source': source_stamp(csv_path), 'dtype': dtype_key(dtype)}
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _METADATA_KEY: json.dumps(stamp).encode()
+    })
+
+    path = staged_path(csv_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path, compression=COMPRESSION, use_dictionary=True)
+    return path
+
+
+def write_table(df: pd.DataFrame, path: str) -> str:
+    """
+    Write a node or edge table to a compressed Parquet file.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Table to write. The index is not stored.
+    path : str
+        Destination path, usually ending in `.parquet`.
+
+    Returns
+    -------
+    str
+        The path written.
+    """
+    _require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, path, compression=COMPRESSION, use_dictionary=True)
+    return path
+
+
+def read_table(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read a Parquet file, memory-mapped and limited to `columns`.
+
+    Parameters
+    ----------
+    path : str
+        Path to the Parquet file.
+    columns : Optional[List[str]], optional
+        Columns to read, by default None (all columns).
+
+    Returns
+    -------
+    pd.DataFrame
+        The table as a frame.
+    """
+    _require_pyarrow()
+    return to_frame(pq.read_table(path, columns=columns, memory_map=True))
+
+
+def iter_table(path: str,
+               columns: Optional[List[str]] = None,
+               chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+    """
+    Stream a Parquet file in record batches.
+
+    Parameters
+    ----------
+    path : str
+        Path to the Parquet file.
+    columns : Optional[List[str]], optional
+        Columns to read, by default None (all columns).
+    chunksize : int, optional
+        Rows per batch, by default 100,000.
+
+    Yields
+    ------
+    pd.DataFrame
+        Chunks indexed by their rows' positions in the file.
+    """
+    _require_pyarrow()
+    start = 0
+    for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize,
+                                                                    columns=columns):
+        frame = to_frame(pa.Table.from_batches([batch]))
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        start += len(frame)
+        yield frame
+
+
+def read_output(stem: str,
+                columns: Optional[List[str]] = None,
+                dtype: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+    """
+    Read a node or edge output, preferring `{stem}.parquet` over `{stem}.csv`.
+
+    Parameters
+    ----------
+    stem : str
+        Path without extension, e.g. `outputs/edges_20250604`.
+    columns : Optional[List[str]], optional
+        Columns to read, by default None (all columns).
+    dtype : Optional[Dict[str, object]], optional
+        Dtypes for the CSV fallback, by default None. Parquet files carry
+        their own types.
+
+    Returns
+    -------
+    pd.DataFrame
+        The table as a frame.
+    """
+    if HAS_PYARROW and os.path.exists(stem + '.parquet'):
+        return read_table(stem + '.parquet', columns=columns)
+    return pd.read_csv(stem + '.csv', usecols=columns, dtype=dtype)
+
+
+def write_frame(frame: pd.DataFrame, stem: str) -> str:
+    """
+    Write a frame to `{stem}.parquet`, or to `{stem}.pkl` without pyarrow.
+
+    Returns
+    -------
+    str
+        The path written.
+    """
+    path = stem + FRAME_EXTENSION
+    if HAS_PYARROW:
+        return write_table(frame, path)
+    frame.to_pickle(path)
+    return path
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    """
+    Read a frame written by `write_frame`.
+    """
+    if path.endswith('.parquet'):
+        return read_table(path)
+    return pd.read_pickle(path)
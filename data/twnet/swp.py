@@ -0,0 +1,258 @@
+"""
+The 2022 State Water Plan (SWP) workbook, joined into the node and edge lists.
+
+The TWDB workbook in `inputs/` holds four sheets: a data description, the
+existing water supply transactions to water user groups (WUGs), the WUG
+centroids, and a bridge between SWP entities and public water systems (PWS).
+
+Each sheet is read once, row by row, with `openpyxl` in read-only mode (no
+formatting or formulas are loaded, and cells are not kept in memory), and
+stored as a columnar copy in `inputs/staged/<workbook name>/`: Parquet when
+`pyarrow` is installed, a pickled frame otherwise. A manifest records the
+workbook's size and modification time; later runs read the copies and only
+parse the workbook again once it changes.
+
+`join_swp_nodes` adds each water system's SWP entity, WUG name, planning
+region and centroid (matched on the TCEQ PWS code), and `join_swp_edges`
+counts the SWP supply transactions between the entities at both ends of every
+edge.
+"""
+import json
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from twnet import staging
+
+SWP_WORKBOOK = 'inputs/2022StateWaterPlan_ExistingWUGSupplyTransaction+Coordinate+PWSBridge.xlsx'
+
+# Short names of the sheets, in workbook order.
+SHEETS = {
+    'DataDescription+UseInfo': 'description',
+    '2022SWPExistingWaterSupplyTrans': 'transactions',
+    '2022SWPWUGCentroids': 'centroids',
+    '2022SWP+SurveyPWSBridge': 'bridge',
+}
+
+# Columns added to the node list by `join_swp_nodes`.
+SWP_NODE_COLUMNS = ['swp_entity_id', 'swp_wug_name', 'swp_region', 'latitude', 'longitude']
+
+_MANIFEST = 'manifest.json'
+
+
+class SwpTables(NamedTuple):
+    """
+    The sheets of the SWP workbook, with cleaned column names.
+    """
+    description: pd.DataFrame
+    transactions: pd.DataFrame
+    centroids: pd.DataFrame
+    bridge: pd.DataFrame
+
+
+def clean_header(name) -> str:
+    """
+    Collapse the line breaks and repeated spaces of a workbook header.
+    """
+    return re.sub(r'\s+', ' ', str(name)).strip()
+
+
+def _column(values: list) -> pd.Series:
+    # Numbers stay numbers; a column mixing strings with other values (e.g. ids
+    # typed in as text in some rows) is kept as strings.
+    column = pd.Series(values)
+    if column.dtype == object:
+        kinds = {type(value) for value in values if value is not None}
+        if len(kinds) > 1:
+            column = pd.Series([None if value is None else str(value) for value in values], dtype=object)
+    return column
+
+
+def read_sheet(worksheet) -> pd.DataFrame:
+    """
+    Stream one worksheet into a frame.
+
+    Title rows above the header (rows with a single filled cell) are skipped,
+    and the first row with several filled cells is the header. Empty rows are
+    dropped.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = None
+    for row in rows:
+        if sum(value is not None for value in row) > 1:
+            header = [clean_header(value) for value in row]
+            break
+    if header is None:
+        return pd.DataFrame()
+    width = len(header)
+    columns: List[list] = [[] for _ in range(width)]
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        for i in range(width):
+            columns[i].append(row[i] if i < len(row) else None)
+    return pd.DataFrame({name: _column(values) for name, values in zip(header, columns) if name != 'None'})
+
+
+def find_swp_workbook(folder: str) -> Optional[str]:
+    """
+    Return the State Water Plan workbook in `folder` (the last by name if
+    there are several), or None.
+    """
+    names = sorted(name for name in os.listdir(folder)
+                   if 'StateWaterPlan' in name and name.lower().endswith('.xlsx') and not name.startswith('~$'))
+    return os.path.join(folder, names[-1]) if names else None
+
+
+def staged_folder(workbook: str) -> str:
+    """
+    Return where the columnar copies of `workbook` live.
+    """
+    folder, name = os.path.split(workbook)
+    return os.path.join(folder, staging.STAGED_DIR, os.path.splitext(name)[0])
+
+
+def stage_workbook(workbook: str = SWP_WORKBOOK, force: bool = False) -> Dict[str, str]:
+    """
+    Convert every sheet of the SWP workbook to a columnar file, once.
+
+    Parameters
+    ----------
+    workbook : str, optional
+        Path to the workbook, by default SWP_WORKBOOK.
+    force : bool, optional
+        If True, convert the workbook even if its copies are fresh, by
+        default False.
+
+    Returns
+    -------
+    Dict[str, str]
+        Path of the copy of each sheet, keyed by short sheet name (see
+        SHEETS).
+    """
+    folder = staged_folder(workbook)
+    manifest_path = os.path.join(folder, _MANIFEST)
+    stamp = staging.source_stamp(workbook)
+    if not force:
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if (manifest is not None and manifest['source'] == stamp
+                and all(path.endswith(staging.FRAME_EXTENSION) and os.path.exists(path)
+                        for path in manifest['sheets'].values())):
+            return manifest['sheets']
+
+    import openpyxl
+
+    os.makedirs(folder, exist_ok=True)
+    sheets = {}
+    workbook_file = openpyxl.load_workbook(workbook, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook_file.worksheets:
+            name = SHEETS.get(worksheet.title, clean_header(worksheet.title))
+            sheets[name] = staging.write_frame(read_sheet(worksheet), os.path.join(folder, name))
+    finally:
+        workbook_file.close()
+
+    tmp = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'source': stamp, 'sheets': sheets}, f)
+    os.replace(tmp, manifest_path)
+    return sheets
+
+
+def read_swp(workbook: str = SWP_WORKBOOK) -> SwpTables:
+    """
+    Read the SWP sheets from their columnar copies, converting the workbook
+    first if it is new or changed.
+    """
+    sheets = stage_workbook(workbook)
+    return SwpTables(**{name: staging.read_frame(sheets[name]) for name in SwpTables._fields})
+
+
+def swp_systems(tables: SwpTables) -> pd.DataFrame:
+    """
+    Return the SWP entity, WUG name, planning region and centroid of every
+    PWS in the bridge sheet, keyed by its TCEQ code (`TX1234567`).
+    """
+    bridge = tables.bridge.rename(columns={'PWSCodeTx': 'TCEQ PWS Code', 'EntityId': 'swp_entity_id'})
+    centroids = tables.centroids.rename(columns={'EntityId': 'swp_entity_id', 'WUG Name': 'swp_wug_name',
+                                                 'WUG Primary Region': 'swp_region',
+                                                 'Latitude': 'latitude', 'Longitude': 'longitude'})
+    systems = bridge[['TCEQ PWS Code', 'swp_entity_id']].merge(
+        centroids.drop_duplicates(subset='swp_entity_id')[SWP_NODE_COLUMNS],
+        on='swp_entity_id', how='left')
+    return systems.drop_duplicates(subset='TCEQ PWS Code').set_index('TCEQ PWS Code')
+
+
+def join_swp_nodes(nl: pd.DataFrame, tables: SwpTables) -> pd.DataFrame:
+    """
+    Add the SWP entity, WUG name, planning region and centroid of every water
+    system to an enriched node list.
+
+    Parameters
+    ----------
+    nl : pd.DataFrame
+        Node list from `enrich_nodes`, with a `TCEQ PWS Code` column.
+    tables : SwpTables
+        The SWP sheets, from `read_swp`.
+
+    Returns
+    -------
+    pd.DataFrame
+        `nl`, in the same order, with the SWP_NODE_COLUMNS added (missing
+        for water sources and systems not in the SWP bridge).
+    """
+    systems = swp_systems(tables)
+    out = nl.copy()
+    found = systems.reindex(out['TCEQ PWS Code'].to_numpy())
+    for column in SWP_NODE_COLUMNS:
+        out[column] = found[column].to_numpy()
+    # Reindexing leaves NaN for unmatched rows; keep the ids whole numbers.
+    out['swp_entity_id'] = out['swp_entity_id'].astype('Int64')
+    return out
+
+
+def join_swp_edges(el: pd.DataFrame, nl: pd.DataFrame, tables: SwpTables) -> pd.DataFrame:
+    """
+    Count the SWP supply transactions behind every edge.
+
+    An edge's source and target are mapped to their SWP entities through the
+    node list, and `swp_transactions` counts the transaction rows from the
+    source's entity (as seller) to the target's entity (as buyer WUG). Edges
+    whose ends have no entity, e.g. from aquifers, count 0.
+
+    Parameters
+    ----------
+    el : pd.DataFrame
+        Edge list, with `source` and `target` columns.
+    nl : pd.DataFrame
+        Node list from `join_swp_nodes`.
+    tables : SwpTables
+        The SWP sheets, from `read_swp`.
+
+    Returns
+    -------
+    pd.DataFrame
+        `el`, in the same order, with a `swp_transactions` column.
+    """
+    entities = nl.drop_duplicates(subset='id').set_index('id')['swp_entity_id'].astype(float)
+    source = entities.reindex(el['source'].to_numpy()).to_numpy()
+    target = entities.reindex(el['target'].to_numpy()).to_numpy()
+
+    transactions = tables.transactions
+    sellers = transactions['Seller EntityId'].to_numpy(dtype=float)
+    buyers = transactions['WUG EntityId'].to_numpy(dtype=float)
+    counts = (pd.DataFrame({'seller': sellers, 'buyer': buyers})
+              .loc[sellers > 0]
+              .value_counts())
+
+    pairs = pd.MultiIndex.from_arrays([source, target])
+    out = el.copy()
+    out['swp_transactions'] = counts.reindex(pairs).fillna(0).to_numpy(dtype=np.int64)
+    return out
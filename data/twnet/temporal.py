@@ -0,0 +1,543 @@
+"""
+The network over time: one base node and edge list, plus what changed at
+every later year or snapshot.
+
+Every dated output and every year built by `python -m twnet` is a full copy
+of the node and edge lists, though consecutive ones are mostly identical.
+`TemporalStore` keeps the first snapshot it is given as the base and, for
+each later one, only its delta to the previous one: the rows added, the rows
+removed and the values changed (e.g. a new yearly volume). Disk use thus
+grows with the amount of change, not with the number of snapshots; a column
+taking one new value in every row (e.g. the survey `year`) compresses to
+almost nothing.
+
+Rows are matched by key: nodes by `id`, edges by `source`, `target` and
+`type` (numbered in order of appearance when a key repeats). Row order is
+kept too: a row that moved relative to the others is stored as removed and
+added at its new position, so `as_of` rebuilds a snapshot row for row.
+Tables are kept as text, as in the CSV outputs: `as_of` returns every column
+as strings with missing values as NaN, like `pd.read_csv(path, dtype=str)`.
+
+Snapshots are labelled by date (`YYYYMMDD`) or survey year (`YYYY`, which
+falls after every date of that year). `as_of` applies the deltas to the base
+up to a snapshot, or up to the last snapshot in a year; `diff` compares two
+snapshots in the same pass and returns the added, removed and changed rows,
+with the columns that changed.
+
+The store is a folder holding `manifest.json` (the snapshots in order, their
+columns and delta files), the base in `base/` and every delta in
+`deltas/<label>/`, as Parquet when `pyarrow` is installed and as pickles
+otherwise. `python -m twnet.temporal` builds one from the snapshots in
+`outputs/` and queries it.
+
+Examples
+--------
+>>> store = TemporalStore('outputs/temporal')                    # doctest: +SKIP
+>>> store.add_snapshot('outputs', '20250403')                    # doctest: +SKIP
+>>> nl, el = store.as_of(2025)                                   # doctest: +SKIP
+>>> store.diff('20250304', '20250403').edges.changed             # doctest: +SKIP
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import shutil
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from twnet import staging
+
+TEMPORAL_DIR = 'temporal'
+
+TABLES = ('nodes', 'edges')
+
+# Columns matching the rows of each table across snapshots.
+KEYS = {'nodes': ['id'], 'edges': ['source', 'target', 'type']}
+
+# Parts of a delta: the removed rows (their keys), the added rows (in full)
+# and the changed values (one row per `column` and new `value`). Each carries
+# a `_position`: in the previous snapshot for removed rows, in the new one for
+# the others.
+PARTS = ('removed', 'added', 'changed')
+
+_POSITION = '_position'
+_MANIFEST = 'manifest.json'
+
+# Snapshot files the store can be built from, e.g. `nodes_20250403.csv` or
+# `edges_2022.csv`.
+_SNAPSHOT = re.compile(r'^(nodes|edges)_(\d{4}|\d{8})\.csv$')
+
+
+class TableDiff(NamedTuple):
+    """
+    Rows of one table that differ between two snapshots: the rows `added`
+    (as in the later one) and `removed` (as in the earlier one), and the
+    `changed` values, one row per key, `column`, value `before` and `after`.
+    """
+    added: pd.DataFrame
+    removed: pd.DataFrame
+    changed: pd.DataFrame
+
+
+class NetworkDiff(NamedTuple):
+    """
+    The node and edge differences between two snapshots.
+    """
+    nodes: TableDiff
+    edges: TableDiff
+
+
+def snapshot_order(label: Union[str, int]) -> str:
+    """
+    Return the sort key of a snapshot label: the date itself, or the end of
+    the year for a survey year.
+
+    Raises
+    ------
+    ValueError
+        If `label` is neither a `YYYYMMDD` date nor a `YYYY` year.
+    """
+    label = str(label)
+    if re.fullmatch(r'\d{8}', label):
+        return label
+    if re.fullmatch(r'\d{4}', label):
+        return label + '9999'
+    raise ValueError(f"Snapshot labels are YYYYMMDD dates or YYYY years, not {label!r}.")
+
+
+def find_snapshot_labels(folder: str) -> List[str]:
+    """
+    Return the labels of the CSV snapshots in `folder` that have both a node
+    and an edge list, in time order.
+    """
+    tables = {'nodes': set(), 'edges': set()}
+    for name in os.listdir(folder):
+        match = _SNAPSHOT.match(name)
+        if match is not None:
+            tables[match.group(1)].add(match.group(2))
+    return sorted(tables['nodes'] & tables['edges'], key=snapshot_order)
+
+
+def read_snapshot_text(folder: str, label: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read the node and edge lists of a CSV snapshot as text.
+    """
+    return tuple(pd.read_csv(os.path.join(folder, f'{table}_{label}.csv'), dtype=str) for table in TABLES)
+
+
+def _as_text(df: pd.DataFrame) -> pd.DataFrame:
+    # Every value as the string the CSV export writes, missing ones as NaN.
+    return df.astype(str).where(df.notna(), np.nan).reset_index(drop=True)
+
+
+def _keys(df: pd.DataFrame, table: str) -> pd.MultiIndex:
+    # The key columns, plus the occurrence of each key.
+    key = KEYS[table]
+    occurrence = df.groupby(key, sort=False, dropna=False).cumcount()
+    return pd.MultiIndex.from_arrays([df[column] for column in key] + [occurrence])
+
+
+def _increasing(values: np.ndarray) -> np.ndarray:
+    # Indices of a longest strictly increasing run of `values` (not
+    # necessarily contiguous), by patience sorting.
+    if len(values) < 2 or (np.diff(values) > 0).all():
+        return np.arange(len(values))
+    tails, tail_values = [], []
+    previous = [-1] * len(values)
+    for i, value in enumerate(values.tolist()):
+        k = bisect.bisect_left(tail_values, value)
+        if k:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k], tail_values[k] = i, value
+    run, i = [], tails[-1]
+    while i >= 0:
+        run.append(i)
+        i = previous[i]
+    return np.array(run[::-1], dtype=np.int64)
+
+
+def table_delta(before: pd.DataFrame, after: pd.DataFrame, table: str) -> Dict[str, pd.DataFrame]:
+    """
+    Compute the delta turning one snapshot of a table into the next.
+
+    Parameters
+    ----------
+    before, after : pd.DataFrame
+        The table in both snapshots, as text; `before` is aligned to the
+        columns of `after`.
+    table : str
+        'nodes' or 'edges', which picks the key columns.
+
+    Returns
+    -------
+    Dict[str, pd.DataFrame]
+        The `PARTS` of the delta: the key columns of the removed rows, the
+        added rows, and the changed values, each with its `_position`.
+    """
+    before = before.reindex(columns=after.columns)
+    found = _keys(after, table).get_indexer(_keys(before, table))
+    kept = np.flatnonzero(found >= 0)
+    # Rows kept in the same relative order stay in place; the others move.
+    kept = kept[_increasing(found[kept])]
+    moved_to = found[kept]
+
+    removed = np.ones(len(before), dtype=bool)
+    removed[kept] = False
+    added = np.ones(len(after), dtype=bool)
+    added[moved_to] = False
+
+    old, new = before.to_numpy(dtype=object)[kept], after.to_numpy(dtype=object)[moved_to]
+    rows, cells = np.nonzero((old != new) & ~(pd.isna(old) & pd.isna(new)))
+    # By column, then position, so runs of one value compress well.
+    order = np.lexsort((moved_to[rows], cells))
+    rows, cells = rows[order], cells[order]
+
+    removed_rows = np.flatnonzero(removed)
+    return {'removed': before.loc[removed_rows, KEYS[table]].assign(**{_POSITION: removed_rows}),
+            'added': after.loc[added].assign(**{_POSITION: np.flatnonzero(added)}),
+            'changed': pd.DataFrame({_POSITION: moved_to[rows],
+                                     'column': np.asarray(after.columns, dtype=object)[cells],
+                                     'value': new[rows, cells]})}
+
+
+def _apply(previous: Dict[str, np.ndarray], rows: int, delta: Dict[str, pd.DataFrame],
+           columns: List[str]) -> Dict[str, np.ndarray]:
+    # `apply_delta` on a table held as one object array per column.
+    kept = np.ones(rows, dtype=bool)
+    kept[delta['removed'][_POSITION].to_numpy(dtype=np.int64)] = False
+    added, changed = delta['added'], delta['changed']
+    survivors = int(kept.sum())
+
+    # Added rows go to their positions, and the survivors, in order, to the
+    # other ones.
+    positions = added[_POSITION].to_numpy(dtype=np.int64)
+    slots = np.ones(survivors + len(added), dtype=bool)
+    slots[positions] = False
+    order = np.empty(len(slots), dtype=np.int64)
+    order[slots] = np.arange(survivors)
+    order[positions] = survivors + np.arange(len(added))
+
+    data = {}
+    for column in columns:
+        old = previous[column][kept] if column in previous else np.full(survivors, np.nan, dtype=object)
+        data[column] = np.concatenate([old, added[column].to_numpy(dtype=object)])[order]
+    for column, cells in changed.groupby('column', sort=False):
+        data[column][cells[_POSITION].to_numpy(dtype=np.int64)] = cells['value'].to_numpy(dtype=object)
+    return data
+
+
+def apply_delta(previous: pd.DataFrame, delta: Dict[str, pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+    """
+    Apply a delta from `table_delta` to the previous snapshot of a table.
+    """
+    arrays = {column: previous[column].to_numpy(dtype=object) for column in previous.columns}
+    return pd.DataFrame(_apply(arrays, len(previous), delta, columns), columns=columns, dtype=object)
+
+
+def table_diff(before: pd.DataFrame, after: pd.DataFrame, table: str) -> TableDiff:
+    """
+    Compare two snapshots of a table, ignoring row order.
+    """
+    columns = list(dict.fromkeys(list(before.columns) + list(after.columns)))
+    before, after = before.reindex(columns=columns), after.reindex(columns=columns)
+    before_keys, after_keys = _keys(before, table), _keys(after, table)
+    found = after_keys.get_indexer(before_keys)
+    kept = np.flatnonzero(found >= 0)
+    added = np.ones(len(after), dtype=bool)
+    added[found[kept]] = False
+
+    old, new = before.to_numpy(dtype=object)[kept], after.to_numpy(dtype=object)[found[kept]]
+    rows, cells = np.nonzero((old != new) & ~(pd.isna(old) & pd.isna(new)))
+    changed = before.iloc[kept[rows]][KEYS[table]].reset_index(drop=True)
+    changed['column'] = np.asarray(columns, dtype=object)[cells]
+    changed['before'] = old[rows, cells]
+    changed['after'] = new[rows, cells]
+    return TableDiff(after[added].reset_index(drop=True),
+                     before[found < 0].reset_index(drop=True),
+                     changed)
+
+
+def _frames(arrays: Dict[str, Dict[str, np.ndarray]], columns: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
+    # The tables of a snapshot, from their column arrays.
+    return {table: pd.DataFrame(arrays[table], columns=columns[table], dtype=object) for table in TABLES}
+
+
+class TemporalStore:
+    """
+    A base node and edge list, and the deltas of every later snapshot.
+
+    Parameters
+    ----------
+    folder : str
+        Folder of the store; created on the first `add`.
+    checkpoint_every : Optional[int], optional
+        Also store every n-th snapshot in full, so rebuilding a snapshot
+        replays at most n deltas, by default None (never; the store's own
+        setting once it exists).
+    """
+
+    def __init__(self, folder: str, checkpoint_every: Optional[int] = None) -> None:
+        self.folder = folder
+        try:
+            with open(os.path.join(folder, _MANIFEST)) as f:
+                self._manifest = json.load(f)
+        except FileNotFoundError:
+            self._manifest = {'keys': KEYS, 'checkpoint_every': None, 'snapshots': []}
+        if checkpoint_every is not None:
+            self._manifest['checkpoint_every'] = checkpoint_every
+        # The latest snapshot, once materialized, for the next `add`.
+        self._latest = None
+
+    @property
+    def snapshots(self) -> List[str]:
+        """
+        Labels of the snapshots in the store, in time order.
+        """
+        return [snapshot['label'] for snapshot in self._manifest['snapshots']]
+
+    def __len__(self) -> int:
+        return len(self._manifest['snapshots'])
+
+    def add(self, label: Union[str, int], nl: pd.DataFrame, el: pd.DataFrame) -> Dict[str, Dict[str, int]]:
+        """
+        Add a snapshot after the last one, storing only its delta.
+
+        If `label` is already the latest snapshot (e.g., the notebook ran
+        twice on the same day), that snapshot is replaced.
+
+        Parameters
+        ----------
+        label : str or int
+            Date (`YYYYMMDD`) or survey year of the snapshot.
+        nl, el : pd.DataFrame
+            The snapshot's node and edge lists; values are stored as text.
+
+        Returns
+        -------
+        Dict[str, Dict[str, int]]
+            The number of rows removed, added and changed in each table (all
+            rows are added for the base).
+
+        Raises
+        ------
+        ValueError
+            If `label` is not later than the latest snapshot.
+        """
+        label = str(label)
+        order = snapshot_order(label)
+        if self.snapshots and label == self.snapshots[-1]:
+            self._drop_latest()
+        if self.snapshots and order <= snapshot_order(self.snapshots[-1]):
+            raise ValueError(f"Snapshot {label} is not later than the latest one, {self.snapshots[-1]}.")
+
+        tables = {'nodes': _as_text(nl), 'edges': _as_text(el)}
+        if self.snapshots:
+            previous = self._latest if self._latest is not None else self._materialize(self.snapshots[-1])
+            folder = os.path.join('deltas', label)
+            parts = {table: table_delta(previous[table], tables[table], table) for table in TABLES}
+        else:
+            folder = 'base'
+            parts = {table: {'added': tables[table].assign(**{_POSITION: np.arange(len(tables[table]))})}
+                     for table in TABLES}
+        os.makedirs(os.path.join(self.folder, folder), exist_ok=True)
+
+        files, counts = {}, {}
+        for table in TABLES:
+            files[table], counts[table] = {}, {}
+            for part, frame in parts[table].items():
+                counts[table][part] = len(frame)
+                # Empty parts take no file.
+                if len(frame):
+                    path = staging.write_frame(frame, os.path.join(self.folder, folder, f'{table}_{part}'))
+                    files[table][part] = os.path.relpath(path, self.folder)
+        snapshot = {'label': label,
+                    'columns': {table: list(tables[table].columns) for table in TABLES},
+                    'rows': {table: len(tables[table]) for table in TABLES},
+                    'files': files}
+        every = self._manifest['checkpoint_every']
+        if self.snapshots and every and len(self) % every == 0:
+            snapshot['checkpoint'] = {}
+            for table in TABLES:
+                path = staging.write_frame(tables[table], os.path.join(self.folder, folder, f'{table}_checkpoint'))
+                snapshot['checkpoint'][table] = os.path.relpath(path, self.folder)
+        self._manifest['snapshots'].append(snapshot)
+        self._save_manifest()
+        self._latest = tables
+        return counts
+
+    def add_snapshot(self, folder: str, label: Union[str, int]) -> Dict[str, Dict[str, int]]:
+        """
+        Add the CSV snapshot `nodes_{label}.csv`/`edges_{label}.csv` in
+        `folder` (see `add`).
+        """
+        return self.add(label, *read_snapshot_text(folder, str(label)))
+
+    def _drop_latest(self) -> None:
+        latest = self._manifest['snapshots'].pop()
+        shutil.rmtree(os.path.join(self.folder, 'deltas', latest['label']) if self._manifest['snapshots']
+                      else os.path.join(self.folder, 'base'), ignore_errors=True)
+        self._latest = None
+
+    def _save_manifest(self) -> None:
+        path = os.path.join(self.folder, _MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._manifest, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def _delta(self, snapshot: dict, table: str) -> Dict[str, pd.DataFrame]:
+        parts = {}
+        for part in PARTS:
+            if part in snapshot['files'][table]:
+                parts[part] = staging.read_frame(os.path.join(self.folder, snapshot['files'][table][part]))
+            else:
+                parts[part] = pd.DataFrame(columns=[_POSITION, 'column', 'value'] if part == 'changed'
+                                           else snapshot['columns'][table] + [_POSITION])
+        return parts
+
+    def _replay(self, label: str) -> Iterator[Tuple[str, Dict[str, Dict[str, np.ndarray]], Dict[str, List[str]]]]:
+        # The snapshots from the last checkpoint (or the base) before `label`
+        # onwards, each built from the previous one, as one object array per
+        # column (frames are only assembled when needed).
+        snapshots = self._manifest['snapshots']
+        first = self.snapshots.index(label)
+        while first and 'checkpoint' not in snapshots[first]:
+            first -= 1
+        tables = {table: {} for table in TABLES}
+        rows = {table: 0 for table in TABLES}
+        for i, snapshot in enumerate(snapshots[first:]):
+            for table in TABLES:
+                if i == 0 and 'checkpoint' in snapshot:
+                    frame = staging.read_frame(os.path.join(self.folder, snapshot['checkpoint'][table]))
+                    tables[table] = {column: frame[column].to_numpy(dtype=object) for column in frame.columns}
+                else:
+                    tables[table] = _apply(tables[table], rows[table], self._delta(snapshot, table),
+                                           snapshot['columns'][table])
+                rows[table] = snapshot['rows'][table]
+            yield snapshot['label'], tables, snapshot['columns']
+
+    def _materialize(self, label: str) -> Dict[str, pd.DataFrame]:
+        for found, tables, columns in self._replay(label):
+            if found == label:
+                return _frames(tables, columns)
+        raise KeyError(label)
+
+    def resolve(self, when: Union[str, int]) -> str:
+        """
+        Return the label of the snapshot in effect at `when`: the latest one
+        up to that date, or up to the end of that year.
+
+        Raises
+        ------
+        KeyError
+            If no snapshot is that early.
+        """
+        order = snapshot_order(when)
+        labels = [label for label in self.snapshots if snapshot_order(label) <= order]
+        if not labels:
+            raise KeyError(f"No snapshot as of {when}; the first is {self.snapshots[0] if self else None}.")
+        return labels[-1]
+
+    def as_of(self, when: Union[str, int]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Rebuild the node and edge lists as of a date or year (see `resolve`),
+        from the base (or the last checkpoint) and the deltas up to it.
+        """
+        tables = self._materialize(self.resolve(when))
+        return tables['nodes'], tables['edges']
+
+    def diff(self, before: Union[str, int], after: Union[str, int]) -> NetworkDiff:
+        """
+        Compare the network as of two dates or years, rebuilding both in one
+        pass over the deltas.
+        """
+        labels = self.resolve(before), self.resolve(after)
+        found = {}
+        for label, tables, columns in self._replay(min(labels, key=snapshot_order)):
+            if label in labels:
+                found[label] = _frames(tables, columns)
+            if len(found) == len(set(labels)):
+                break
+        old, new = found[labels[0]], found[labels[1]]
+        return NetworkDiff(*(table_diff(old[table], new[table], table) for table in TABLES))
+
+    def disk_usage(self) -> int:
+        """
+        Return the bytes used by the store's files.
+        """
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(self.folder) for name in names)
+
+
+def build_store(outputs: str, folder: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """
+    Add the CSV snapshots in `outputs` to the store in `folder` (by default
+    `outputs/temporal`), from its latest one on, and return the counts
+    `TemporalStore.add` returned for each.
+
+    The store's latest snapshot is added again, in case its files were
+    written again since (e.g., the notebook ran twice on the same day).
+    """
+    store = TemporalStore(folder or os.path.join(outputs, TEMPORAL_DIR))
+    latest = snapshot_order(store.snapshots[-1]) if store.snapshots else ''
+    return {label: store.add_snapshot(outputs, label)
+            for label in find_snapshot_labels(outputs) if snapshot_order(label) >= latest}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m twnet.temporal',
+                                     description='Build and query the store of network snapshots over time.')
+    parser.add_argument('--store', default=None, help='Store folder (default: <outputs>/temporal).')
+    parser.add_argument('--outputs', default='outputs', help='Folder of the CSV snapshots (default: outputs).')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='Add the snapshots in --outputs that the store does not have yet.')
+    as_of = commands.add_parser('as-of', help='Write the network as of a date or year.')
+    as_of.add_argument('when', help='YYYYMMDD date or YYYY year.')
+    as_of.add_argument('--out', required=True, help='Folder for nodes_<label>.csv and edges_<label>.csv.')
+    diff = commands.add_parser('diff', help='Summarize what changed between two dates or years.')
+    diff.add_argument('before')
+    diff.add_argument('after')
+    diff.add_argument('--out', default=None, help='Folder for the added, removed and changed rows as CSV.')
+    args = parser.parse_args(argv)
+
+    folder = args.store or os.path.join(args.outputs, TEMPORAL_DIR)
+    if args.command == 'build':
+        for label, counts in build_store(args.outputs, folder).items():
+            print(f"{label}: " + '; '.join(f"{table} " + ', '.join(f"{count} {part}" for part, count in parts.items())
+                                           for table, parts in counts.items()))
+        store = TemporalStore(folder)
+        copies = sum(os.path.getsize(os.path.join(args.outputs, f'{table}_{label}.csv'))
+                     for label in store.snapshots for table in TABLES
+                     if os.path.exists(os.path.join(args.outputs, f'{table}_{label}.csv')))
+        print(f"{len(store)} snapshots in {store.disk_usage():,} bytes ({copies:,} bytes as CSV copies)")
+        return
+
+    store = TemporalStore(folder)
+    if args.command == 'as-of':
+        label = store.resolve(args.when)
+        nl, el = store.as_of(label)
+        os.makedirs(args.out, exist_ok=True)
+        nl.to_csv(os.path.join(args.out, f'nodes_{label}.csv'), index=False)
+        el.to_csv(os.path.join(args.out, f'edges_{label}.csv'), index=False)
+        print(f"{label}: {len(nl)} nodes, {len(el)} edges written to {args.out}")
+        return
+
+    found = store.diff(args.before, args.after)
+    for table, table_found in zip(TABLES, found):
+        columns = table_found.changed['column'].value_counts()
+        print(f"{table}: {len(table_found.added)} added, {len(table_found.removed)} removed, "
+              f"{len(table_found.changed)} values changed" + (f" ({columns.to_dict()})" if len(columns) else ''))
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            for part, frame in table_found._asdict().items():
+                frame.to_csv(os.path.join(args.out, f'{table}_{part}.csv'), index=False)
+
+
+if __name__ == '__main__':
+    main()